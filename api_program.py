@@ -1,10 +1,35 @@
-from fastapi import APIRouter
+import json, os
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from program_engine import ProgramEngine, is_crisis
+from program_engine import AsyncProgramEngine, is_crisis
+from program_scheduler import DueStepScheduler, decode_cursor, encode_cursor
 
 router = APIRouter()
 
-engine = ProgramEngine(db_path="sehat.db", programs_folder="programs")
+# Storage backend from PROGRAM_STORAGE (sqlite | postgres); routes never block the loop
+engine = AsyncProgramEngine(
+    db_path=os.getenv("PROGRAM_DB_PATH", "sehat.db"),
+    programs_folder=os.getenv("PROGRAMS_DIR", "programs"),
+)
+
+# Read-only view of due steps; the reminder worker runs separately (python -m program_scheduler)
+due = DueStepScheduler(engine, state_path=None)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Open the storage pool before serving and close it (flushing buffered writes) on shutdown."""
+    await engine.start()
+    try:
+        yield
+    finally:
+        await engine.close()
+
+BULK_MAX_USERS = int(os.getenv("PROGRAM_BULK_MAX_USERS", "50000"))
+NDJSON_BATCH = 500  # rows per streamed chunk
 
 class EnrollReq(BaseModel):
     user_id: str
@@ -15,20 +40,70 @@ class NextReq(BaseModel):
     program_id: str
     user_message: str | None = None  # optional reflection; crisis check
 
+class BulkReq(BaseModel):
+    program_id: str
+    user_ids: List[str]
+
+
+def _check_bulk(r: BulkReq):
+    # Validate before streaming starts: the status line can't change mid-body
+    if r.program_id not in engine.registry:
+        raise HTTPException(status_code=404, detail=f"Unknown program: {r.program_id}")
+    if len(r.user_ids) > BULK_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_USERS} user_ids per call")
+
+
+def _ndjson(rows):
+    async def body():
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(row, ensure_ascii=False))
+            if len(lines) == NDJSON_BATCH:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 
 @router.get("/list")
-def list_programs():
-    return engine.registry.list_programs()
+async def list_programs():
+    # Serialized once per registry snapshot
+    return Response(engine.registry.list_json(), media_type="application/json")
+
+
+@router.get("/storage")
+async def storage_stats():
+    return engine.storage.stats()
+
+
+@router.get("/due")
+async def due_steps(limit: int = 100, cursor: str | None = None):
+    """Steps due now (not completed, untouched for PROGRAM_DUE_AFTER_SECS), keyset-paginated."""
+    try:
+        after = decode_cursor(cursor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Bad cursor")
+    items, nxt = await due.page(due.cutoff(), after, max(1, min(limit, 1000)))
+    return {"items": items, "next_cursor": encode_cursor(nxt) if nxt else None}
+
+
+@router.get("/funnel/{program_id}")
+async def funnel(program_id: str, days: int = 30, distinct_users: bool = False):
+    """Enrolled → per-step → completed counts from the event log's daily rollup."""
+    if program_id not in engine.registry:
+        raise HTTPException(status_code=404, detail=f"Unknown program: {program_id}")
+    return await engine.funnel(program_id, max(1, min(days, 366)), distinct_users)
 
 
 @router.post("/enroll")
-def enroll(r: EnrollReq):
-    engine.enroll(r.user_id, r.program_id)
+async def enroll(r: EnrollReq):
+    await engine.enroll(r.user_id, r.program_id)
     return {"ok": True}
 
 
 @router.post("/next")
-def next_step(r: NextReq):
+async def next_step(r: NextReq):
     if r.user_message and is_crisis(r.user_message):
         return {
             "message": (
@@ -38,5 +113,26 @@ def next_step(r: NextReq):
             ),
             "stopped": True
         }
-    msg = engine.next_step(r.user_id, r.program_id)
+    msg = await engine.next_step(r.user_id, r.program_id)
     return {"message": msg, "stopped": False}
+
+
+@router.post("/bulk/enroll")
+async def bulk_enroll(r: BulkReq):
+    _check_bulk(r)
+    added = await engine.bulk_enroll(r.user_ids, r.program_id)
+    return {"ok": True, "enrolled": added, "already_enrolled": len(set(r.user_ids)) - added}
+
+
+@router.post("/bulk/next")
+async def bulk_next(r: BulkReq):
+    """Advance a whole cohort one step; streams one NDJSON row per user."""
+    _check_bulk(r)
+    return _ndjson(await engine.bulk_next_step(r.user_ids, r.program_id))
+
+
+@router.post("/bulk/current")
+async def bulk_current(r: BulkReq):
+    """Each user's last served step, without advancing; streamed as NDJSON."""
+    _check_bulk(r)
+    return _ndjson(await engine.bulk_current(r.user_ids, r.program_id))
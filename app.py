@@ -7,7 +7,8 @@ from fastapi.staticfiles import StaticFiles
 import api_program
 import query_api   # Q&A chatbot API
 
-app = FastAPI(title="SukoonAI MVP")
+# Program storage opens at startup and closes on shutdown
+app = FastAPI(title="SukoonAI MVP", lifespan=api_program.lifespan)
 
 # Templates (UI pages)
 templates = Jinja2Templates(directory="templates")
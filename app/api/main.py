@@ -1,5 +1,6 @@
 # app/api/main.py
 
+import asyncio
 import os
 import re
 import json
@@ -28,6 +29,8 @@ except Exception:
 # Chat-3: agent graph entrypoint + response schema
 from packages.agent.graph import run_graph
 from packages.agent.state import Result
+from packages.rag.embed_store import EmbeddingStore
+from packages.rag.embeddings import embedding_provider, get_embeddings
 
 # --- OpenAPI tags metadata ----------------------------------------------------
 tags_metadata = [
@@ -69,6 +72,8 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
 OPENAI_TIMEOUT_SECS = float(os.getenv("OPENAI_TIMEOUT_SECS", "15.0"))
+# match_chunks HNSW candidate list per query (unset: server default, see infra/supabase/migrations)
+MATCH_CHUNKS_EF_SEARCH = int(os.getenv("MATCH_CHUNKS_EF_SEARCH", "0")) or None
 
 # Path to your agent config pack (defaults to repo-relative packages/agent)
 AGENT_DIR = Path(os.getenv("AGENT_DIR", "packages/agent")).resolve()
@@ -294,6 +299,41 @@ class IngestChunk(BaseModel):
     token_count: Optional[int] = None
     # Embedding (vector as Python list[float]; must match table dimension)
     embedding: Optional[List[float]] = None
+    # Model that produced `embedding`; client vectors are cached only under this name
+    embedding_model: Optional[str] = None
+
+
+_EMBED_STORE: Optional[EmbeddingStore] = None
+
+
+def _embed_store() -> EmbeddingStore:
+    """Shared content-addressed store (opened lazily; same file as the ingest scripts)."""
+    global _EMBED_STORE
+    if _EMBED_STORE is None:
+        _EMBED_STORE = EmbeddingStore()
+    return _EMBED_STORE
+
+
+def _sync_embeddings_with_store(items: List[IngestChunk]) -> None:
+    """
+    Client-supplied vectors are written to the local store under the model the
+    client declared (never under the server's EMBEDDING_MODEL by assumption;
+    undeclared vectors are not cached). Items sent without a vector are filled
+    from the server model's entries when the same chunk text was embedded before.
+    Blocking SQLite I/O: call it off the event loop.
+    """
+    store = _embed_store()
+    by_model: Dict[str, List[IngestChunk]] = {}
+    for i in items:
+        if i.embedding is not None and i.embedding_model and len(i.embedding) == EMBEDDING_DIM:
+            by_model.setdefault(i.embedding_model, []).append(i)
+    for model, given in by_model.items():
+        store.put_many(model, EMBEDDING_DIM, [i.content for i in given], [i.embedding for i in given])
+    missing = [i for i in items if i.embedding is None]
+    if missing:
+        cached = store.get_many(EMBEDDING_MODEL, EMBEDDING_DIM, [i.content for i in missing])
+        for item, vec in zip(missing, cached):
+            item.embedding = vec
 
 
 class IngestPayload(BaseModel):
@@ -318,6 +358,9 @@ async def ingest_chunks(payload: IngestPayload):
 
     svc_headers = _sb_headers_service()
 
+    if not payload.skip_embeddings:
+        await asyncio.to_thread(_sync_embeddings_with_store, payload.items)
+
     async def upsert_document(item: IngestChunk) -> str:
         doc_body = {
             "source_url": item.source_url,
@@ -433,8 +476,11 @@ def _make_snippet(content: str, query: str, max_len: int = 480) -> str:
 async def _embed_text(q: str) -> List[float]:
     """
     Calls OpenAI embeddings endpoint (text-embedding-3-small, 1536 dims by default).
+    With EMBEDDING_PROVIDER=hash the vector is computed locally (EMBEDDING_DIM dims).
     Separated for easy monkeypatching in tests.
     """
+    if embedding_provider() != "openai":
+        return await get_embeddings(dims=EMBEDDING_DIM).aembed_query(q)
     if not OPENAI_API_KEY:
         raise HTTPException(502, "OpenAI embedding key not configured")
     url = "https://api.openai.com/v1/embeddings"
@@ -484,6 +530,7 @@ async def search_vector(
     org_id: str = Query("demo"),
     doc_filters: Optional[str] = Query(None, description='JSON: {"source_url": "...", "external_id": "...", "title": "substring"}'),
     min_score: Optional[float] = Query(None, description="Min similarity score (0..1)"),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidates to scan (recall vs latency)"),
 ) -> List[VectorHit]:
     """
     Vector search over chunk_embeddings via Supabase PostgREST RPC.
@@ -505,6 +552,9 @@ async def search_vector(
         "external_id": filters["external_id"],
         "title_substring": filters["title"],
     }
+    ef_search = ef_search or MATCH_CHUNKS_EF_SEARCH
+    if ef_search:
+        payload["ef_search"] = ef_search
     try:
         rows = await _post_json(rpc_url, payload, _sb_headers_anon())
     except HTTPException:
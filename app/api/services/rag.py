@@ -1,17 +1,25 @@
 import asyncio
+import threading
 from pathlib import Path
 from typing import List, Tuple
 
 from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.docstore.document import Document
 
 from app.utils.env import load_settings
+from packages.rag.answer_cache import ANSWER_CACHE_ENABLED, SemanticAnswerCache, index_version
+from packages.rag.context import pack
+from packages.rag.embeddings import embedding_provider, get_embeddings
+from packages.rag.mmr import embed_query
+from packages.rag.telemetry import chunk_id
 
 settings = load_settings()
 
 INDEX_DIR = Path(__file__).resolve().parents[2] / "data" / "indices" / "faiss"
+# Four of scripts/ingest.py's 800-char chunks: the context this route sent before packing
+CONTEXT_TOKENS = 800
 
 _sys_prompt = """You are SukoonAI, a medical evidence navigator.
 - Answer using ONLY the provided context.
@@ -25,46 +33,82 @@ _prompt = ChatPromptTemplate.from_messages([
     ("human", "Question: {question}\n\nContext:\n{context}")
 ])
 
+def _embeddings():
+    # EMBEDDING_PROVIDER=hash loads indexes built offline with the local provider
+    if embedding_provider() == "openai":
+        return get_embeddings(settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
+    return get_embeddings()
+
 def _load_vectorstore() -> FAISS:
     if not INDEX_DIR.exists():
         raise FileNotFoundError("FAISS index not found. Run: python scripts/ingest.py")
     return FAISS.load_local(
         INDEX_DIR.as_posix(),
-        OpenAIEmbeddings(model=settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY),
+        _embeddings(),
         allow_dangerous_deserialization=True
     )
 
 _vectorstore = None
+_vectorstore_version = None
+_vectorstore_lock = threading.Lock()
+
+# Paraphrases of answered questions with the same evidence skip the LLM
+_answer_cache = SemanticAnswerCache(enabled=ANSWER_CACHE_ENABLED)
 
-def get_vectorstore() -> FAISS:
-    global _vectorstore
-    if _vectorstore is None:
-        _vectorstore = _load_vectorstore()
-    return _vectorstore
+def get_vectorstore() -> Tuple[FAISS, str]:
+    """
+    Shared store and the index version it was loaded from, reloaded when the
+    files in INDEX_DIR change (a few stat calls per request). Blocking: call
+    it off the event loop.
+    """
+    global _vectorstore, _vectorstore_version
+    with _vectorstore_lock:
+        version = index_version(INDEX_DIR)
+        if _vectorstore is None or version != _vectorstore_version:
+            try:
+                store = _load_vectorstore()
+            except Exception as e:
+                if _vectorstore is None:
+                    raise
+                print("[WARN] FAISS index reload failed, serving the previous one:", e)
+                return _vectorstore, _vectorstore_version
+            _vectorstore, _vectorstore_version = store, version
+        return _vectorstore, _vectorstore_version
 
-async def _aretrieve(query: str, k: int = 4) -> List[Document]:
-    vs = get_vectorstore()
+async def _aretrieve(query: str, k: int = 4) -> Tuple[List[float], List[Document], str]:
+    """Query vector (reused by the answer cache), the top-k chunks, and the index version they came from."""
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, lambda: vs.similarity_search(query, k=k))
+
+    def run():
+        vs, version = get_vectorstore()
+        vec = embed_query(vs, query)
+        return vec, vs.similarity_search_by_vector(vec, k=k), version
+
+    return await loop.run_in_executor(None, run)
 
 async def get_answer(question: str) -> Tuple[str, List[str]]:
-    docs = await _aretrieve(question, k=4)
-    context = "\n\n---\n\n".join([d.page_content for d in docs])
-    sources = [str(d.metadata.get("source", "unknown")) for d in docs]
-
-    llm = ChatOpenAI(model=settings.OPENAI_MODEL, temperature=0.0, api_key=settings.OPENAI_API_KEY)
-    messages = _prompt.format_messages(question=question, context=context)
-    resp = await llm.ainvoke(messages)
-
-    answer = resp.content.strip()
-    if "Not medical advice" not in answer:
-        answer += "\n\n_Not medical advice; for education only._"
-
-    seen = set()
-    uniq_sources = []
-    for s in sources:
-        if s not in seen:
-            seen.add(s)
-            uniq_sources.append(s)
-
-    return answer, uniq_sources
+    query_vec, docs, version = await _aretrieve(question, k=4)
+    # Rank order is the relevance; overlapping neighbours are merged, repeats dropped
+    packed = pack(
+        [(d.page_content, str(d.metadata.get("source", "unknown")), -rank) for rank, d in enumerate(docs)],
+        template="[{source}]\n{text}",
+        sep="\n\n---\n\n",
+        budget_tokens=CONTEXT_TOKENS,
+    )
+    context = packed.text
+    # Cite only what survived packing, i.e. what the LLM actually saw
+    sources = packed.sources
+    chunk_ids = [chunk_id(d) for d in docs]
+
+    answer = _answer_cache.get(query_vec, chunk_ids, version)
+    if answer is None:
+        llm = ChatOpenAI(model=settings.OPENAI_MODEL, temperature=0.0, api_key=settings.OPENAI_API_KEY)
+        messages = _prompt.format_messages(question=question, context=context)
+        resp = await llm.ainvoke(messages)
+
+        answer = resp.content.strip()
+        if "Not medical advice" not in answer:
+            answer += "\n\n_Not medical advice; for education only._"
+        _answer_cache.put(query_vec, chunk_ids, answer, version)
+
+    return answer, sources
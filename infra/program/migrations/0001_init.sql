@@ -0,0 +1,18 @@
+-- Program progress schema (SQLite and Postgres).
+-- Matches the tables ProgramEngine created before migrations existed, so
+-- applying it to an existing sehat.db is a no-op.
+
+create table if not exists users (
+  user_id text primary key,
+  created_at text default current_timestamp
+);
+
+create table if not exists enrollments (
+  user_id text not null,
+  program_id text not null,
+  current_step_index integer not null default 0,
+  started_at text default current_timestamp,
+  updated_at text default current_timestamp,
+  completed integer default 0,
+  primary key (user_id, program_id)
+);
@@ -0,0 +1,5 @@
+-- Due-step scans: "not completed and updated_at older than the cutoff",
+-- paged by (updated_at, user_id, program_id). The trailing columns make the
+-- index cover the scheduler's query, so it never touches the table.
+create index if not exists enrollments_due
+  on enrollments (completed, updated_at, user_id, program_id, current_step_index);
@@ -0,0 +1,26 @@
+-- Append-only program history, written in the same statement as the
+-- enrollments change it describes. event: enroll | step | complete | reset;
+-- step is the 1-based step served (0 for enroll/reset).
+create table if not exists program_events (
+  id bigint generated always as identity primary key,
+  ts text not null,
+  day text not null,
+  user_id text not null,
+  program_id text not null,
+  event text not null,
+  step integer not null default 0
+);
+
+-- Covering: distinct-user funnels, and one user's history in order
+create index if not exists program_events_funnel on program_events (program_id, event, step, user_id, day);
+create index if not exists program_events_user on program_events (user_id, program_id, id);
+
+-- Daily rollup kept current by the same statements; funnels read only this.
+create table if not exists program_step_daily (
+  program_id text not null,
+  day text not null,
+  event text not null,
+  step integer not null,
+  n bigint not null default 0,
+  primary key (program_id, day, event, step) include (n)
+);
@@ -0,0 +1,6 @@
+-- Write-behind journal entries carry a unique id per event, so crash
+-- recovery can tell an event that was already committed from an identical
+-- one (same user, step and second) that was not. Null for events written
+-- directly by a transaction; unique indexes allow any number of nulls.
+alter table program_events add column event_id text;
+create unique index if not exists program_events_event_id on program_events (event_id);
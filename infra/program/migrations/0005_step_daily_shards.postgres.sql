@@ -0,0 +1,7 @@
+-- Spread each (program, day, event, step) rollup counter over 16 rows keyed
+-- by a hash of the user: concurrent advances to the same step no longer
+-- queue on one row lock until commit. Funnels already sum(n), so readers
+-- are unchanged; existing counts stay in shard 0.
+alter table program_step_daily add column if not exists shard smallint not null default 0;
+alter table program_step_daily drop constraint if exists program_step_daily_pkey;
+alter table program_step_daily add primary key (program_id, day, event, step, shard) include (n);
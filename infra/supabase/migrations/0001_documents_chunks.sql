@@ -0,0 +1,67 @@
+-- Retrieval tables written by /v1/ingest and read by match_chunks.
+-- Run migrations in order (SQL editor or `psql -f`); every file is idempotent.
+-- Names are unqualified: they land in the first schema on search_path
+-- (public on Supabase).
+--
+-- Older copies of schema.sql created a different docs/chunks layout
+-- (embedding stored on chunks); it is not migrated, so drop or rename that
+-- chunks table before applying these.
+--
+-- Embedding dimension is 1536 (EMBEDDING_DIM / text-embedding-3-small);
+-- changing it means recreating chunk_embeddings.embedding and its index.
+
+create extension if not exists "pgcrypto";
+create extension if not exists "vector";
+create extension if not exists "pg_trgm";
+
+create table if not exists documents (
+  id uuid primary key default gen_random_uuid(),
+  org_id text not null default 'demo',
+  source_url text unique,      -- /v1/ingest upserts on source_url or external_id
+  external_id text unique,
+  title text,
+  lang text,
+  created_at timestamptz not null default now()
+);
+
+create table if not exists chunks (
+  id uuid primary key default gen_random_uuid(),
+  doc_id uuid not null references documents(id) on delete cascade,
+  org_id text not null default 'demo',
+  ord int not null default 0,
+  content text not null,
+  token_count int,
+  created_at timestamptz not null default now(),
+  unique (doc_id, ord)
+);
+
+create table if not exists chunk_embeddings (
+  chunk_id uuid primary key references chunks(id) on delete cascade,
+  org_id text not null default 'demo',
+  embedding vector(1536) not null,
+  created_at timestamptz not null default now()
+);
+
+-- match_chunks filters: tenant, exact source_url / external_id (the unique
+-- constraints above), case-insensitive title substring (trigram GIN serves
+-- ILIKE '%…%').
+create index if not exists documents_org on documents (org_id);
+create index if not exists documents_title_trgm on documents using gin (title gin_trgm_ops);
+create index if not exists chunk_embeddings_org on chunk_embeddings (org_id);
+
+-- Anonymous reads are limited to the demo tenant; the service role bypasses RLS.
+alter table documents enable row level security;
+alter table chunks enable row level security;
+alter table chunk_embeddings enable row level security;
+
+do $$ begin
+  if not exists (select 1 from pg_policies where schemaname = current_schema() and tablename = 'documents' and policyname = 'documents_demo_read') then
+    create policy documents_demo_read on documents for select using (org_id = 'demo');
+  end if;
+  if not exists (select 1 from pg_policies where schemaname = current_schema() and tablename = 'chunks' and policyname = 'chunks_demo_read') then
+    create policy chunks_demo_read on chunks for select using (org_id = 'demo');
+  end if;
+  if not exists (select 1 from pg_policies where schemaname = current_schema() and tablename = 'chunk_embeddings' and policyname = 'chunk_embeddings_demo_read') then
+    create policy chunk_embeddings_demo_read on chunk_embeddings for select using (org_id = 'demo');
+  end if;
+end $$;
@@ -0,0 +1,54 @@
+-- Vector index on chunk_embeddings.embedding, switchable and tunable without
+-- a new migration:
+--   select chunk_embeddings_index('hnsw', m => 16, ef_construction => 64);
+--   select chunk_embeddings_index('ivfflat', lists => 100);  -- what schema.sql built
+--   select chunk_embeddings_index('none');                   -- exact scans only
+--
+-- HNSW is the default: it needs no training data, keeps its recall as rows
+-- are added, and its recall/latency trade-off is chosen per query
+-- (match_chunks(ef_search => …)). Higher m / ef_construction raise recall at
+-- the cost of build time and index size. ivfflat clusters whatever rows exist
+-- at build time, so `lists` must track the row count (≈ rows / 1000) and the
+-- index needs a rebuild after large loads.
+--
+-- The rebuild runs in the caller's transaction and blocks writes while it
+-- builds; on a large live table run the returned statement yourself as
+-- CREATE INDEX CONCURRENTLY (with a generous maintenance_work_mem).
+
+create or replace function chunk_embeddings_index(
+  method text default 'hnsw',
+  m int default 16,
+  ef_construction int default 64,
+  lists int default 100
+) returns text
+language plpgsql
+set search_path from current
+as $$
+declare
+  ddl text;
+begin
+  if method = 'hnsw' then
+    ddl := format('create index chunk_embeddings_embedding on chunk_embeddings '
+                  'using hnsw (embedding vector_cosine_ops) with (m = %s, ef_construction = %s)', m, ef_construction);
+  elsif method = 'ivfflat' then
+    ddl := format('create index chunk_embeddings_embedding on chunk_embeddings '
+                  'using ivfflat (embedding vector_cosine_ops) with (lists = %s)', lists);
+  elsif method <> 'none' then
+    raise exception 'unknown vector index method: % (expected hnsw, ivfflat or none)', method;
+  end if;
+  drop index if exists chunk_embeddings_embedding;
+  if ddl is not null then
+    execute ddl;
+  end if;
+  return coalesce(ddl, 'no vector index');
+end $$;
+
+-- Not an RPC: only the table owner can rebuild indexes anyway.
+revoke execute on function chunk_embeddings_index(text, int, int, int) from public;
+
+do $$ begin
+  if not exists (select 1 from pg_indexes where schemaname = current_schema()
+                 and indexname = 'chunk_embeddings_embedding') then
+    perform chunk_embeddings_index('hnsw');
+  end if;
+end $$;
@@ -0,0 +1,67 @@
+-- RPC behind /v1/search/vector (PostgREST: POST /rest/v1/rpc/match_chunks).
+--
+-- score = 1 - cosine distance, best first; rows under min_score are dropped;
+-- source_url / external_id / title_substring are optional document filters
+-- (null = any). Per call, ef_search sets the HNSW candidate list
+-- (pgvector default 40) and probes the ivfflat lists scanned (default 1):
+-- higher is slower and closer to exact. Both indexes filter after the scan,
+-- so filters that discard most candidates need a larger ef_search / probes
+-- to still fill match_count rows. Exact source_url / external_id filters are
+-- usually answered from their unique indexes instead.
+
+create extension if not exists "vector";
+
+-- Result rows; a named type because the input and output both use
+-- source_url / external_id, which RETURNS TABLE would reject.
+drop function if exists match_chunks(vector, int, text, float, text, text, text);
+drop function if exists match_chunks(vector, int, text, float, text, text, text, int, int);
+drop type if exists match_chunks_row;
+create type match_chunks_row as (
+  chunk_id uuid,
+  doc_id uuid,
+  ord int,
+  content text,
+  title text,
+  source_url text,
+  external_id text,
+  score float
+);
+
+create function match_chunks(
+  query_embedding vector(1536),
+  match_count int default 6,
+  org text default 'demo',
+  min_score float default null,
+  source_url text default null,
+  external_id text default null,
+  title_substring text default null,
+  ef_search int default null,
+  probes int default null
+) returns setof match_chunks_row
+language plpgsql stable
+set search_path from current
+-- plan per call, so unset filters drop out of the plan instead of
+-- forcing one generic plan for every combination
+set plan_cache_mode = force_custom_plan
+as $$
+begin
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+  return query
+  select c.id, c.doc_id, c.ord, c.content, d.title, d.source_url, d.external_id,
+         1 - (e.embedding <=> query_embedding)
+  from chunk_embeddings e
+  join chunks c on c.id = e.chunk_id
+  join documents d on d.id = c.doc_id
+  where e.org_id = org
+    and (match_chunks.source_url is null or d.source_url = match_chunks.source_url)
+    and (match_chunks.external_id is null or d.external_id = match_chunks.external_id)
+    and (title_substring is null or d.title ilike '%' || title_substring || '%')
+    and (min_score is null or 1 - (e.embedding <=> query_embedding) >= min_score)
+  order by e.embedding <=> query_embedding
+  limit least(greatest(match_count, 1), 200);
+end $$;
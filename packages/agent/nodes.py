@@ -3,6 +3,8 @@ from __future__ import annotations
 
 from typing import Any, Literal, TypedDict, NotRequired
 
+from packages.rag.langid import identify
+
 
 Confidence = Literal["low", "med", "high"]
 
@@ -17,6 +19,7 @@ class AgentState(TypedDict, total=False):
     org_id: str
     user_id: str
     q: str  # user query
+    lang: NotRequired[str]  # english | roman-urdu | urdu-script
     plan: NotRequired[str]
     sources: NotRequired[list[str]]
     notes: NotRequired[dict[str, Any]]
@@ -146,6 +149,7 @@ def plan_node(state: AgentState) -> AgentState:
     topic = _topic_from_query(q)
     plan = f"plan: analyze → retrieve → guard → compose | topic='{topic}'"
     new_state = dict(state)
+    new_state["lang"] = identify(q).lang
     new_state["plan"] = plan
     return new_state  # pure transform
 
@@ -0,0 +1,180 @@
+# packages/rag/answer_cache.py
+"""
+Semantic answer cache: skip the LLM for paraphrases of questions already answered.
+
+An entry is (unit query embedding, retrieved chunk ids, answer). A lookup hits
+when the new query's embedding has cosine similarity >= `threshold` with a
+cached one AND retrieval returned the same chunk ids, so a paraphrase that
+lands on different evidence still gets a fresh answer.
+  - LRU bound (`max_entries`) and TTL (`ttl_secs`) eviction.
+  - Entries belong to an index version (see `index_version`); serving a
+    different version clears the cache.
+  - `stats` counts hits / misses by reason / evictions for observability.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_TTL_SECS = float(os.getenv("ANSWER_CACHE_TTL_SECS", str(24 * 3600)))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") not in {"0", "false", "False"}
+
+
+def index_version(path: str | os.PathLike) -> str:
+    """Cheap fingerprint of an on-disk index (file names, sizes, mtimes)."""
+    p = Path(path)
+    files = sorted(p.iterdir()) if p.is_dir() else [p]
+    h = hashlib.sha1()
+    for f in files:
+        if f.is_file():
+            st = f.stat()
+            h.update(f"{f.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:16]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    miss_no_similar: int = 0
+    miss_chunks_changed: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.miss_no_similar + self.miss_chunks_changed
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self.__dict__, "lookups": self.lookups, "hit_rate": round(self.hit_rate, 4)}
+
+    def summary(self) -> str:
+        return (f"{self.hits}/{self.lookups} hits ({self.hit_rate:.1%}); misses: "
+                f"{self.miss_no_similar} new, {self.miss_chunks_changed} different evidence; "
+                f"{self.evictions} evicted")
+
+
+@dataclass
+class _Entry:
+    vec: np.ndarray
+    chunk_ids: frozenset
+    answer: Any
+    created: float
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_secs: float = ANSWER_CACHE_TTL_SECS,
+        *,
+        enabled: bool = True,
+        clock=time.time,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_secs = ttl_secs
+        self.enabled = enabled
+        self.clock = clock
+        self.version: Optional[str] = None
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._matrix: Optional[np.ndarray] = None  # rows follow self._keys
+        self._keys: list[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---- public interface ----
+    def get(self, query_vec: Sequence[float], chunk_ids: Sequence[str], version: Optional[str] = None) -> Optional[Any]:
+        """Cached answer for a paraphrase with the same evidence, else None."""
+        if not self.enabled:
+            return None
+        q = self._unit(query_vec)
+        with self._lock:
+            self._check_version(version)
+            self._expire()
+            if not self._entries:
+                self.stats.miss_no_similar += 1
+                return None
+            sims = self._matrix_locked() @ q
+            order = np.argsort(-sims)
+            wanted = frozenset(chunk_ids)
+            near = False
+            for i in order:
+                if sims[i] < self.threshold:
+                    break
+                near = True
+                key = self._keys[int(i)]
+                entry = self._entries[key]
+                if entry.chunk_ids == wanted:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return entry.answer
+            if near:
+                self.stats.miss_chunks_changed += 1
+            else:
+                self.stats.miss_no_similar += 1
+            return None
+
+    def put(self, query_vec: Sequence[float], chunk_ids: Sequence[str], answer: Any, version: Optional[str] = None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_id] = _Entry(self._unit(query_vec), frozenset(chunk_ids), answer, self.clock())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    # ---- internals (lock held) ----
+    @staticmethod
+    def _unit(vec: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vec, dtype="float32")
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def _check_version(self, version: Optional[str]):
+        if version is not None and version != self.version:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def _expire(self):
+        cutoff = self.clock() - self.ttl_secs
+        stale = [k for k, e in self._entries.items() if e.created < cutoff]
+        for k in stale:
+            del self._entries[k]
+        if stale:
+            self.stats.evictions += len(stale)
+            self._matrix = None
+
+    def _matrix_locked(self) -> np.ndarray:
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.vstack([self._entries[k].vec for k in self._keys])
+        return self._matrix
@@ -0,0 +1,86 @@
+# packages/rag/batch_writer.py
+"""
+Background batched writer shared by the query log and the telemetry store.
+
+Callers enqueue items without blocking (items beyond `max_queue` are counted in
+`dropped`); a daemon thread hands them to `write(batch)` once `flush_every` are
+pending or `flush_interval` seconds have passed, and on `flush()` / `close()`.
+A failing `write` is reported and the batch discarded, never raised.
+"""
+from __future__ import annotations
+
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+_STOP = object()
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        write: Callable[[List[Any]], None],
+        *,
+        name: str,
+        flush_every: int = 50,
+        flush_interval: float = 2.0,
+        max_queue: int = 10000,
+    ):
+        self.write = write
+        self.name = name
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, item: Any):
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything enqueued so far has been written (tests, shutdown)."""
+        done = threading.Event()
+        self._q.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._q.put(_STOP)
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+    def _run(self):
+        pending: List[Any] = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            waiter = item if isinstance(item, threading.Event) else None
+            if item is not None and not stop and waiter is None:
+                pending.append(item)
+            due = (len(pending) >= self.flush_every
+                   or time.monotonic() - last_flush >= self.flush_interval)
+            if pending and (due or stop or waiter is not None):
+                try:
+                    self.write(pending)
+                except Exception as e:  # logging must never take the app down
+                    print(f"[WARN] {self.name} write failed:", e)
+                pending = []
+            if due or waiter is not None:
+                last_flush = time.monotonic()
+            if waiter is not None:
+                waiter.set()
+            if stop:
+                return
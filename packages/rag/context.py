@@ -0,0 +1,185 @@
+# packages/rag/context.py
+"""
+Overlap-aware context packing for LLM prompts.
+
+Retrieved chunks come from RecursiveCharacterTextSplitter(chunk_overlap=200),
+so neighbours from the same page repeat up to 200 characters verbatim, and
+paraphrase-free copies of a chunk can appear under several sources. `pack()`:
+  1. merges chunks of the same source whose text overlaps (suffix of one ==
+     prefix of the next) or is contained in another into single passages;
+  2. drops passages whose text already appears inside a kept passage;
+  3. orders passages by their best chunk's relevance;
+  4. splits `budget_tokens` across the kept passages: each gets an equal
+     share (what a short passage leaves unused goes to the others) and is
+     trimmed at a word boundary to it; when the shares would be too small to
+     be useful, the least relevant passages are dropped instead.
+Tokens are estimated at ~4 characters per token, the same rough ratio the
+agent uses for its token counts.
+
+The default budget (CONTEXT_TOKEN_BUDGET=225) matches what the query API and
+retriever sent before packing, three 300-character snippets: three passages
+still get about 300 characters each, and a short or merged passage hands its
+unused share to the others instead of padding the prompt. Pass
+`baseline_chars=300` to report savings against those snippets.
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+DEFAULT_BUDGET_TOKENS = int(os.getenv("CONTEXT_TOKEN_BUDGET", "225"))  # 3 x 300-char snippets
+CHARS_PER_TOKEN = 4
+MIN_OVERLAP = 30  # shorter shared runs are coincidence, not splitter overlap
+
+_WS = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _norm(text: str) -> str:
+    return _WS.sub(" ", text).strip()
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 if < MIN_OVERLAP)."""
+    probe = b[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return 0
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+
+@dataclass
+class Passage:
+    source: str
+    text: str
+    score: float
+    chunks: int = 1
+
+
+@dataclass
+class PackedContext:
+    text: str
+    passages: List[Passage] = field(default_factory=list)
+    tokens: int = 0
+    naive_tokens: int = 0  # what the caller sent before packing (see baseline_chars)
+    chunks_in: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.naive_tokens - self.tokens)
+
+    @property
+    def sources(self) -> List[str]:
+        return list(dict.fromkeys(p.source for p in self.passages))
+
+
+def _stitch(items: List[Tuple[str, float, int]], source: str) -> List[Passage]:
+    passages: List[Passage] = []
+    for text, score, count in items:
+        for p in passages:
+            if text in p.text:
+                break
+            if p.text in text:
+                p.text = text
+                break
+            n = _overlap(p.text, text)
+            if n:
+                p.text += text[n:]
+                break
+            n = _overlap(text, p.text)
+            if n:
+                p.text = text + p.text[n:]
+                break
+        else:
+            p = Passage(source, text, score, 0)
+            passages.append(p)
+        p.score = max(p.score, score)
+        p.chunks += count
+    return passages
+
+
+def _merge_source(chunks: List[Tuple[str, float]], source: str) -> List[Passage]:
+    """Stitch one source's chunks into maximal non-overlapping passages."""
+    passages = _stitch([(t, s, 1) for t, s in chunks], source)
+    # A stitch can make two earlier passages overlap; repeat until stable
+    while len(passages) > 1:
+        again = _stitch([(p.text, p.score, p.chunks) for p in passages], source)
+        if len(again) == len(passages):
+            break
+        passages = again
+    return passages
+
+
+def _trim(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    return cut[:space] if space > max_chars // 2 else cut
+
+
+def _shares(costs: List[int], budget: int) -> List[int]:
+    """Water-fill `budget` over `costs`: equal shares, capped at each cost, slack redistributed."""
+    out = [0] * len(costs)
+    remaining, left = budget, len(costs)
+    for i in sorted(range(len(costs)), key=costs.__getitem__):
+        out[i] = min(costs[i], remaining // left)
+        remaining -= out[i]
+        left -= 1
+    return out
+
+
+def pack(
+    chunks: Sequence[Tuple[str, str, float]],
+    budget_tokens: Optional[int] = DEFAULT_BUDGET_TOKENS,
+    *,
+    template: str = "Source: {source}\nContent: {text}",
+    sep: str = "\n\n",
+    baseline_chars: Optional[int] = None,
+) -> PackedContext:
+    """
+    Pack (text, source, relevance) chunks into one context string of at most
+    `budget_tokens` estimated tokens (None = no limit). Higher relevance first.
+    `baseline_chars` is how much of each chunk the caller used to send
+    (None = whole chunks); naive_tokens/tokens_saved are measured against it.
+    """
+    by_source: dict[str, List[Tuple[str, float]]] = {}
+    for text, source, score in chunks:
+        by_source.setdefault(source, []).append((text.strip(), score))
+    passages = [p for src, items in by_source.items() for p in _merge_source(items, src)]
+    passages.sort(key=lambda p: p.score, reverse=True)
+
+    # Cross-source duplicate spans (same text mirrored under another source)
+    kept: List[Passage] = []
+    for p in passages:
+        n = _norm(p.text)
+        if not any(n in _norm(k.text) for k in kept):
+            kept.append(p)
+
+    naive = sep.join(template.format(source=s, text=t.strip()[:baseline_chars]) for t, s, _ in chunks)
+    if budget_tokens is None:
+        used = kept
+    else:
+        # Fewest passages first if the shares cannot give each MIN_OVERLAP chars of text
+        budget_chars = budget_tokens * CHARS_PER_TOKEN
+        while kept:
+            heads = [len(template.format(source=p.source, text="")) for p in kept]
+            room = budget_chars - len(sep) * (len(kept) - 1)
+            shares = _shares([h + len(p.text) for h, p in zip(heads, kept)], room)
+            if all(share - h >= min(MIN_OVERLAP, len(p.text)) for share, h, p in zip(shares, heads, kept)):
+                break
+            kept = kept[:-1]
+        used = [p if share - h >= len(p.text) else Passage(p.source, _trim(p.text, share - h), p.score, p.chunks)
+                for p, share, h in zip(kept, shares, heads)] if kept else []
+    text = sep.join(template.format(source=p.source, text=p.text) for p in used)
+    return PackedContext(text, used, estimate_tokens(text), estimate_tokens(naive), len(chunks))
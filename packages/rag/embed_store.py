@@ -0,0 +1,223 @@
+# packages/rag/embed_store.py
+"""
+Content-addressed embedding store shared by every ingestion path.
+
+Vectors are keyed by (model, dims, sha256(chunk text)), so re-running any
+pipeline over unchanged text is served entirely from the local store and makes
+zero embedding API calls.
+
+Usage (CLI):
+    python -m packages.rag.embed_store stats
+    python -m packages.rag.embed_store compact --max-age-days 90
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_STORE_PATH = os.getenv("EMBED_STORE_PATH", "data/embeddings/store.sqlite3")
+
+# SQLite's default host-parameter limit is 999; stay well under it.
+_BATCH = 500
+
+
+def text_key(text: str) -> str:
+    """sha256 of the exact chunk text (the content address)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    a = array("f")
+    a.frombytes(blob)
+    return a.tolist()
+
+
+def _float32(vec: Sequence[float]) -> List[float]:
+    """`vec` at the precision it is stored with, so fresh and cached vectors match."""
+    return array("f", vec).tolist()
+
+
+@dataclass
+class StoreStats:
+    """Per-run counters; `summary()` is printed at the end of each ingest."""
+    hits: int = 0
+    misses: int = 0
+    puts: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return (self.hits / total) if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.hits} hits / {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate), {self.puts} stored"
+        )
+
+
+class EmbeddingStore:
+    """SQLite-backed vector store addressed by (model, dims, sha256)."""
+
+    def __init__(self, path: str | os.PathLike = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+          model TEXT NOT NULL, dims INTEGER NOT NULL, sha TEXT NOT NULL,
+          vec BLOB NOT NULL,
+          created_at REAL NOT NULL, last_used REAL NOT NULL,
+          PRIMARY KEY (model, dims, sha)) WITHOUT ROWID""")
+        self.db.commit()
+        self.stats = StoreStats()
+
+    # ---- bulk access ----
+    def get_many(self, model: str, dims: int, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return one vector (or None on miss) per input text, in order."""
+        keys = [text_key(t) for t in texts]
+        found: dict[str, List[float]] = {}
+        now = time.time()
+        uniq = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(uniq), _BATCH):
+                batch = uniq[i:i + _BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self.db.execute(
+                    f"SELECT sha, vec FROM embeddings WHERE model=? AND dims=? AND sha IN ({marks})",
+                    (model, dims, *batch),
+                ).fetchall()
+                for sha, blob in rows:
+                    found[sha] = _unpack(blob)
+                if rows:
+                    self.db.execute(
+                        f"UPDATE embeddings SET last_used=? WHERE model=? AND dims=? AND sha IN ({marks})",
+                        (now, model, dims, *batch),
+                    )
+            self.db.commit()
+        out = [found.get(k) for k in keys]
+        hits = sum(1 for v in out if v is not None)
+        self.stats.hits += hits
+        self.stats.misses += len(out) - hits
+        return out
+
+    def put_many(self, model: str, dims: int, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> int:
+        """Upsert vectors for texts; vectors whose length != dims are rejected."""
+        now = time.time()
+        rows = []
+        for t, v in zip(texts, vectors):
+            if len(v) != dims:
+                raise ValueError(f"Embedding dimension mismatch: expected {dims}, got {len(v)}")
+            rows.append((model, dims, text_key(t), _pack(v), now, now))
+        if not rows:
+            return 0
+        with self._lock:
+            self.db.executemany(
+                """INSERT INTO embeddings(model, dims, sha, vec, created_at, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(model, dims, sha) DO UPDATE SET last_used=excluded.last_used""",
+                rows,
+            )
+            self.db.commit()
+        self.stats.puts += len(rows)
+        return len(rows)
+
+    # ---- maintenance ----
+    def compact(self, max_age_days: Optional[float] = None, keep_models: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop vectors not used within `max_age_days` and/or belonging to models
+        outside `keep_models`, then VACUUM. Returns the number of rows removed.
+        """
+        removed = 0
+        with self._lock:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                removed += self.db.execute("DELETE FROM embeddings WHERE last_used < ?", (cutoff,)).rowcount
+            if keep_models is not None:
+                models = list(keep_models)
+                marks = ",".join("?" * len(models)) or "''"
+                removed += self.db.execute(
+                    f"DELETE FROM embeddings WHERE model NOT IN ({marks})", models
+                ).rowcount
+            self.db.commit()
+            self.db.execute("VACUUM")
+        return removed
+
+    def counts(self) -> List[tuple]:
+        with self._lock:
+            return self.db.execute(
+                "SELECT model, dims, COUNT(*) FROM embeddings GROUP BY model, dims ORDER BY model"
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` wrapper: look every text up in the store first and
+    only send the misses (deduplicated) to the wrapped provider.
+    """
+
+    def __init__(self, inner: Embeddings, store: EmbeddingStore, model: str, dims: int):
+        self.inner = inner
+        self.store = store
+        self.model = model
+        self.dims = dims
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.store.get_many(self.model, self.dims, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = self.inner.embed_documents(missing)
+            self.store.put_many(self.model, self.dims, missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            vectors = [v if v is not None else _float32(by_text[t]) for t, v in zip(texts, vectors)]
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Query-time lookups stay on the provider; the store is an ingest cache.
+        return self.inner.embed_query(text)
+
+
+# ---------------------------- CLI --------------------------------------------
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Inspect or compact the local embedding store")
+    parser.add_argument("--path", default=DEFAULT_STORE_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Row counts per (model, dims)")
+    c = sub.add_parser("compact", help="Drop stale vectors and VACUUM")
+    c.add_argument("--max-age-days", type=float, default=None)
+    c.add_argument("--keep-model", action="append", default=None,
+                   help="Keep only these models (repeatable)")
+    args = parser.parse_args(argv)
+
+    store = EmbeddingStore(args.path)
+    if args.cmd == "stats":
+        for model, dims, n in store.counts():
+            print(f"{model}\t{dims}\t{n}")
+    else:
+        removed = store.compact(args.max_age_days, args.keep_model)
+        print(f"[SUCCESS] Removed {removed} vectors from {store.path}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
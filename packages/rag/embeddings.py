@@ -0,0 +1,114 @@
+# packages/rag/embeddings.py
+"""
+Embedding providers behind one LangChain `Embeddings` interface.
+
+EMBEDDING_PROVIDER selects the backend for every index/query path:
+  - "openai" (default): OpenAIEmbeddings for the given model.
+  - "hash": deterministic local hashed word/char n-gram vectors (no network,
+    no API spend), for CI, offline index builds and latency benchmarks.
+
+Indexes must be queried with the provider that built them.
+"""
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from packages.rag.embed_store import CachedEmbeddings, EmbeddingStore
+
+# Model used for data/index/index (OpenAIEmbeddings() default); index + query sides share it
+INDEX_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Known output sizes; anything else falls back to EMBEDDING_DIM.
+KNOWN_MODEL_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def embedding_provider() -> str:
+    return os.getenv("EMBEDDING_PROVIDER", "openai").strip().lower()
+
+
+def default_dims() -> int:
+    return int(os.getenv("EMBEDDING_DIM", "1536"))
+
+
+def model_dims(model: str) -> int:
+    return KNOWN_MODEL_DIMS.get(model, default_dims())
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Signed feature hashing over word unigrams, word bigrams and character
+    3-grams of each word, L2-normalised. Same text → same vector, everywhere.
+    """
+
+    def __init__(self, dims: Optional[int] = None):
+        self.dims = dims or default_dims()
+        self.model = "hash-ngram-v1"
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        feats = list(words)
+        feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"<{w}>"
+            feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return feats
+
+    def _embed(self, text: str) -> List[float]:
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode("utf-8")) for f in self._features(text)), dtype=np.uint64
+        )
+        if hashes.size == 0:
+            return [0.0] * self.dims
+        idx = (hashes % self.dims).astype(np.int64)
+        signs = np.where((hashes // self.dims) & 1, 1.0, -1.0)
+        vec = np.bincount(idx, weights=signs, minlength=self.dims)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def get_embeddings(model: Optional[str] = None, *, provider: Optional[str] = None,
+                   dims: Optional[int] = None, **kwargs) -> Embeddings:
+    """
+    Return the configured provider. `model`/`kwargs` are passed to OpenAIEmbeddings;
+    `dims` sizes the local hashing provider (default EMBEDDING_DIM).
+    """
+    provider = provider or embedding_provider()
+    if provider == "hash":
+        return HashingEmbeddings(dims)
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"), **kwargs)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider!r} (expected 'openai' or 'hash')")
+
+
+def cached_embeddings(model: Optional[str] = None, *, store: Optional[EmbeddingStore] = None,
+                      provider: Optional[str] = None, **kwargs) -> CachedEmbeddings:
+    """Provider from `get_embeddings`, wrapped with the shared content-addressed store."""
+    inner = get_embeddings(model, provider=provider, **kwargs)
+    if isinstance(inner, HashingEmbeddings):
+        key_model, dims = inner.model, inner.dims
+    else:
+        key_model = getattr(inner, "model", None) or model
+        dims = model_dims(key_model)
+    return CachedEmbeddings(inner, store or EmbeddingStore(), key_model, dims)
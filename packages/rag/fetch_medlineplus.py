@@ -1,16 +1,22 @@
 """
 Fetch MedlinePlus pages from a URL list and save cleaned text files.
+Pages are refreshed concurrently with conditional requests; unchanged pages
+are not transferred again (see packages/rag/fetcher.py).
 Usage:
     python scripts/fetch_medlineplus.py
 """
+import asyncio
 import pathlib
-import time
-import requests
+import sys
 from bs4 import BeautifulSoup
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from packages.rag.fetcher import FetchState, fetch_all, summarize  # noqa: E402
+
 URL_LIST = ROOT / "data" / "raw" / "medlineplus_urls.txt"
 OUT_DIR = ROOT / "data" / "raw" / "medlineplus"
+STATE_PATH = ROOT / "data" / "fetch_state.sqlite3"
 
 HEADERS = {"User-Agent": "SukoonAI-MVP/0.1 (https://example.com)"}
 
@@ -23,25 +29,39 @@ def clean_text(html: str) -> str:
     lines = [ln for ln in lines if ln]
     return "\n".join(lines)
 
+def read_sources():
+    sources = []
+    for url in URL_LIST.read_text(encoding="utf-8").splitlines():
+        url = url.strip()
+        if not url or url.startswith("#"):
+            continue
+        fname = (url.split("/")[-1] or "index").split("?")[0]
+        sources.append({"name": f"medlineplus/{fname}", "url": url, "fname": f"{fname}.txt"})
+    return sources
+
 def main():
     OUT_DIR.mkdir(parents=True, exist_ok=True)
     if not URL_LIST.exists():
         print(f"URL list not found: {URL_LIST}")
         return
 
-    for url in URL_LIST.read_text(encoding="utf-8").splitlines():
-        url = url.strip()
-        if not url or url.startswith("#"):
-            continue
-        print(f"Fetching {url} ...")
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        text = clean_text(r.text)
-        fname = (url.split("/")[-1] or "index").split("?")[0]
-        out_path = OUT_DIR / f"{fname}.txt"
-        out_path.write_text(text, encoding="utf-8")
-        time.sleep(1)  # be polite
-    print(f"Saved cleaned pages to {OUT_DIR}")
+    state = FetchState(STATE_PATH)
+    try:
+        results = asyncio.run(fetch_all(
+            read_sources(), OUT_DIR,
+            filename=lambda s: s["fname"],
+            transform=lambda r: clean_text(r.text).encode("utf-8"),
+            headers=HEADERS,
+            state=state,
+        ))
+    finally:
+        state.close()
+    failed = [r for r in results if r.status == "failed"]
+    for r in failed:
+        print(f"FAILED {r.url}: {r.error}")
+    print(f"Saved cleaned pages to {OUT_DIR} ({summarize(results)})")
+    if failed:
+        raise RuntimeError(f"{len(failed)} MedlinePlus page(s) failed to fetch")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+# packages/rag/fetcher.py
+"""
+Concurrent, conditional fetcher used by ingest/fetch.py and scripts/fetch_medlineplus.py.
+
+- One shared httpx.AsyncClient (connection pool) for the whole run.
+- Per-host rate limiting instead of a global sleep between requests.
+- Conditional GETs (If-None-Match / If-Modified-Since) driven by a small
+  SQLite fetch-state DB keyed by the source name (e.g. data/sources.yml `name`).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_STATE_PATH = os.getenv("FETCH_STATE_PATH", "data/fetch_state.sqlite3")
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/114.0 Safari/537.36"
+)
+
+
+@dataclass
+class FetchResult:
+    name: str
+    url: str
+    status: str  # "fetched" | "not-modified" | "failed"
+    path: Optional[Path] = None
+    error: Optional[str] = None
+    elapsed_ms: int = 0
+
+
+class FetchState:
+    """ETag / Last-Modified bookkeeping, one row per source key."""
+
+    def __init__(self, path: str | os.PathLike = DEFAULT_STATE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("""CREATE TABLE IF NOT EXISTS fetch_state (
+          name TEXT PRIMARY KEY, url TEXT NOT NULL,
+          etag TEXT, last_modified TEXT, sha256 TEXT,
+          fetched_at TEXT, checked_at TEXT)""")
+        self.db.commit()
+
+    def get(self, name: str) -> Optional[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM fetch_state WHERE name=?", (name,)).fetchone()
+
+    def record(self, name: str, url: str, *, etag=None, last_modified=None, sha256=None, changed: bool):
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        if changed:
+            self.db.execute(
+                """INSERT INTO fetch_state(name, url, etag, last_modified, sha256, fetched_at, checked_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET url=excluded.url, etag=excluded.etag,
+                     last_modified=excluded.last_modified, sha256=excluded.sha256,
+                     fetched_at=excluded.fetched_at, checked_at=excluded.checked_at""",
+                (name, url, etag, last_modified, sha256, now, now),
+            )
+        else:
+            self.db.execute("UPDATE fetch_state SET checked_at=? WHERE name=?", (now, name))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class HostRateLimiter:
+    """Allow at most one request start per `interval` seconds for each host."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def wait(self, host: str):
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._locks[host]:
+            now = loop.time()
+            at = self._next.get(host, now)
+            if at > now:
+                await asyncio.sleep(at - now)
+            self._next[host] = max(at, now) + self.interval
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_suffix(path.suffix + ".part")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+async def fetch_all(
+    sources: Iterable[Mapping[str, Any]],
+    out_dir: Path,
+    *,
+    filename: Callable[[Mapping[str, Any]], str] = lambda s: f"{s['name']}.html",
+    transform: Optional[Callable[[httpx.Response], bytes]] = None,
+    concurrency: int = 16,
+    per_host_interval: float = 1.0,
+    state: Optional[FetchState] = None,
+    force: bool = False,
+    headers: Optional[Dict[str, str]] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> List[FetchResult]:
+    """
+    Fetch every source ({"name", "url"}) into out_dir, transferring only what changed.
+    `transform` turns a 200 response into the bytes to store (default: raw body).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    own_state = state is None
+    state = state or FetchState()
+    limiter = HostRateLimiter(per_host_interval)
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def one(client: httpx.AsyncClient, src: Mapping[str, Any]) -> FetchResult:
+        name, url = src["name"], src["url"]
+        path = out_dir / filename(src)
+        req_headers: Dict[str, str] = {}
+        prev = state.get(name)
+        if prev is not None and path.exists() and not force:
+            if prev["etag"]:
+                req_headers["If-None-Match"] = prev["etag"]
+            if prev["last_modified"]:
+                req_headers["If-Modified-Since"] = prev["last_modified"]
+
+        async with sem:
+            await limiter.wait(urlsplit(url).netloc)
+            t0 = time.perf_counter()
+            try:
+                r = await client.get(url, headers=req_headers)
+                elapsed = int((time.perf_counter() - t0) * 1000)
+                if r.status_code == 304:
+                    state.record(name, url, changed=False)
+                    return FetchResult(name, url, "not-modified", path, elapsed_ms=elapsed)
+                r.raise_for_status()
+            except Exception as e:
+                elapsed = int((time.perf_counter() - t0) * 1000)
+                return FetchResult(name, url, "failed", error=str(e), elapsed_ms=elapsed)
+
+        body = transform(r) if transform else r.content
+        digest = hashlib.sha256(body).hexdigest()
+        # Servers without validators still avoid a rewrite when the body is identical
+        changed = not (prev is not None and prev["sha256"] == digest and path.exists())
+        if changed:
+            _write_atomic(path, body)
+        state.record(
+            name, url,
+            etag=r.headers.get("etag"),
+            last_modified=r.headers.get("last-modified"),
+            sha256=digest,
+            changed=True,
+        )
+        return FetchResult(name, url, "fetched" if changed else "not-modified", path, elapsed_ms=elapsed)
+
+    try:
+        async with httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, **(headers or {})},
+            timeout=30,
+            follow_redirects=True,
+            limits=limits,
+            transport=transport,
+        ) as client:
+            return list(await asyncio.gather(*(one(client, s) for s in sources)))
+    finally:
+        if own_state:
+            state.close()
+
+
+def summarize(results: List[FetchResult]) -> str:
+    counts: Dict[str, int] = defaultdict(int)
+    for r in results:
+        counts[r.status] += 1
+    return ", ".join(f"{k}: {counts[k]}" for k in ("fetched", "not-modified", "failed"))
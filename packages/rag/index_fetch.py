@@ -1,34 +1,44 @@
 # ingest/fetch.py
-import httpx, time, yaml
+import argparse, asyncio, sys, yaml
 from pathlib import Path
 
+# Allow `python ingest/fetch.py` from the repo root to import shared packages
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from packages.rag.fetcher import fetch_all, summarize  # noqa: E402
+
 # Make sure raw data folder exists
 RAW = Path("data/raw")
 RAW.mkdir(parents=True, exist_ok=True)
+SOURCES = Path("data/sources.yml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh curated sources into data/raw")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max in-flight requests (default=16)")
+    parser.add_argument("--per-host-interval", type=float, default=1.0,
+                        help="Polite delay between requests to the same host, seconds (default=1.0)")
+    parser.add_argument("--force", action="store_true", help="Ignore ETag/Last-Modified and refetch everything")
+    args = parser.parse_args()
+
+    # Load curated sources from YAML
+    with SOURCES.open("r", encoding="utf-8") as f:
+        sources = yaml.safe_load(f) or []
+
+    results = asyncio.run(fetch_all(
+        sources, RAW,
+        concurrency=args.concurrency,
+        per_host_interval=args.per_host_interval,
+        force=args.force,
+    ))
+    for r in results:
+        if r.status == "failed":
+            print("FAILED:", r.name, r.error)
+        elif r.status == "not-modified":
+            print("Unchanged:", r.path.name)
+        else:
+            print(f"Fetched: {r.url} ({r.elapsed_ms} ms)")
+    print("Done →", summarize(results))
+
 
-# Load curated sources from YAML
-with open("data/sources.yml", "r", encoding="utf-8") as f:
-    sources = yaml.safe_load(f)
-
-def fetch(url, fname):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                      "AppleWebKit/537.36 (KHTML, like Gecko) "
-                      "Chrome/114.0 Safari/537.36"
-    }
-    # follow_redirects=True lets us handle 301/302 automatically
-    r = httpx.get(url, headers=headers, timeout=30, follow_redirects=True)
-    r.raise_for_status()
-    (RAW/fname).write_bytes(r.content)
-
-for s in sources:
-    fname = f"{s['name']}.html"
-    if not (RAW/fname).exists():
-        try:
-            print("Fetching:", s["url"])
-            fetch(s["url"], fname)
-            time.sleep(1.0)  # polite delay
-        except Exception as e:
-            print("FAILED:", s["name"], e)
-    else:
-        print("Already exists:", fname)
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,146 @@
 # ingest/clean.py
 from pathlib import Path
 from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import argparse
+import hashlib
+import json
+import os
 import re
 import csv
 from datetime import datetime
 
 RAW = Path("data/raw")
 CLEAN = Path("data/clean")
-CLEAN.mkdir(parents=True, exist_ok=True)
 REPORT = Path("data/clean_report.csv")
+# raw file name -> sha256 of the HTML that produced the current .md
+STATE = Path("data/clean_state.json")
 
-# Phrases & patterns to strip explicitly
-NOISE_PATTERNS = [
+FIELDNAMES = ["timestamp", "file", "output_file", "raw_words", "cleaned_words", "removed_words"]
+
+# Phrases & patterns to strip explicitly (compiled once per process)
+NOISE_PATTERNS = [re.compile(p, re.I) for p in (
     r"On this page.*",        # MedlinePlus menu
     r"Skip to main content",  # WHO pages
     r"Regions.*",             # WHO region links
     r"Select language.*",     # WHO language selector
     r"Basics", r"Summary", r"Start Here",  # MedlinePlus page menus
-]
-
-def clean_html(html: str) -> str:
-    """Clean HTML content and return plain text."""
-    soup = BeautifulSoup(html, "html.parser")
+)]
+NAV_ATTR = re.compile(r"(nav|menu|breadcrumb)", re.I)
+MULTI_NEWLINES = re.compile(r"\n{2,}")
 
+def _clean_soup(soup: BeautifulSoup) -> str:
+    """Strip noise from an already-parsed document and return plain text."""
     # Remove common noisy sections
     for tag in soup(["script", "style", "header", "footer", "nav", "aside", "form"]):
         tag.decompose()
 
     # Remove elements with nav-like classes or ids
-    for noisy in soup.find_all(attrs={"class": re.compile(r"(nav|menu|breadcrumb)", re.I)}):
+    for noisy in soup.find_all(attrs={"class": NAV_ATTR}):
         noisy.decompose()
-    for noisy in soup.find_all(attrs={"id": re.compile(r"(nav|menu|breadcrumb)", re.I)}):
+    for noisy in soup.find_all(attrs={"id": NAV_ATTR}):
         noisy.decompose()
 
     text = soup.get_text("\n", strip=True)
 
     # Remove noisy patterns
     for pat in NOISE_PATTERNS:
-        text = re.sub(pat, "", text, flags=re.I)
+        text = pat.sub("", text)
 
     # Collapse multiple newlines
-    text = re.sub(r"\n{2,}", "\n\n", text)
+    text = MULTI_NEWLINES.sub("\n\n", text)
 
     return text.strip()
 
-def process_file(path: Path, writer, timestamp):
-    """Clean one HTML file, save as Markdown, and log word counts."""
+def clean_html(html: str, parser: str = "html.parser") -> str:
+    """Clean HTML content and return plain text."""
+    return _clean_soup(BeautifulSoup(html, parser))
+
+def process_file(path: Path, parser: str = "html.parser", out_dir: Path = CLEAN) -> dict:
+    """Clean one HTML file (single parse), save as Markdown, and return its report row."""
     raw_html = path.read_text(encoding="utf-8", errors="ignore")
+    soup = BeautifulSoup(raw_html, parser)
 
-    # Word count before cleaning
-    raw_text = BeautifulSoup(raw_html, "html.parser").get_text(" ", strip=True)
-    raw_words = len(raw_text.split())
+    # Word count before cleaning (same tree, read before any decompose)
+    raw_words = len(soup.get_text(" ", strip=True).split())
 
     # Cleaned text
-    cleaned = clean_html(raw_html)
+    cleaned = _clean_soup(soup)
     cleaned_words = len(cleaned.split())
 
-    out_path = CLEAN / (path.stem + ".md")
+    out_path = out_dir / (path.stem + ".md")
     out_path.write_text(cleaned, encoding="utf-8")
 
-    removed = raw_words - cleaned_words
-    print(f"✅ Cleaned {path.name} → {out_path.name}")
-    print(f"   Words kept: {cleaned_words}, removed: {removed} (from {raw_words})")
-
-    # Append row to CSV
-    writer.writerow({
-        "timestamp": timestamp,
+    return {
         "file": path.name,
         "output_file": out_path.name,
         "raw_words": raw_words,
         "cleaned_words": cleaned_words,
-        "removed_words": removed
-    })
-
-if __name__ == "__main__":
+        "removed_words": raw_words - cleaned_words,
+    }
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def _load_state(state_path: Path = STATE) -> dict:
+    if state_path.exists():
+        return json.loads(state_path.read_text(encoding="utf-8"))
+    return {}
+
+def _pick_parser(name: str) -> str:
+    if name != "auto":
+        return name
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+def clean_all(raw_dir: Path = RAW, out_dir: Path = CLEAN, state_path: Path = STATE,
+              parser: str = "html.parser", workers: int = 1, force: bool = False) -> tuple:
+    """
+    Clean every changed raw/*.html into out_dir/*.md, across `workers`
+    processes (1 = in this process). Returns (report rows, skipped count).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    file_exists = REPORT.exists()
-    with REPORT.open("a", newline="", encoding="utf-8") as csvfile:
-        fieldnames = ["timestamp", "file", "output_file", "raw_words", "cleaned_words", "removed_words"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    # Skip files whose raw HTML hasn't changed since the last run
+    state = _load_state(state_path)
+    todo, hashes, skipped = [], {}, 0
+    for html_file in sorted(raw_dir.glob("*.html")):
+        digest = _sha256(html_file)
+        out_exists = (out_dir / (html_file.stem + ".md")).exists()
+        if not force and state.get(html_file.name) == digest and out_exists:
+            print(f"⏭️  Unchanged {html_file.name}")
+            skipped += 1
+            continue
+        todo.append(html_file)
+        hashes[html_file.name] = digest
+
+    rows = []
+    if todo:
+        workers = max(1, min(workers, len(todo)))
+        args = (todo, [parser] * len(todo), [out_dir] * len(todo))
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+            results = (pool.map(process_file, *args, chunksize=max(1, len(todo) // (workers * 4)))
+                       if pool else map(process_file, *args))
+            for row in results:
+                print(f"✅ Cleaned {row['file']} → {row['output_file']}")
+                print(f"   Words kept: {row['cleaned_words']}, removed: {row['removed_words']} (from {row['raw_words']})")
+                rows.append({"timestamp": timestamp, **row})
+                state[row["file"]] = hashes[row["file"]]
+        state_path.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    return rows, skipped
+
+def write_report(rows: list, report: Path = REPORT):
+    """Append one run's rows to the CSV report (one batched write per run)."""
+    if not rows:
+        return
+    file_exists = report.exists()
+    with report.open("a", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
 
         # Write header if file is new
         if not file_exists:
@@ -89,5 +150,17 @@ if __name__ == "__main__":
         if file_exists:
             csvfile.write("\n")
 
-        for html_file in RAW.glob("*.html"):
-            process_file(html_file, writer, timestamp)
+        writer.writerows(rows)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Clean data/raw/*.html into data/clean/*.md")
+    ap.add_argument("--parser", default="html.parser",
+                    help="BeautifulSoup parser: html.parser (default), lxml, or auto (lxml when installed)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Process pool size")
+    ap.add_argument("--force", action="store_true", help="Re-clean files even if the raw hash is unchanged")
+    args = ap.parse_args()
+    parser = _pick_parser(args.parser)
+
+    rows, skipped = clean_all(parser=parser, workers=args.workers, force=args.force)
+    write_report(rows)
+    print(f"Cleaned {len(rows)} file(s) with {parser}; skipped {skipped} unchanged.")
@@ -0,0 +1,140 @@
+# packages/rag/langid.py
+"""
+Language identification for incoming questions: english | roman-urdu | urdu-script.
+
+Three signals, all precomputed at import so a call costs a few microseconds:
+  1. Script range check: Arabic-script letters → urdu-script.
+  2. Token-level marker sets (whole words, never substrings, so "make",
+     "skin", "domain" and "chain" no longer look like Roman Urdu).
+  3. A small character-trigram model (Roman Urdu vs English) for queries with
+     no decisive markers.
+Pure and deterministic: safe to call from agent graph nodes.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+ENGLISH = "english"
+ROMAN_URDU = "roman-urdu"
+URDU_SCRIPT = "urdu-script"
+
+_ARABIC_RANGES = ((0x0600, 0x06FF), (0x0750, 0x077F), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF))
+_WORD = re.compile(r"[a-z']+")
+
+# Words that are (almost) never English; each one is strong evidence.
+STRONG_UR = frozenset("""
+hai hain hy kya kia nahi nahin nhi mujhe mujhay kaise kese kaisay kyun kyon kyu aur hota hoti hote
+mein mera meri mere tum tumhe aap apna apni apne karna karein karen karun raha rahi rahe tha thi
+kuch bohat bohot bahut zyada sakta sakti sakte chahiye liye kab kahan kaun wala wali wale yeh woh
+ko se ke ki ka hun hoon jata jati jate sirf bhi phir agar jab kabhi hamesha acha achha theek thik
+""".split())
+# Shared with English or too short to trust alone.
+WEAK_UR = frozenset("main me na to is ho hi ye wo par pe ab sab din log".split())
+ENGLISH_FUNCTION = frozenset("""
+the a an is are was were be been of to in on at for with from by and or but not no do does did
+what how why when where which who whom can could should would will my your his her our their i you
+he she it we they this that these those have has had get about into than then there here if so
+""".split())
+
+# Seed text for the character model (kept small; style mirrors our traffic).
+# Training only: none of it may come from packages/rag/data/langid_eval.tsv or
+# the tests, which are the held-out set (tests/rag/test_langid.py checks).
+_SEED_UR = """
+imtehan ki tayari mein fikr hona fitri baat hai kabhi kabhi dil udaas ho jata hai magar iska matlab
+kamzori nahi raat ko der tak jaagte rehna aam hai aur bohot se log is se guzarte hain kisi qareebi
+dost se dil ki baat karna bojh halka kar deta hai jab har cheez mushkil lage to madad maangna bilkul
+sahi hai jin kaamon mein pehle maza aata tha ab un mein dil nahi lagta chirchirapan hamesha gussa nahi
+balke thakan bhi ho sakta hai ghabrahat aksar dabao ki nishani hoti hai har shakhs mein udaasi ki
+alamaat alag hoti hain kuch log din bhar thake rehte hain mujhe raat ko sukoon kyun nahi milta saans
+tez chal rahi hai ab kya karna chahiye fikr se kaise bachein apne dimagh ka khayal rakhna zaroori hai
+yeh aam maloomat hai tibbi mashwara nahi agar khatra mehsoos ho to foran madad lein
+"""
+_SEED_EN = """
+feeling nervous before a test is very common having a low day does not make you weak many people lie
+awake at night and that is okay sharing worries with a friend you trust can lighten the load when life
+feels heavy reaching out for support is a good step hobbies you once loved may lose their spark being
+short tempered is often a sign of strain rather than anger worry can be a signal that you are under
+pressure low mood looks different in every person some people feel drained from morning to night how
+do i calm down before a presentation what helps with racing thoughts at bedtime why do i wake up so
+early is it okay to talk to a counselor does a skincare routine help my mood research in the domain
+of sleep a chain of small habits the main idea is to rest and take it one day at a time this is
+general wellness information not medical care
+"""
+
+
+def _trigrams(text: str) -> Iterable[str]:
+    for w in _WORD.findall(text.lower()):
+        padded = f" {w} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def _train(seed: str) -> Dict[str, float]:
+    counts = Counter(_trigrams(seed))
+    total = sum(counts.values())
+    vocab = len(counts) + 1
+    table = {g: math.log((c + 1) / (total + vocab)) for g, c in counts.items()}
+    table[""] = math.log(1 / (total + vocab))  # unseen trigram
+    return table
+
+
+_MODEL_UR = _train(_SEED_UR)
+_MODEL_EN = _train(_SEED_EN)
+
+
+@dataclass(frozen=True)
+class LangResult:
+    lang: str
+    confidence: float  # 0.5 (coin flip) … 1.0
+
+
+def _arabic_ratio(text: str) -> float:
+    letters = arabic = 0
+    for ch in text:
+        if ch.isalpha():
+            letters += 1
+            cp = ord(ch)
+            if any(lo <= cp <= hi for lo, hi in _ARABIC_RANGES):
+                arabic += 1
+    return arabic / letters if letters else 0.0
+
+
+def _ngram_llr(text: str) -> float:
+    """Mean per-trigram log-likelihood ratio, positive → Roman Urdu."""
+    unseen_ur, unseen_en = _MODEL_UR[""], _MODEL_EN[""]
+    n = 0
+    score = 0.0
+    for g in _trigrams(text):
+        score += _MODEL_UR.get(g, unseen_ur) - _MODEL_EN.get(g, unseen_en)
+        n += 1
+    return score / n if n else 0.0
+
+
+def identify(text: str) -> LangResult:
+    """Classify `text` and return the label with a confidence in [0.5, 1]."""
+    ratio = _arabic_ratio(text)
+    if ratio >= 0.3:
+        return LangResult(URDU_SCRIPT, round(0.5 + ratio / 2, 3))
+
+    words = _WORD.findall(text.lower())
+    if not words:
+        return LangResult(ENGLISH, 0.5)
+    strong = sum(1 for w in words if w in STRONG_UR)
+    weak = sum(1 for w in words if w in WEAK_UR)
+    eng = sum(1 for w in words if w in ENGLISH_FUNCTION and w not in WEAK_UR)
+
+    # Logistic over marker balance + character model; weights tuned on scripts/bench_langid.py
+    z = (2.0 * strong + 0.5 * weak - 1.5 * eng) / math.sqrt(len(words)) + 1.5 * _ngram_llr(text) - 0.3
+    p_ur = 1.0 / (1.0 + math.exp(-z))
+    if p_ur >= 0.5:
+        return LangResult(ROMAN_URDU, round(p_ur, 3))
+    return LangResult(ENGLISH, round(1.0 - p_ur, 3))
+
+
+def detect_language(text: str) -> str:
+    """Label only; drop-in for the old substring heuristic."""
+    return identify(text).lang
@@ -0,0 +1,30 @@
+# packages/rag/latency.py
+"""
+Latency helpers shared by the retriever batch mode and the benchmarks.
+"""
+from __future__ import annotations
+
+import statistics
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0..100); 0.0 for an empty sequence."""
+    xs = sorted(values)
+    if not xs:
+        return 0.0
+    k = min(len(xs) - 1, max(0, round(p / 100 * (len(xs) - 1))))
+    return xs[k]
+
+
+def summarize(values: Sequence[float], digits: int = 1) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of `values`, rounded for printing or JSON."""
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(values, 50), digits),
+        "p95": round(percentile(values, 95), digits),
+        "p99": round(percentile(values, 99), digits),
+        "mean": round(statistics.fmean(values), digits),
+        "max": round(max(values), digits),
+    }
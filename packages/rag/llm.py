@@ -0,0 +1,73 @@
+# packages/rag/llm.py
+"""
+Chat model selection for the query API.
+
+LLM_PROVIDER:
+  - "openai" (default): gpt-4o-mini when OPENAI_API_KEY is set, otherwise no
+    LLM (retriever-only answers).
+  - "fake": canned bilingual answers after FAKE_LLM_LATENCY_MS (± jitter), with
+    usage metadata, so load tests exercise the full ask path with no network
+    and no API spend.
+  - "none": retriever-only even when a key is set.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.25"))
+
+
+def llm_provider() -> str:
+    return os.getenv("LLM_PROVIDER", "openai").strip().lower()
+
+
+class FakeChatModel:
+    """invoke/ainvoke stand-in for ChatOpenAI: sleeps like a model call, answers from the prompt."""
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, jitter: float = FAKE_LLM_JITTER, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def _delay(self) -> float:
+        spread = self.latency_ms * self.jitter
+        return max(0.0, self.latency_ms + self._rng.uniform(-spread, spread)) / 1000
+
+    def _reply(self, prompt: Any) -> AIMessage:
+        self.calls += 1
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        return AIMessage(
+            content="**English Answer**: (fake) Thank you for asking.\n"
+                    "**Roman Urdu Answer**: (fake) Poochne ka shukriya.\n**Source**: fake",
+            usage_metadata={"input_tokens": len(text) // 4, "output_tokens": 24, "total_tokens": len(text) // 4 + 24},
+        )
+
+    def invoke(self, prompt: Any) -> AIMessage:
+        time.sleep(self._delay())
+        return self._reply(prompt)
+
+    async def ainvoke(self, prompt: Any) -> AIMessage:
+        await asyncio.sleep(self._delay())
+        return self._reply(prompt)
+
+
+def chat_model_from_env(api_key: Optional[str] = None) -> Tuple[Any, str]:
+    """(llm or None, mode label) for LLM_PROVIDER."""
+    provider = llm_provider()
+    if provider == "fake":
+        return FakeChatModel(), "retriever+LLM (fake)"
+    if provider == "none" or (provider == "openai" and not api_key):
+        return None, "retriever-only"
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=api_key), "retriever+LLM"
+    raise ValueError(f"Unknown LLM_PROVIDER: {provider!r} (expected 'openai', 'fake' or 'none')")
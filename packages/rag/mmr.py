@@ -0,0 +1,114 @@
+# packages/rag/mmr.py
+"""
+Over-fetch → diversify: maximal marginal relevance over retrieved candidates.
+
+`diversify()` embeds the query once, pulls `fetch_k` candidates together with
+their stored vectors straight from the FAISS index (search_and_reconstruct,
+no re-embedding), and `mmr_select()` picks `k` of them using one candidate ×
+candidate matrix product. Selection stops at `budget_ms`; any remaining slots
+are filled by plain relevance order, so the call never overruns its budget by
+more than one greedy step.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+MMR_BUDGET_MS = float(os.getenv("MMR_BUDGET_MS", "5"))
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def mmr_select(
+    query_vec: Sequence[float] | np.ndarray,
+    cand_vecs: np.ndarray,
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+    budget_ms: Optional[float] = MMR_BUDGET_MS,
+) -> List[int]:
+    """
+    Indices of `k` candidates maximising
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected).
+    """
+    n = len(cand_vecs)
+    if n == 0 or k <= 0:
+        return []
+    deadline = time.perf_counter() + budget_ms / 1000 if budget_ms is not None else None
+    C = _unit(np.asarray(cand_vecs, dtype="float32"))
+    q = _unit(np.asarray(query_vec, dtype="float32"))
+    relevance = C @ q
+    pairwise = C @ C.T  # the one matrix product
+
+    selected = [int(np.argmax(relevance))]
+    max_sim = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, n):
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        score = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, pairwise[best], out=max_sim)
+
+    if len(selected) < min(k, n):  # budget hit: top up by relevance
+        for i in np.argsort(-relevance):
+            if available[i]:
+                selected.append(int(i))
+                available[i] = False
+                if len(selected) == k:
+                    break
+    return selected
+
+
+def search_with_vectors(db, query_vec: Sequence[float], fetch_k: int) -> Tuple[List[Document], np.ndarray, np.ndarray]:
+    """(docs, distances, stored vectors) for the `fetch_k` nearest chunks of a LangChain FAISS store."""
+    q = np.asarray([query_vec], dtype="float32")
+    fetch_k = min(fetch_k, db.index.ntotal)
+    try:
+        distances, ids, vectors = db.index.search_and_reconstruct(q, fetch_k)
+        distances, ids, vectors = distances[0], ids[0], vectors[0]
+    except RuntimeError:  # index type without search_and_reconstruct
+        distances, ids = db.index.search(q, fetch_k)
+        distances, ids = distances[0], ids[0]
+        vectors = np.vstack([db.index.reconstruct(int(i)) for i in ids if i >= 0])
+    keep = ids >= 0
+    docs = [db.docstore.search(db.index_to_docstore_id[int(i)]) for i in ids[keep]]
+    return docs, distances[keep], vectors[: int(keep.sum())]
+
+
+def embed_query(db, query: str) -> List[float]:
+    """Query vector from the store's own embedding function."""
+    fn = db.embedding_function
+    return fn.embed_query(query) if hasattr(fn, "embed_query") else fn(query)
+
+
+def diversify(
+    db,
+    query: str,
+    k: int = 3,
+    fetch_k: int = MMR_FETCH_K,
+    lambda_mult: float = MMR_LAMBDA,
+    budget_ms: Optional[float] = MMR_BUDGET_MS,
+    query_vec: Optional[Sequence[float]] = None,
+) -> List[Tuple[Document, float]]:
+    """
+    Drop-in for `db.similarity_search_with_score(query, k)` returning `k`
+    diverse chunks. Pass `query_vec` when the caller already embedded `query`.
+    """
+    if query_vec is None:
+        query_vec = embed_query(db, query)
+    docs, distances, vectors = search_with_vectors(db, query_vec, max(fetch_k, k))
+    picked = mmr_select(query_vec, vectors, k, lambda_mult=lambda_mult, budget_ms=budget_ms)
+    return [(docs[i], float(distances[i])) for i in picked]
@@ -0,0 +1,211 @@
+# packages/rag/pipeline.py
+"""
+Streaming clean → chunk → embed → index runner with bounded memory.
+
+Documents are read lazily, split one at a time, grouped into embedding batches
+of `batch_size` chunks and appended to the FAISS index as each batch completes.
+Progress is checkpointed next to the target index (`<index>.partial/`), so a
+crash or API error resumes from the last saved batch instead of starting over.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+T = TypeVar("T")
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+# ---------------------------- stage timing -----------------------------------
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    inclusive_s: float = 0.0  # time spent inside next(), upstream stages included
+    self_s: float = 0.0       # filled in by PipelineStats.finalize()
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.self_s if self.self_s > 0 else float("inf")
+
+
+@dataclass
+class PipelineStats:
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    order: List[str] = field(default_factory=list)
+
+    def stage(self, name: str) -> StageStats:
+        if name not in self.stages:
+            self.stages[name] = StageStats(name)
+            self.order.append(name)
+        return self.stages[name]
+
+    def finalize(self):
+        upstream = 0.0
+        for name in self.order:
+            s = self.stages[name]
+            s.self_s = max(0.0, s.inclusive_s - upstream)
+            upstream = s.inclusive_s
+
+    def report(self) -> str:
+        self.finalize()
+        lines = [f"{'stage':<8} {'items':>8} {'seconds':>9} {'items/s':>10}"]
+        for name in self.order:
+            s = self.stages[name]
+            rate = f"{s.rate:10.1f}" if s.self_s > 0 else f"{'-':>10}"
+            lines.append(f"{name:<8} {s.items:>8} {s.self_s:>9.2f} {rate}")
+        return "\n".join(lines)
+
+
+def _timed(it: Iterable[T], stats: StageStats, weight: Callable[[T], int] = lambda _: 1) -> Iterator[T]:
+    """Wrap a generator so the time spent producing each item is attributed to `stats`."""
+    it = iter(it)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            stats.inclusive_s += time.perf_counter() - t0
+            return
+        stats.inclusive_s += time.perf_counter() - t0
+        stats.items += weight(item)
+        yield item
+
+
+# ---------------------------- stages ------------------------------------------
+
+def iter_cleaned_docs(clean_dir: str | os.PathLike) -> Iterator[Document]:
+    """Yield one Document per cleaned .md file, in a stable (sorted) order."""
+    for path in sorted(Path(clean_dir).glob("*.md")):
+        yield Document(page_content=path.read_text(encoding="utf-8"), metadata={"source": path.name})
+
+
+def iter_chunks(docs: Iterable[Document], splitter: RecursiveCharacterTextSplitter) -> Iterator[Document]:
+    for doc in docs:
+        yield from splitter.split_documents([doc])
+
+
+def batched(it: Iterable[T], n: int) -> Iterator[List[T]]:
+    it = iter(it)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+def _fingerprint(clean_dir: Path, **params) -> str:
+    """Inputs + settings; a checkpoint is only resumed when this matches."""
+    h = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+    for path in sorted(clean_dir.glob("*.md")):
+        st = path.stat()
+        h.update(f"{path.name}:{st.st_size}:{int(st.st_mtime)}".encode())
+    return h.hexdigest()
+
+
+# ---------------------------- runner ------------------------------------------
+
+def build_index(
+    clean_dir: str | os.PathLike,
+    index_path: str | os.PathLike,
+    embeddings: Embeddings,
+    *,
+    batch_size: int = 64,
+    checkpoint_every: int = 10,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    log: Callable[[str], None] = print,
+) -> PipelineStats:
+    """
+    Stream cleaned docs into a FAISS index at `index_path`.
+    Checkpoints every `checkpoint_every` batches and whenever a batch fails.
+    """
+    clean_dir, index_path = Path(clean_dir), Path(index_path)
+    partial = index_path.with_name(index_path.name + ".partial")
+    ckpt_file = partial / CHECKPOINT_FILE
+    fingerprint = _fingerprint(
+        clean_dir, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+        embeddings=type(embeddings).__name__, model=getattr(embeddings, "model", None),
+    )
+
+    db: Optional[FAISS] = None
+    done = 0
+    if ckpt_file.exists():
+        ckpt = json.loads(ckpt_file.read_text(encoding="utf-8"))
+        if ckpt.get("fingerprint") == fingerprint:
+            db = FAISS.load_local(partial.as_posix(), embeddings, allow_dangerous_deserialization=True)
+            done = int(ckpt["chunks_done"])
+            log(f"[INFO] Resuming from checkpoint: {done} chunks already indexed")
+        else:
+            log("[INFO] Inputs changed since last checkpoint; starting fresh")
+            shutil.rmtree(partial, ignore_errors=True)
+
+    def checkpoint():
+        if db is None:
+            return
+        db.save_local(partial.as_posix())
+        ckpt_file.write_text(json.dumps({"fingerprint": fingerprint, "chunks_done": done}), encoding="utf-8")
+
+    stats = PipelineStats()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    docs = _timed(iter_cleaned_docs(clean_dir), stats.stage("load"))
+    chunks = _timed(iter_chunks(docs, splitter), stats.stage("chunk"))
+    # Chunking is deterministic, so already-indexed chunks are skipped by position
+    pending = islice(chunks, done, None)
+
+    embed_stats, index_stats = stats.stage("embed"), stats.stage("index")
+    batches_since_ckpt = 0
+    try:
+        for batch in batched(pending, batch_size):
+            texts = [c.page_content for c in batch]
+            metas = [c.metadata for c in batch]
+
+            t0 = time.perf_counter()
+            vectors = embeddings.embed_documents(texts)
+            embed_stats.inclusive_s += time.perf_counter() - t0
+            embed_stats.items += len(batch)
+
+            t0 = time.perf_counter()
+            pairs = list(zip(texts, vectors))
+            if db is None:
+                db = FAISS.from_embeddings(pairs, embeddings, metadatas=metas)
+            else:
+                db.add_embeddings(pairs, metadatas=metas)
+            index_stats.inclusive_s += time.perf_counter() - t0
+            index_stats.items += len(batch)
+
+            done += len(batch)
+            batches_since_ckpt += 1
+            if batches_since_ckpt >= checkpoint_every:
+                checkpoint()
+                batches_since_ckpt = 0
+                log(f"[INFO] Checkpoint: {done} chunks indexed")
+    except BaseException:
+        checkpoint()
+        log(f"[ERROR] Pipeline interrupted; checkpoint saved at {done} chunks ({partial})")
+        raise
+
+    # embed/index are timed outside the generator chain; make their totals inclusive
+    embed_stats.inclusive_s += stats.stages["chunk"].inclusive_s
+    index_stats.inclusive_s += embed_stats.inclusive_s
+
+    if db is None:
+        log("[ERROR] No cleaned documents found. Run clean.py first.")
+        return stats
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    db.save_local(index_path.as_posix())
+    shutil.rmtree(partial, ignore_errors=True)
+    log(f"[SUCCESS] Saved FAISS index with {done} chunks to {index_path}")
+    return stats
@@ -0,0 +1,155 @@
+# packages/rag/query_log.py
+"""
+Buffered, background query logging for the retriever CLI and the query API.
+
+Callers only enqueue records; a BatchWriter thread writes them in batches when
+`flush_every` records are pending or `flush_interval` seconds have passed.
+Files keep their existing layout under LOG_DIR:
+  - query_log_YYYY-MM-DD.csv   one row per (query, result)
+  - last_answer.txt            latest answer only
+  - all_answers.txt            today's answers; rotated on day change to
+                               all_answers_YYYY-MM-DD.txt.gz
+Past days' query_log CSVs are gzip-compressed on rotation.
+"""
+from __future__ import annotations
+
+import csv
+import datetime
+import gzip
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from packages.rag.batch_writer import BatchWriter
+
+CSV_HEADER = ["timestamp", "query", "mode", "source", "similarity", "snippet", "answer"]
+
+
+def _gzip_file(path: Path):
+    """Compress `path` to `path.gz` and remove the original."""
+    gz = path.with_name(path.name + ".gz")
+    with path.open("rb") as src, gzip.open(gz, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    path.unlink()
+
+
+class QueryLogger:
+    def __init__(
+        self,
+        log_dir: str | os.PathLike = "logs",
+        *,
+        enabled: bool = True,
+        flush_every: int = 50,
+        flush_interval: float = 2.0,
+        max_queue: int = 10000,
+    ):
+        self.log_dir = Path(log_dir)
+        self.enabled = enabled
+        self._day: Optional[str] = None
+        self._writer: Optional[BatchWriter] = None
+        if enabled:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            self._writer = BatchWriter(self._write, name="query-logger", flush_every=flush_every,
+                                       flush_interval=flush_interval, max_queue=max_queue)
+
+    @property
+    def dropped(self) -> int:
+        return self._writer.dropped if self._writer else 0
+
+    # ---- public interface (non-blocking) ----
+    def log_query(self, query: str, mode: str, results: Sequence[Tuple[str, float, str]], answer: Optional[str] = None):
+        now = datetime.datetime.now().isoformat()
+        ans = answer[:200].replace("\n", " ") if answer else ""
+        rows = [[now, query, mode, src, f"{sim:.4f}", snippet[:200].replace("\n", " "), ans]
+                for src, sim, snippet in results]
+        self._put(("csv", rows))
+
+    def save_last_answer(self, answer: str):
+        self._put(("last", answer))
+
+    def append_answer_history(self, user_query: str, answer: str):
+        entry = (
+            "=" * 60 + "\n"
+            + f"Timestamp: {datetime.datetime.now().isoformat()}\n"
+            + f"Query: {user_query}\n\n"
+            + answer.strip() + "\n"
+            + "=" * 60 + "\n\n"
+        )
+        self._put(("history", entry))
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything enqueued so far is on disk (tests, shutdown)."""
+        if self._writer:
+            self._writer.flush(timeout)
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+    # ---- writer thread ----
+    def _put(self, item):
+        if self._writer:
+            self._writer.put(item)
+
+    def _today(self) -> str:
+        return datetime.date.today().strftime("%Y-%m-%d")
+
+    def _write(self, batch: List[Tuple[str, Any]]):
+        self._maybe_rotate()
+        csv_rows: List[List[str]] = []
+        history: List[str] = []
+        last: Optional[str] = None
+        for kind, payload in batch:
+            if kind == "csv":
+                csv_rows.extend(payload)
+            elif kind == "history":
+                history.append(payload)
+            elif kind == "last":
+                last = payload
+
+        if csv_rows:
+            logfile = self.log_dir / f"query_log_{self._day}.csv"
+            newfile = not logfile.exists()
+            with logfile.open("a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if newfile:
+                    writer.writerow(CSV_HEADER)
+                writer.writerows(csv_rows)
+        if history:
+            with (self.log_dir / "all_answers.txt").open("a", encoding="utf-8") as f:
+                f.write("".join(history))
+        if last is not None:
+            (self.log_dir / "last_answer.txt").write_text(last, encoding="utf-8")
+
+    def _maybe_rotate(self):
+        today = self._today()
+        if self._day == today:
+            return
+        history = self.log_dir / "all_answers.txt"
+        if history.exists():
+            mday = datetime.date.fromtimestamp(history.stat().st_mtime).strftime("%Y-%m-%d")
+            prev = self._day or mday
+            if prev != today:
+                target = self.log_dir / f"all_answers_{prev}.txt"
+                if not target.exists() and not target.with_name(target.name + ".gz").exists():
+                    history.rename(target)
+                    _gzip_file(target)
+        for old in self.log_dir.glob("query_log_*.csv"):
+            if old.stem != f"query_log_{today}":
+                _gzip_file(old)
+        self._day = today
+
+
+_LOGGERS: Dict[str, QueryLogger] = {}
+_LOCK = threading.Lock()
+
+
+def get_query_logger(log_dir: str | os.PathLike = "logs", **kwargs) -> QueryLogger:
+    """Process-wide logger per directory, shared by the CLI and API routers."""
+    key = str(Path(log_dir).resolve())
+    with _LOCK:
+        if key not in _LOGGERS:
+            _LOGGERS[key] = QueryLogger(log_dir, **kwargs)
+        return _LOGGERS[key]
@@ -1,8 +1,9 @@
 import os
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
+import argparse
+
+from packages.rag.embed_store import EmbeddingStore
+from packages.rag.embeddings import INDEX_EMBEDDING_MODEL, cached_embeddings
+from packages.rag.pipeline import build_index
 
 # Paths
 CLEAN_DIR = "data/clean"
@@ -12,38 +13,26 @@ INDEX_PATH = os.path.join(INDEX_DIR, "index")
 # Ensure index folder exists
 os.makedirs(INDEX_DIR, exist_ok=True)
 
-def load_cleaned_docs():
-    docs = []
-    for fname in os.listdir(CLEAN_DIR):
-        if fname.endswith(".md"):
-            with open(os.path.join(CLEAN_DIR, fname), "r", encoding="utf-8") as f:
-                text = f.read()
-                docs.append(Document(page_content=text, metadata={"source": fname}))
-    return docs
-
 def main():
-    print("[INFO] Loading cleaned documents from:", CLEAN_DIR)
-    documents = load_cleaned_docs()
-    print(f"[INFO] Loaded {len(documents)} documents")
-
-    if not documents:
-        print("[ERROR] No cleaned documents found. Run clean.py first.")
-        return
-
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.split_documents(documents)
-    print(f"[INFO] Split into {len(splits)} chunks")
-
-    # Create embeddings
-    embeddings = OpenAIEmbeddings()
-
-    # Build FAISS index
-    db = FAISS.from_documents(splits, embeddings)
-
-    # Save index
-    db.save_local(INDEX_PATH)
-    print(f"[SUCCESS] Saved FAISS index with {len(splits)} chunks to {INDEX_PATH}")
+    parser = argparse.ArgumentParser(description="Stream data/clean into the FAISS index")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding batch (default=64)")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Batches between checkpoints (default=10)")
+    args = parser.parse_args()
+
+    print("[INFO] Streaming cleaned documents from:", CLEAN_DIR)
+
+    # Create embeddings via EMBEDDING_PROVIDER (unchanged chunks are served from the local store)
+    store = EmbeddingStore()
+    embeddings = cached_embeddings(INDEX_EMBEDDING_MODEL, store=store)
+
+    # Chunk → embed → append to FAISS, batch by batch
+    stats = build_index(
+        CLEAN_DIR, INDEX_PATH, embeddings,
+        batch_size=args.batch_size,
+        checkpoint_every=args.checkpoint_every,
+    )
+    print(stats.report())
+    print(f"[INFO] Embedding store: {store.stats.summary()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,325 @@
+# packages/rag/retrieval_eval.py
+"""
+Retrieval quality + latency evaluation shared by scripts/bench_retrieval.py.
+
+Golden set:
+  - silver labels mined from logs/query_log_*.csv(.gz): the best-scoring source
+    each logged question received (both the old `run_timestamp,...,result_rank`
+    and the current `timestamp,query,mode,...` layouts are read);
+  - hand labels (packages/rag/data/retrieval_labels.tsv) override them.
+Labels are document-level (source stem, e.g. "medlineplus_anxiety"), so every
+backend is scored on the distinct sources of its ranked chunks.
+
+Silver labels are the production retriever's own top hit, i.e. exact dense L2
+search: they favour faiss-flat, and the dense backends that rank like it,
+over hybrid. Results are therefore also broken down by label
+origin, and backends should be compared on the hand-labelled rows.
+
+Backends, all over the same chunks and vectors:
+  faiss-flat    exact L2 (what FAISS.load_local serves today)
+  faiss-sq8     8-bit scalar-quantized FAISS index
+  hybrid        BM25 + flat dense, fused with reciprocal rank fusion
+  match-chunks  local stand-in for the Supabase RPC: cosine score
+                (1 - cosine distance), min_score filter, match_count cut
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from packages.rag.latency import summarize
+from packages.rag.pipeline import iter_chunks, iter_cleaned_docs
+
+LABELS_PATH = Path(__file__).resolve().parent / "data" / "retrieval_labels.tsv"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def source_key(source: str) -> str:
+    """'data/clean/medlineplus_anxiety.md' and 'medlineplus_anxiety' → 'medlineplus_anxiety'."""
+    return Path(source.strip()).stem
+
+
+# ---------------------------- golden set -------------------------------------
+
+@dataclass
+class GoldenQuery:
+    query: str
+    relevant: List[str]
+    origin: str  # "log" | "hand"
+
+
+def _open_log(path: Path) -> io.StringIO:
+    if path.suffix == ".gz":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return io.StringIO(f.read())
+    return io.StringIO(path.read_text(encoding="utf-8"))
+
+
+def _log_requests(path: Path) -> Iterable[Tuple[str, List[Tuple[float, str]]]]:
+    """
+    Group a log file into requests: (query, [(similarity, source), ...]).
+    Both layouts write one row per result, consecutively; older rows even carry
+    per-row timestamps, so a request is a run of rows with the same query
+    (the old layout's `result_rank` resetting to 1 also starts a new one).
+    """
+    query, results = None, []
+    for row in csv.DictReader(_open_log(path)):
+        q = (row.get("query") or "").strip()
+        source = (row.get("source") or "").strip()
+        if not q or not source or q == "query":
+            continue
+        new_run = q != query or (row.get("result_rank") or "").strip() == "1"
+        if new_run and results:
+            yield query, results
+            results = []
+        query = q
+        try:
+            sim = float(row.get("similarity") or 0.0)
+        except ValueError:
+            sim = 0.0
+        results.append((sim, source))
+    if results:
+        yield query, results
+
+
+def mine_log_labels(log_dir: str | Path) -> Dict[str, List[str]]:
+    """Highest-similarity logged source per question (latest occurrence wins)."""
+    labels: Dict[str, List[str]] = {}
+    for path in sorted(Path(log_dir).glob("query_log_*.csv*")):
+        for query, results in _log_requests(path):
+            labels[query] = [source_key(max(results)[1])]
+    return labels
+
+
+def load_hand_labels(path: str | Path = LABELS_PATH) -> Dict[str, List[str]]:
+    """TSV: question <TAB> comma-separated relevant sources; '#' lines are comments."""
+    labels: Dict[str, List[str]] = {}
+    p = Path(path)
+    if not p.exists():
+        return labels
+    for line in p.read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        query, sources = line.rsplit("\t", 1)
+        labels[query.strip()] = [source_key(s) for s in sources.split(",") if s.strip()]
+    return labels
+
+
+def golden_set(log_dir: Optional[str | Path], labels_path: Optional[str | Path] = LABELS_PATH) -> List[GoldenQuery]:
+    mined = mine_log_labels(log_dir) if log_dir else {}
+    hand = load_hand_labels(labels_path) if labels_path else {}
+    out = [GoldenQuery(q, rel, "log") for q, rel in mined.items() if q not in hand]
+    out += [GoldenQuery(q, rel, "hand") for q, rel in hand.items()]
+    return out
+
+
+# ---------------------------- metrics ----------------------------------------
+
+def distinct_sources(ranked_chunk_sources: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(source_key(s) for s in ranked_chunk_sources))
+
+
+def recall_at_k(ranked: Sequence[str], relevant: Sequence[str], k: int) -> float:
+    if not relevant:
+        return 0.0
+    return len(set(ranked[:k]) & set(relevant)) / len(set(relevant))
+
+
+def reciprocal_rank(ranked: Sequence[str], relevant: Sequence[str]) -> float:
+    rel = set(relevant)
+    for i, s in enumerate(ranked, 1):
+        if s in rel:
+            return 1.0 / i
+    return 0.0
+
+
+# ---------------------------- corpus + backends ------------------------------
+
+@dataclass
+class Corpus:
+    texts: List[str]
+    sources: List[str]
+    vectors: np.ndarray  # float32, shape (n, d)
+
+    @classmethod
+    def from_clean_dir(cls, clean_dir: str | Path, embeddings: Embeddings,
+                       chunk_size: int = 1000, chunk_overlap: int = 200) -> "Corpus":
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        chunks = list(iter_chunks(iter_cleaned_docs(clean_dir), splitter))
+        if not chunks:
+            raise RuntimeError(f"No cleaned docs under {clean_dir}")
+        texts = [c.page_content for c in chunks]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+        return cls(texts, [c.metadata["source"] for c in chunks], vectors)
+
+
+class Backend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, qvec: np.ndarray, k: int) -> List[int]:
+        """Chunk indices, best first."""
+
+
+class FaissBackend(Backend):
+    def __init__(self, corpus: Corpus, kind: str = "flat"):
+        d = corpus.vectors.shape[1]
+        if kind == "flat":
+            self.index = faiss.IndexFlatL2(d)
+        elif kind == "sq8":
+            self.index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+            self.index.train(corpus.vectors)
+        else:
+            raise ValueError(f"Unknown FAISS kind: {kind!r}")
+        self.index.add(corpus.vectors)
+        self.name = f"faiss-{kind}"
+
+    def search(self, query, qvec, k):
+        _, ids = self.index.search(qvec[None, :], k)
+        return [int(i) for i in ids[0] if i >= 0]
+
+
+class BM25:
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths = np.zeros(len(texts), dtype="float32")
+        for i, t in enumerate(texts):
+            tf = Counter(_TOKEN.findall(t.lower()))
+            self.lengths[i] = sum(tf.values())
+            for term, n in tf.items():
+                self.postings[term].append((i, n))
+        self.avgdl = float(self.lengths.mean()) if len(texts) else 0.0
+        self.n = len(texts)
+
+    def scores(self, query: str) -> np.ndarray:
+        out = np.zeros(self.n, dtype="float32")
+        for term in set(_TOKEN.findall(query.lower())):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (self.n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for i, tf in posting:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avgdl)
+                out[i] += idf * tf * (self.k1 + 1) / norm
+        return out
+
+
+class HybridBackend(Backend):
+    """BM25 + dense flat, reciprocal rank fusion over each side's top `depth`."""
+    name = "hybrid"
+
+    def __init__(self, corpus: Corpus, depth: int = 50, rrf_k: int = 60):
+        self.dense = FaissBackend(corpus, "flat")
+        self.bm25 = BM25(corpus.texts)
+        self.depth = depth
+        self.rrf_k = rrf_k
+
+    def search(self, query, qvec, k):
+        fused: Dict[int, float] = defaultdict(float)
+        for rank, i in enumerate(self.dense.search(query, qvec, self.depth)):
+            fused[i] += 1.0 / (self.rrf_k + rank + 1)
+        lexical = self.bm25.scores(query)
+        for rank, i in enumerate(np.argsort(-lexical)[: self.depth]):
+            if lexical[i] > 0:
+                fused[int(i)] += 1.0 / (self.rrf_k + rank + 1)
+        return sorted(fused, key=fused.__getitem__, reverse=True)[:k]
+
+
+class MatchChunksBackend(Backend):
+    """
+    Same contract as the `match_chunks` RPC used by /v1/search/vector:
+    score = 1 - cosine distance, rows under `min_score` dropped, top `match_count`.
+    """
+    name = "match-chunks"
+
+    def __init__(self, corpus: Corpus, min_score: Optional[float] = None):
+        norms = np.linalg.norm(corpus.vectors, axis=1, keepdims=True)
+        self.unit = corpus.vectors / np.maximum(norms, 1e-12)
+        self.min_score = min_score
+
+    def search(self, query, qvec, k):
+        q = qvec / max(float(np.linalg.norm(qvec)), 1e-12)
+        scores = self.unit @ q
+        top = np.argsort(-scores)[:k]
+        return [int(i) for i in top if self.min_score is None or scores[i] >= self.min_score]
+
+
+BACKENDS: Dict[str, Callable[[Corpus], Backend]] = {
+    "faiss-flat": lambda c: FaissBackend(c, "flat"),
+    "faiss-sq8": lambda c: FaissBackend(c, "sq8"),
+    "hybrid": HybridBackend,
+    "match-chunks": MatchChunksBackend,
+}
+
+
+# ---------------------------- runner -----------------------------------------
+
+@dataclass
+class BackendResult:
+    backend: str
+    queries: int
+    recall: Dict[int, float] = field(default_factory=dict)
+    mrr: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    # "log" / "hand" → {"queries", "recall@k", "mrr"} on that label origin only
+    by_origin: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "backend": self.backend,
+            "queries": self.queries,
+            **{f"recall@{k}": round(v, 4) for k, v in sorted(self.recall.items())},
+            "mrr": round(self.mrr, 4),
+            "latency_ms": self.latency_ms,
+            "by_origin": self.by_origin,
+        }
+
+
+def evaluate(backend: Backend, golden: Sequence[GoldenQuery], qvecs: np.ndarray, corpus: Corpus,
+             ks: Sequence[int] = (1, 3, 5), depth: int = 20, repeat: int = 5) -> BackendResult:
+    """Score `backend` on `golden`; every one of the `repeat` searches per query is a latency sample."""
+    recalls: Dict[int, List[float]] = {k: [] for k in ks}
+    rr: List[float] = []
+    lat: List[float] = []
+    for g, qvec in zip(golden, qvecs):
+        for _ in range(max(1, repeat)):
+            t = time.perf_counter()
+            ids = backend.search(g.query, qvec, depth)
+            lat.append((time.perf_counter() - t) * 1000)
+        ranked = distinct_sources(corpus.sources[i] for i in ids)
+        for k in ks:
+            recalls[k].append(recall_at_k(ranked, g.relevant, k))
+        rr.append(reciprocal_rank(ranked, g.relevant))
+    n = len(golden) or 1
+    by_origin: Dict[str, Dict[str, float]] = {}
+    for origin in dict.fromkeys(g.origin for g in golden):
+        rows = [i for i, g in enumerate(golden) if g.origin == origin]
+        by_origin[origin] = {
+            "queries": len(rows),
+            **{f"recall@{k}": round(sum(v[i] for i in rows) / len(rows), 4) for k, v in sorted(recalls.items())},
+            "mrr": round(sum(rr[i] for i in rows) / len(rows), 4),
+        }
+    return BackendResult(
+        backend=backend.name,
+        queries=len(golden),
+        recall={k: sum(v) / n for k, v in recalls.items()},
+        mrr=sum(rr) / n,
+        latency_ms=summarize(lat, digits=3),
+        by_origin=by_origin,
+    )
@@ -1,74 +1,39 @@
+"""
+SukoonAI retriever CLI.
+
+Interactive (default):
+    python -m packages.rag.retriever
+Batch regression run over a file of questions (one per line, `#` comments ok):
+    python -m packages.rag.retriever --batch queries.txt --workers 8 --out results.jsonl
+    python -m packages.rag.retriever --batch queries.txt --synthesize   # also call the LLM
+Batch mode writes one JSON line per question (results, answer, per-stage
+timings in ms) and prints throughput and latency percentiles at the end.
+"""
 import os
 import sys
-import datetime
-import csv
+import json
+import time
 import argparse
 import textwrap
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_openai import ChatOpenAI   # new API
 
+from packages.rag.context import DEFAULT_BUDGET_TOKENS, pack
+from packages.rag.embeddings import INDEX_EMBEDDING_MODEL, get_embeddings
+from packages.rag.langid import ENGLISH, identify
+from packages.rag.latency import summarize
+from packages.rag.mmr import MMR_FETCH_K, diversify
+from packages.rag.query_log import get_query_logger
+from packages.rag.telemetry import StageTimer, chunk_id, get_telemetry, usage_tokens
+from packages.rag.translate import Translator
+
 # ------------------------
 # Paths
 # ------------------------
 INDEX_PATH = "data/index/index"
 LOG_DIR = "logs"
 
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# ------------------------
-# CLI argument parsing
-# ------------------------
-parser = argparse.ArgumentParser()
-parser.add_argument("--no-log", action="store_true", help="Disable saving logs for this run")
-parser.add_argument("--wrap", type=int, default=80, help="Set console text wrap width (default=80)")
-args = parser.parse_args()
-
-NO_LOG = args.no_log
-WRAP_WIDTH = args.wrap
-
-if NO_LOG:
-    print("[INFO] Logging disabled (--no-log)")
-print(f"[INFO] Wrap width set to {WRAP_WIDTH} characters")
-
-# ------------------------
-# Helper: Language detection (basic heuristic)
-# ------------------------
-def detect_language(text: str) -> str:
-    for ch in text:
-        if '\u0600' <= ch <= '\u06FF':
-            return "urdu-script"
-    roman_urdu_markers = ["hai", "kya", "nahi", "ka", "ki", "tum", "main"]
-    if any(marker in text.lower() for marker in roman_urdu_markers):
-        return "roman-urdu"
-    return "english"
-
-# ------------------------
-# Load FAISS index
-# ------------------------
-print("[INFO] Starting SukoonAI query engine...")
-
-try:
-    db = FAISS.load_local(INDEX_PATH, OpenAIEmbeddings(), allow_dangerous_deserialization=True)
-except Exception as e:
-    print("[ERROR] Could not load FAISS index:", e)
-    exit(1)
-
-retriever = db.as_retriever(search_kwargs={"k": 5})
-
-# ------------------------
-# OpenAI LLM setup
-# ------------------------
-api_key = os.environ.get("OPENAI_API_KEY")
-if api_key:
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=api_key)
-    mode = "retriever+LLM"
-    print("[OK] Found OPENAI_API_KEY → Using retriever+LLM mode.")
-else:
-    llm = None
-    mode = "retriever-only"
-    print("[WARN] No OPENAI_API_KEY found → Using retriever-only mode.")
-
 # ------------------------
 # Updated System Prompt (with your exact Urdu corrections)
 # ------------------------
@@ -120,50 +85,26 @@ Examples (follow the vibe, not exact words):
 Now, answer the user in [English] and [Roman Urdu] exactly in that order, following all rules above.
 """
 
+STAGES = ("translate", "retrieve", "synthesize")
+
 # ------------------------
-# Logging setup
+# Setup: FAISS index + OpenAI LLM
 # ------------------------
-def get_logfile():
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    return os.path.join(LOG_DIR, f"query_log_{today}.csv")
-
-def log_query(query, mode, results, answer=None):
-    if NO_LOG:
-        return
-    logfile = get_logfile()
-    newfile = not os.path.exists(logfile)
-    with open(logfile, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if newfile:
-            writer.writerow(["timestamp", "query", "mode", "source", "similarity", "snippet", "answer"])
-        for src, sim, snippet in results:
-            writer.writerow([
-                datetime.datetime.now().isoformat(),
-                query,
-                mode,
-                src,
-                f"{sim:.4f}",
-                snippet[:200].replace("\n", " "),
-                (answer[:200].replace("\n", " ") if answer else "")
-            ])
-
-def save_last_answer(answer: str):
-    if NO_LOG:
-        return
-    filepath = os.path.join(LOG_DIR, "last_answer.txt")
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(answer)
-
-def append_answer_history(user_query: str, answer: str):
-    if NO_LOG:
-        return
-    filepath = os.path.join(LOG_DIR, "all_answers.txt")
-    with open(filepath, "a", encoding="utf-8") as f:
-        f.write("="*60 + "\n")
-        f.write(f"Timestamp: {datetime.datetime.now().isoformat()}\n")
-        f.write(f"Query: {user_query}\n\n")
-        f.write(answer.strip() + "\n")
-        f.write("="*60 + "\n\n")
+def load_db(index_path=INDEX_PATH):
+    try:
+        return FAISS.load_local(index_path, get_embeddings(INDEX_EMBEDDING_MODEL), allow_dangerous_deserialization=True)
+    except Exception as e:
+        print("[ERROR] Could not load FAISS index:", e)
+        sys.exit(1)
+
+
+def make_llm(log=print):
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if api_key:
+        log("[OK] Found OPENAI_API_KEY → Using retriever+LLM mode.")
+        return ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=api_key)
+    log("[WARN] No OPENAI_API_KEY found → Using retriever-only mode.")
+    return None
 
 # ------------------------
 # Helper: wrap text for console output
@@ -172,37 +113,44 @@ def wrap_text(text, width=80):
     return "\n".join(textwrap.fill(line, width) for line in text.splitlines() if line.strip())
 
 # ------------------------
-# Main query loop
+# One question: translate → retrieve → (synthesize)
 # ------------------------
-print("🤖 Ready to query SukoonAI (type 'exit' to quit)")
-
-while True:
-    user_q = input("\nEnter your query: ")
-    if user_q.strip().lower() == "exit":
-        print("👋 Goodbye!")
-        break
-
-    lang = detect_language(user_q)
-    query_for_retrieval = user_q
-    if lang in ["urdu-script", "roman-urdu"] and llm:
-        trans_prompt = f"Translate this {lang} question into English for retrieval only: {user_q}"
-        query_for_retrieval = llm.invoke(trans_prompt).content.strip()
-
-    docs_and_scores = db.similarity_search_with_score(query_for_retrieval, k=5)
-    results = []
-    for doc, score in docs_and_scores:
-        norm_sim = 1 / (1 + score)
-        results.append((doc.metadata.get("source", "unknown"),
-                        norm_sim,
-                        doc.page_content[:300]))
-
-    results.sort(key=lambda x: x[1], reverse=True)
-    top_results = results[:3]
-
+def answer_query(user_q, db, llm=None, translator=None, k=MMR_FETCH_K, top_n=3,
+                 context_tokens=DEFAULT_BUDGET_TOKENS):
+    """
+    Run the pipeline for one question and return a JSON-ready dict with the
+    top results, the answer (None without an LLM) and per-stage timings in ms.
+    Retrieval over-fetches `k` candidates and keeps `top_n` diverse ones (MMR).
+    """
+    timer = StageTimer()
+
+    with timer.stage("translate"):
+        detected = identify(user_q)
+        query_for_retrieval, translation_source = user_q, None
+        if detected.lang != ENGLISH and translator is not None:
+            translation = translator.translate(user_q, detected.lang)
+            query_for_retrieval, translation_source = translation.text, translation.source
+
+    with timer.stage("retrieve"):
+        docs_and_scores = diversify(db, query_for_retrieval, k=top_n, fetch_k=k)
+        results = []
+        for doc, score in docs_and_scores:
+            norm_sim = 1 / (1 + float(score))
+            results.append((doc.metadata.get("source", "unknown"),
+                            norm_sim,
+                            doc.page_content[:300],
+                            chunk_id(doc)))
+        results.sort(key=lambda x: x[1], reverse=True)
+        top_results = results[:top_n]
+
+    answer, error, tokens, packed = None, None, (0, 0), None
     if llm:
-        context_text = "\n\n".join([f"Source: {src}\nContent: {snippet}"
-                                    for src, sim, snippet in top_results])
-        final_prompt = f"""{SYSTEM_PROMPT}
+        # Overlap-merged, deduplicated full chunks filling the token budget
+        packed = pack([(doc.page_content, doc.metadata.get("source", "unknown"), 1 / (1 + float(score)))
+                       for doc, score in docs_and_scores], context_tokens, baseline_chars=300)
+        context_text = packed.text
+        with timer.stage("synthesize"):
+            final_prompt = f"""{SYSTEM_PROMPT}
 
 User query: {user_q}
 
@@ -211,29 +159,186 @@ Relevant context from sources:
 
 Now provide the bilingual answer strictly in flowing conversational style.
 """
-        try:
-            answer = llm.invoke(final_prompt).content
-        except Exception as e:
-            print("[ERROR] LLM call failed:", e)
-            answer = None
-    else:
-        answer = None
-
-    if answer:
-        print("\n🧠 SukoonAI Bilingual Answer\n")
-        if "[Roman Urdu]" in answer:
-            english_part, roman_part = answer.split("[Roman Urdu]", 1)
-            print(wrap_text(english_part.strip(), WRAP_WIDTH) + "\n")
-            print("[Roman Urdu]\n" + wrap_text(roman_part.strip(), WRAP_WIDTH) + "\n")
+            try:
+                message = llm.invoke(final_prompt)
+                answer, tokens = message.content, usage_tokens(message)
+            except Exception as e:
+                error = f"LLM call failed: {e}"
+
+    timings = {**dict.fromkeys(STAGES, 0.0), **timer.ms, "total": timer.total_ms}
+    return {
+        "query": user_q,
+        "lang": detected.lang,
+        "retrieval_query": query_for_retrieval,
+        "translation": translation_source,
+        "results": [{"source": src, "similarity": round(sim, 4), "snippet": snippet, "id": cid}
+                    for src, sim, snippet, cid in top_results],
+        "answer": answer,
+        "error": error,
+        "tokens": {"prompt": tokens[0], "completion": tokens[1]},
+        "context": {"tokens": packed.tokens, "tokens_saved": packed.tokens_saved} if packed else None,
+        "timings_ms": {name: round(ms, 2) for name, ms in timings.items()},
+    }
+
+
+def record_telemetry(telemetry, route, row):
+    """One telemetry row for an `answer_query` result."""
+    timings = dict(row.get("timings_ms") or {})
+    total = timings.pop("total", 0.0)
+    telemetry.record(
+        route,
+        stages=timings,
+        total_ms=total,
+        lang=row.get("lang"),
+        tokens=(row.get("tokens", {}).get("prompt", 0), row.get("tokens", {}).get("completion", 0)),
+        cache={"translation": row["translation"]} if row.get("translation") else {},
+        top_k=[r["id"] for r in row.get("results", [])],
+        error=row.get("error") is not None,
+    )
+
+# ------------------------
+# Batch mode
+# ------------------------
+def read_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_batch(queries, db, llm=None, translator=None, *, workers=4, out=sys.stdout, log=print, telemetry=None):
+    """
+    Answer `queries` on a bounded thread pool, writing one JSON line per
+    question to `out` as it completes. Returns the summary dict.
+    """
+    rows = []
+    failed = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(answer_query, q, db, llm, translator): i for i, q in enumerate(queries)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                row = fut.result()
+            except Exception as e:  # one bad question must not sink the run
+                row = {"query": queries[i], "error": str(e), "timings_ms": {}}
+            row["i"] = i
+            if telemetry is not None and "results" in row:
+                record_telemetry(telemetry, "cli-batch", row)
+            failed += row.get("error") is not None
+            rows.append(row)
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    wall = time.perf_counter() - t0
+
+    summary = {
+        "queries": len(queries),
+        "failed": failed,
+        "workers": workers,
+        "wall_s": round(wall, 2),
+        "throughput_qps": round(len(queries) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            stage: summarize([r["timings_ms"][stage] for r in rows if stage in r["timings_ms"]])
+            for stage in STAGES + ("total",)
+        },
+    }
+    log(f"[SUCCESS] {summary['queries']} queries ({failed} failed) in {summary['wall_s']}s "
+        f"→ {summary['throughput_qps']} q/s with {workers} workers")
+    for stage, s in summary["latency_ms"].items():
+        log(f"  {stage:<10} p50 {s['p50']:>8} ms  p95 {s['p95']:>8} ms  p99 {s['p99']:>8} ms")
+    saved = [r["context"]["tokens_saved"] for r in rows if r.get("context")]
+    if saved:
+        log(f"[INFO] Context packing saved {sum(saved)} prompt tokens ({sum(saved) / len(saved):.0f}/question)")
+    if translator is not None:
+        log(f"[INFO] Translation: {translator.stats.summary()}")
+    return summary
+
+# ------------------------
+# Interactive mode
+# ------------------------
+def run_interactive(db, llm, translator, qlog, wrap_width=80, telemetry=None):
+    mode = "retriever+LLM" if llm else "retriever-only"
+    print("🤖 Ready to query SukoonAI (type 'exit' to quit)")
+
+    while True:
+        user_q = input("\nEnter your query: ")
+        if user_q.strip().lower() == "exit":
+            print("👋 Goodbye!")
+            qlog.close()
+            break
+
+        row = answer_query(user_q, db, llm, translator)
+        if row["translation"]:
+            print(f"[INFO] Detected {row['lang']}; "
+                  f"retrieval query ({row['translation']}): {row['retrieval_query']}")
+        if row["error"]:
+            print("[ERROR]", row["error"])
+        top_results = [(r["source"], r["similarity"], r["snippet"]) for r in row["results"]]
+        answer = row["answer"]
+
+        if answer:
+            print("\n🧠 SukoonAI Bilingual Answer\n")
+            if "[Roman Urdu]" in answer:
+                english_part, roman_part = answer.split("[Roman Urdu]", 1)
+                print(wrap_text(english_part.strip(), wrap_width) + "\n")
+                print("[Roman Urdu]\n" + wrap_text(roman_part.strip(), wrap_width) + "\n")
+            else:
+                print(wrap_text(answer.strip(), wrap_width) + "\n")
+
+            final_answer = "🧠 SukoonAI Bilingual Answer\n\n" + answer.strip()
+            qlog.save_last_answer(final_answer)
+            qlog.append_answer_history(user_q, final_answer)
         else:
-            print(wrap_text(answer.strip(), WRAP_WIDTH) + "\n")
+            print("\n🔎 Retriever Results Only (no LLM synthesis):\n")
+            for src, sim, snippet in top_results:
+                print(f"- {src} (similarity {sim:.3f}) → {snippet[:200]}...")
+
+        qlog.log_query(user_q, mode, top_results, answer)
+        if telemetry is not None:
+            record_telemetry(telemetry, "cli", row)
+
+# ------------------------
+# CLI
+# ------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-log", action="store_true", help="Disable saving logs for this run")
+    parser.add_argument("--wrap", type=int, default=80, help="Set console text wrap width (default=80)")
+    parser.add_argument("--batch", default=None, help="File of questions (one per line) to run non-interactively")
+    parser.add_argument("--workers", type=int, default=4, help="Batch worker threads (default=4)")
+    parser.add_argument("--synthesize", action="store_true", help="Batch: also generate LLM answers (needs OPENAI_API_KEY)")
+    parser.add_argument("--out", default=None, help="Batch: JSONL output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    # In batch mode stdout may carry the JSONL, so progress goes to stderr
+    say = (lambda msg: print(msg, file=sys.stderr)) if args.batch else print  # noqa: E731
+    say("[INFO] Starting SukoonAI query engine...")
+    db = load_db()
+    # Per-request stage timings (python -m packages.rag.telemetry report)
+    telemetry = get_telemetry()
+
+    if args.batch:
+        # Batch runs are regression checks: keep them out of the query logs
+        llm = make_llm(say) if args.synthesize else None
+        translator = Translator(llm)
+        queries = read_queries(args.batch)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as out:
+                run_batch(queries, db, llm, translator, workers=args.workers, out=out, log=say,
+                          telemetry=telemetry)
+            say(f"[SUCCESS] Wrote {args.out}")
+        else:
+            run_batch(queries, db, llm, translator, workers=args.workers, log=say, telemetry=telemetry)
+        return
+
+    if args.no_log:
+        print("[INFO] Logging disabled (--no-log)")
+    print(f"[INFO] Wrap width set to {args.wrap} characters")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    llm = make_llm()
+    # Cache + lexicon first; the LLM only translates queries the lexicon can't cover
+    translator = Translator(llm)
+    # Logging setup (buffered; written by a background thread)
+    qlog = get_query_logger(LOG_DIR, enabled=not args.no_log)
+    run_interactive(db, llm, translator, qlog, wrap_width=args.wrap, telemetry=telemetry)
 
-        final_answer = "🧠 SukoonAI Bilingual Answer\n\n" + answer.strip()
-        save_last_answer(final_answer)
-        append_answer_history(user_q, final_answer)
-    else:
-        print("\n🔎 Retriever Results Only (no LLM synthesis):\n")
-        for src, sim, snippet in top_results:
-            print(f"- {src} (similarity {sim:.3f}) → {snippet[:200]}...")
 
-    log_query(user_q, mode, top_results, answer)
+if __name__ == "__main__":
+    main()
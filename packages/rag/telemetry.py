@@ -0,0 +1,233 @@
+# packages/rag/telemetry.py
+"""
+Per-request latency telemetry (append-only SQLite, one row per request).
+
+Each row carries the route, detected language, per-stage durations in ms
+(stored as JSON so new stages need no migration), total ms, LLM token counts,
+cache outcomes and the ids of the top-k retrieved chunks. Writes are enqueued
+and inserted in batches by a BatchWriter thread, so the request path never
+waits on disk.
+
+Usage (CLI):
+    python -m packages.rag.telemetry report              # p50/p95/p99 per stage per day
+    python -m packages.rag.telemetry report --days 3 --route api
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from packages.rag.batch_writer import BatchWriter
+from packages.rag.latency import percentile
+
+DEFAULT_TELEMETRY_PATH = os.getenv("TELEMETRY_PATH", "data/telemetry.sqlite3")
+TELEMETRY_ENABLED = os.getenv("TELEMETRY", "1") not in {"0", "false", "False"}
+
+
+# ---------------------------- per-request timing -----------------------------
+
+class StageTimer:
+    """Collects stage durations for one request: `with timer.stage("retrieve"): ...`."""
+
+    def __init__(self):
+        self.ms: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = self.ms.get(name, 0.0) + (time.perf_counter() - t) * 1000
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+
+def usage_tokens(message: Any) -> Tuple[int, int]:
+    """(prompt, completion) tokens from a LangChain AIMessage, (0, 0) if unknown."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return int(usage.get("input_tokens", 0) or 0), int(usage.get("output_tokens", 0) or 0)
+
+
+def chunk_id(doc: Any) -> str:
+    """Stable id for a retrieved chunk: docstore id, else source#chunk, else source."""
+    meta = getattr(doc, "metadata", {}) or {}
+    if getattr(doc, "id", None):
+        return str(doc.id)
+    src = meta.get("source", "unknown")
+    return f"{src}#{meta['chunk']}" if "chunk" in meta else src
+
+
+# ---------------------------- store ------------------------------------------
+
+class TelemetryStore:
+    def __init__(
+        self,
+        path: str | os.PathLike = DEFAULT_TELEMETRY_PATH,
+        *,
+        enabled: bool = True,
+        flush_every: int = 100,
+        flush_interval: float = 2.0,
+        max_queue: int = 10000,
+    ):
+        self.path = Path(path)
+        self.enabled = enabled
+        self._writer: Optional[BatchWriter] = None
+        if enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._init_schema()
+            self._writer = BatchWriter(self._write, name="telemetry", flush_every=flush_every,
+                                       flush_interval=flush_interval, max_queue=max_queue)
+
+    @property
+    def dropped(self) -> int:
+        return self._writer.dropped if self._writer else 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.path))
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _init_schema(self):
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS requests (
+              id INTEGER PRIMARY KEY,
+              ts REAL NOT NULL, day TEXT NOT NULL, route TEXT NOT NULL, lang TEXT,
+              total_ms REAL NOT NULL, stages TEXT NOT NULL,
+              prompt_tokens INTEGER NOT NULL DEFAULT 0, completion_tokens INTEGER NOT NULL DEFAULT 0,
+              cache TEXT NOT NULL DEFAULT '{}', top_k TEXT NOT NULL DEFAULT '[]',
+              error INTEGER NOT NULL DEFAULT 0)""")
+            db.execute("CREATE INDEX IF NOT EXISTS requests_day_route ON requests(day, route)")
+
+    # ---- public interface (non-blocking) ----
+    def record(
+        self,
+        route: str,
+        *,
+        stages: Dict[str, float],
+        total_ms: float,
+        lang: Optional[str] = None,
+        tokens: Tuple[int, int] = (0, 0),
+        cache: Optional[Dict[str, Any]] = None,
+        top_k: Sequence[str] = (),
+        error: bool = False,
+    ):
+        if not self.enabled:
+            return
+        now = time.time()
+        row = (
+            now, datetime.date.fromtimestamp(now).isoformat(), route, lang,
+            round(total_ms, 3), json.dumps({k: round(v, 3) for k, v in stages.items()}),
+            tokens[0], tokens[1], json.dumps(cache or {}), json.dumps(list(top_k)), int(error),
+        )
+        self._writer.put(row)
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything recorded so far is on disk (tests, shutdown)."""
+        if self._writer:
+            self._writer.flush(timeout)
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+    # ---- writer thread ----
+    def _write(self, rows: List[tuple]):
+        with closing(self._connect()) as db, db:
+            db.executemany(
+                """INSERT INTO requests(ts, day, route, lang, total_ms, stages,
+                     prompt_tokens, completion_tokens, cache, top_k, error)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+
+    # ---- reporting ----
+    def report(self, days: int = 7, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        """One dict per (day, route, stage) with n, p50/p95/p99 in ms and hit rate per cache."""
+        since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+        sql = "SELECT day, route, total_ms, stages, cache, error FROM requests WHERE day >= ?"
+        params: List[Any] = [since]
+        if route:
+            sql += " AND route = ?"
+            params.append(route)
+        samples: Dict[Tuple[str, str, str], List[float]] = defaultdict(list)
+        # per (day, route): {cache name: [hits, lookups]} and error count
+        hits: Dict[Tuple[str, str], Dict[str, List[int]]] = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        with self._connect() as db:
+            for day, rt, total_ms, stages, cache, error in db.execute(sql, params):
+                for name, ms in json.loads(stages).items():
+                    samples[(day, rt, name)].append(ms)
+                samples[(day, rt, "total")].append(total_ms)
+                for name, outcome in json.loads(cache).items():
+                    h = hits[(day, rt)][name]
+                    h[1] += 1
+                    h[0] += outcome in ("hit", "cache", True)
+                errors[(day, rt)] += error
+        out = []
+        for (day, rt, name), xs in sorted(samples.items(), key=lambda kv: (kv[0][0], kv[0][1], kv[0][2] == "total", kv[0][2])):
+            out.append({
+                "day": day, "route": rt, "stage": name, "n": len(xs),
+                "p50": round(percentile(xs, 50), 1),
+                "p95": round(percentile(xs, 95), 1),
+                "p99": round(percentile(xs, 99), 1),
+                "cache_hit_rate": {c: round(h[0] / h[1], 3) for c, h in sorted(hits[(day, rt)].items())},
+                "errors": errors[(day, rt)],
+            })
+        return out
+
+
+_STORES: Dict[str, TelemetryStore] = {}
+_LOCK = threading.Lock()
+
+
+def get_telemetry(path: str | os.PathLike = DEFAULT_TELEMETRY_PATH, **kwargs) -> TelemetryStore:
+    """Process-wide store per file, shared by the CLI and API routers."""
+    kwargs.setdefault("enabled", TELEMETRY_ENABLED)
+    key = str(Path(path).resolve())
+    with _LOCK:
+        if key not in _STORES:
+            _STORES[key] = TelemetryStore(path, **kwargs)
+        return _STORES[key]
+
+
+# ---------------------------- CLI --------------------------------------------
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Per-stage latency telemetry")
+    parser.add_argument("--path", default=DEFAULT_TELEMETRY_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("report", help="p50/p95/p99 per stage per day")
+    r.add_argument("--days", type=int, default=7)
+    r.add_argument("--route", default=None)
+    r.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not Path(args.path).exists():
+        print(f"[ERROR] No telemetry at {args.path}")
+        return
+    rows = TelemetryStore(args.path, enabled=False).report(args.days, args.route)
+    if args.json:
+        print(json.dumps(rows))
+        return
+    print(f"{'day':<10}  {'route':<10} {'stage':<12} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}  cache hits")
+    for row in rows:
+        hit = ", ".join(f"{c} {rate:.0%}" for c, rate in row["cache_hit_rate"].items())
+        print(f"{row['day']:<10}  {row['route']:<10} {row['stage']:<12} {row['n']:>6} "
+              f"{row['p50']:>9} {row['p95']:>9} {row['p99']:>9}  {hit if row['stage'] == 'total' else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# packages/rag/translate.py
+"""
+Query translation for retrieval (Urdu script / Roman Urdu → English).
+
+Order of resolution:
+  1. Persistent cache of past translations (SQLite).
+  2. Local lexicon (packages/rag/data/urdu_lexicon.json): stopwords are dropped,
+     phrases and terms expand to English keywords, known English words pass
+     through. Used when it covers at least `min_coverage` of the content tokens.
+  3. LLM fallback (if available); the result is cached for next time.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+LEXICON_PATH = Path(__file__).resolve().parent / "data" / "urdu_lexicon.json"
+DEFAULT_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "data/translation_cache.sqlite3")
+DEFAULT_MIN_COVERAGE = float(os.getenv("TRANSLATE_MIN_COVERAGE", "0.7"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(_TOKEN.findall(text.lower()))
+
+
+@dataclass
+class Translation:
+    text: str
+    source: str  # "cache" | "lexicon" | "llm" | "none"
+    coverage: float = 0.0
+
+
+@dataclass
+class TranslatorStats:
+    counts: Dict[str, int] = field(default_factory=lambda: {"cache": 0, "lexicon": 0, "llm": 0, "none": 0})
+
+    def summary(self) -> str:
+        total = sum(self.counts.values()) or 1
+        llm = self.counts["llm"]
+        return ", ".join(f"{k}: {v}" for k, v in self.counts.items()) + f" (LLM avoided {1 - llm / total:.0%})"
+
+
+class Lexicon:
+    def __init__(self, path: str | os.PathLike = LEXICON_PATH):
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        self.stopwords = set(data.get("stopwords", []))
+        self.english = set(data.get("english", []))
+        self.terms: Dict[str, List[str]] = data.get("terms", {})
+        self.phrases: Dict[Tuple[str, ...], List[str]] = {
+            tuple(k.split()): v for k, v in data.get("phrases", {}).items()
+        }
+        self.max_phrase = max((len(k) for k in self.phrases), default=1)
+
+    def expand(self, text: str) -> Tuple[str, float]:
+        """English keywords for `text` and the fraction of content tokens covered."""
+        tokens = normalize(text).split()
+        out: List[str] = []
+        content = covered = 0
+        i = 0
+        while i < len(tokens):
+            # longest phrase first
+            for n in range(min(self.max_phrase, len(tokens) - i), 1, -1):
+                words = self.phrases.get(tuple(tokens[i:i + n]))
+                if words is not None:
+                    out += words
+                    content += n
+                    covered += n
+                    i += n
+                    break
+            else:
+                tok = tokens[i]
+                i += 1
+                if tok in self.stopwords:
+                    continue
+                content += 1
+                if tok in self.terms:
+                    out += self.terms[tok]
+                    covered += 1
+                elif tok in self.english:
+                    out.append(tok)
+                    covered += 1
+        coverage = covered / content if content else 0.0
+        return " ".join(dict.fromkeys(out)), coverage
+
+
+class TranslationCache:
+    def __init__(self, path: str | os.PathLike = DEFAULT_CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS translations (
+          lang TEXT NOT NULL, query TEXT NOT NULL, english TEXT NOT NULL,
+          source TEXT NOT NULL, created_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (lang, query))""")
+        self.db.commit()
+
+    def get(self, lang: str, query: str) -> Optional[str]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT english FROM translations WHERE lang=? AND query=?", (lang, query)
+            ).fetchone()
+            if row:
+                self.db.execute("UPDATE translations SET hits=hits+1 WHERE lang=? AND query=?", (lang, query))
+                self.db.commit()
+        return row[0] if row else None
+
+    def put(self, lang: str, query: str, english: str, source: str):
+        with self._lock:
+            self.db.execute(
+                """INSERT INTO translations(lang, query, english, source, created_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(lang, query) DO UPDATE SET english=excluded.english, source=excluded.source""",
+                (lang, query, english, source, time.time()),
+            )
+            self.db.commit()
+
+
+class Translator:
+    def __init__(
+        self,
+        llm: Any = None,
+        *,
+        cache: Optional[TranslationCache] = None,
+        lexicon: Optional[Lexicon] = None,
+        min_coverage: float = DEFAULT_MIN_COVERAGE,
+    ):
+        self.llm = llm
+        self.cache = cache or TranslationCache()
+        self.lexicon = lexicon or Lexicon()
+        self.min_coverage = min_coverage
+        self.stats = TranslatorStats()
+
+    def translate(self, text: str, lang: str) -> Translation:
+        """Return an English retrieval query for `text` (detected as `lang`)."""
+        key = normalize(text)
+        cached = self.cache.get(lang, key)
+        if cached is not None:
+            return self._count(Translation(cached, "cache"))
+
+        expanded, coverage = self.lexicon.expand(text)
+        if expanded and coverage >= self.min_coverage:
+            # Lexicon results are cheap to recompute; only LLM output is persisted
+            return self._count(Translation(expanded, "lexicon", coverage))
+
+        if self.llm is None:
+            # Best effort without an LLM: keep the original words plus any expansions
+            return self._count(Translation(f"{text} {expanded}".strip(), "none", coverage))
+
+        prompt = f"Translate this {lang} question into English for retrieval only: {text}"
+        english = self.llm.invoke(prompt).content.strip()
+        self.cache.put(lang, key, english, "llm")
+        return self._count(Translation(english, "llm", coverage))
+
+    def _count(self, t: Translation) -> Translation:
+        self.stats.counts[t.source] += 1
+        return t
@@ -1,5 +1,11 @@
-import json, os, sqlite3, time
-from typing import Dict, Any, List
+import asyncio, atexit, glob, json, os, sqlite3, threading, time, uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+
+from packages.rag.latency import summarize
+from program_storage import ProgramStorage, apply_sqlite_migrations, storage_from_env, utc_now
 
 SukoonAI_DISCLAIMER_EN = (
   "Disclaimer: SukoonAI is an educational wellness tool and not a substitute "
@@ -19,107 +25,789 @@ def is_crisis(text: str) -> bool:
     return any(k in t for k in CRISIS_KEYWORDS)
 
 
+def format_step(step: Dict[str, Any], prog: Dict[str, Any]) -> str:
+    """SukoonAI style: Answer → Source → Disclaimer."""
+    src = prog.get("id", "program.json")
+    en = step.get("en", "No English text.")
+    ur = step.get("ur", "Koi Urdu matn nahi mila.")
+    src_line = f"📖 Source: {src}"
+    disc = f"⚠️ {SukoonAI_DISCLAIMER_EN}\n⚠️ {SukoonAI_DISCLAIMER_UR}"
+    return f"{en}\n\n{ur}\n\n{src_line}\n{disc}"
+
+
+def format_done(prog: Dict[str, Any]) -> str:
+    en = "🎉 Program complete! You can repeat or explore another program."
+    ur = "🎉 Program mukammal ho gaya! Aap dobara shuru kar sakte hain ya koi naya program koshish karein."
+    return format_step({"en": en, "ur": ur}, prog)
+
+
+def validate_program(data: Any, fallback_id: str) -> List[str]:
+    """Problems that would break serving this program ([] = valid)."""
+    if not isinstance(data, dict):
+        return ["top level must be an object"]
+    errors = []
+    pid = data.get("id", fallback_id)
+    if not isinstance(pid, str) or not pid:
+        errors.append("id must be a non-empty string")
+    if not isinstance(data.get("name"), str):
+        errors.append("name must be a string")
+    steps = data.get("steps", [])
+    if not isinstance(steps, list):
+        errors.append("steps must be a list")
+    else:
+        for i, step in enumerate(steps, 1):
+            if not isinstance(step, dict):
+                errors.append(f"step {i} must be an object")
+            elif not any(isinstance(step.get(k), str) for k in ("en", "ur")):
+                errors.append(f"step {i} needs an 'en' or 'ur' string")
+    if "duration_days" in data and not isinstance(data["duration_days"], int):
+        errors.append("duration_days must be an integer")
+    return errors
+
+
+class CompiledProgram:
+    """A validated program with every step message rendered once."""
+    __slots__ = ("id", "data", "messages", "done", "listing")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.id: str = data["id"]
+        self.data = data
+        steps = data.get("steps", [])
+        self.messages = tuple(format_step(s, data) for s in steps)
+        self.done = format_done(data)
+        self.listing = {"id": self.id, "name": data["name"], "duration_days": data.get("duration_days", len(steps))}
+
+    def message(self, step: "int | None") -> str:
+        """Message for a 1-based step number served by storage; None = program complete."""
+        return self.done if step is None else self.messages[step - 1]
+
+
+class _Snapshot:
+    __slots__ = ("files", "programs", "listing", "listing_json")
+
+    def __init__(self, files: Dict[str, tuple], programs: Dict[str, CompiledProgram]):
+        self.files = files  # file name -> ((mtime_ns, size), CompiledProgram | None, errors)
+        self.programs = programs
+        self.listing = [p.listing for p in programs.values()]
+        self.listing_json = json.dumps(self.listing, ensure_ascii=False).encode("utf-8")
+
+
+# One shared thread runs registry re-checks, so lookups never scan the folder themselves
+_RELOADER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="program-registry")
+
+
 class ProgramRegistry:
-    """Loads program JSON files from a folder (e.g., ./programs)."""
-    def __init__(self, folder="programs"):
+    """
+    Program JSON files from a folder (e.g., ./programs), validated and
+    pre-rendered. Reads go to an immutable snapshot; reload() builds a new one
+    (re-parsing only files whose mtime/size changed) and swaps it in with one
+    assignment. A file that stops validating keeps serving its last good
+    version. At most every `check_interval` secs (PROGRAMS_RELOAD_SECS;
+    negative = only on explicit reload()) a lookup schedules the mtime check
+    on a background thread and carries on with the current snapshot, so
+    lookups on the event loop never touch the disk or wait on the reload lock.
+    """
+    def __init__(self, folder="programs", check_interval: float | None = None):
         self.folder = folder
-        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv("PROGRAMS_RELOAD_SECS", "2")))
+        self.errors: Dict[str, List[str]] = {}
+        self._snap = _Snapshot({}, {})
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
         self.reload()
 
-    def reload(self):
-        self.cache.clear()
-        if not os.path.isdir(self.folder): return
-        for fn in os.listdir(self.folder):
-            if fn.endswith(".json"):
-                with open(os.path.join(self.folder, fn), "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    pid = data.get("id") or os.path.splitext(fn)[0]
-                    self.cache[pid] = data
+    # ---- Loading ----
+    def _signature(self) -> Dict[str, tuple]:
+        sig = {}
+        if os.path.isdir(self.folder):
+            for e in os.scandir(self.folder):
+                if e.name.endswith(".json") and e.is_file():
+                    st = e.stat()
+                    sig[e.name] = (st.st_mtime_ns, st.st_size)
+        return sig
+
+    def reload(self) -> bool:
+        """Rebuild from disk if any program file changed; True if a new snapshot was swapped in."""
+        with self._reload_lock:
+            self._last_check = time.monotonic()
+            old = self._snap
+            sig = self._signature()
+            if sig == {fn: entry[0] for fn, entry in old.files.items()}:
+                return False
+            files: Dict[str, tuple] = {}
+            programs: Dict[str, CompiledProgram] = {}
+            errors: Dict[str, List[str]] = {}
+            for fn in sorted(sig):
+                prev = old.files.get(fn)
+                if prev is not None and prev[0] == sig[fn]:
+                    files[fn] = prev  # unchanged: keeps its program and its validation errors
+                else:
+                    problems: Dict[str, List[str]] = {}
+                    prog = self._compile(fn, problems) or (prev[1] if prev else None)
+                    files[fn] = (sig[fn], prog, problems.get(fn, []))
+                if files[fn][2]:
+                    errors[fn] = list(files[fn][2])
+                prog = files[fn][1]
+                if prog is None:
+                    continue
+                if prog.id in programs:
+                    errors.setdefault(fn, []).append(f"duplicate program id {prog.id!r}")
+                    continue
+                programs[prog.id] = prog
+            self.errors = errors
+            self._snap = _Snapshot(files, programs)
+            return True
+
+    def _compile(self, fn: str, errors: Dict[str, List[str]]) -> "CompiledProgram | None":
+        try:
+            with open(os.path.join(self.folder, fn), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            errors[fn] = [f"unreadable: {e}"]
+        else:
+            problems = validate_program(data, os.path.splitext(fn)[0])
+            if not problems:
+                data.setdefault("id", os.path.splitext(fn)[0])
+                return CompiledProgram(data)
+            errors[fn] = problems
+        print(f"[WARN] program {fn} skipped: {'; '.join(errors[fn])}")
+        return None
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception as e:  # keep serving the current snapshot
+            print(f"[WARN] program reload from {self.folder} failed: {e}")
+
+    def _current(self) -> _Snapshot:
+        now = time.monotonic()
+        if self.check_interval >= 0 and now - self._last_check >= self.check_interval:
+            self._last_check = now  # claim this interval so concurrent lookups don't queue more checks
+            _RELOADER.submit(self._background_reload)
+        return self._snap
+
+    # ---- Reads ----
+    @property
+    def cache(self) -> Dict[str, Dict[str, Any]]:
+        return {pid: p.data for pid, p in self._current().programs.items()}
+
+    def __contains__(self, program_id: str) -> bool:
+        return program_id in self._current().programs
 
     def list_programs(self) -> List[Dict[str, Any]]:
-        return [{"id": p["id"], "name": p["name"], "duration_days": p.get("duration_days", len(p.get("steps", [])))} for p in self.cache.values()]
+        return self._current().listing
+
+    def list_json(self) -> bytes:
+        """/list response body, serialized once per snapshot."""
+        return self._current().listing_json
+
+    def compiled(self, program_id: str) -> CompiledProgram:
+        return self._current().programs[program_id]
 
     def get(self, program_id: str) -> Dict[str, Any]:
-        return self.cache[program_id]
+        return self.compiled(program_id).data
 
 
 class ProgramEngine:
-    def __init__(self, db_path="sehat.db", programs_folder="programs"):
-        self.db = sqlite3.connect(db_path, check_same_thread=False)
-        self.db.row_factory = sqlite3.Row
+    """
+    Program progress in SQLite (WAL), synchronous; the API serves it through
+    SQLiteStorage. Each thread gets its own connection, and
+    every write (enroll, next_step, reset) is one IMMEDIATE transaction, so
+    concurrent requests queue on the busy timeout instead of failing with
+    "database is locked".
+    """
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(self, db_path="sehat.db", programs_folder="programs", *,
+                 write_behind: "WriteBehindBuffer | bool | None" = None,
+                 registry: "ProgramRegistry | None" = None):
+        self.db_path = db_path
+        self._local = threading.local()
         self._init_db()
-        self.registry = ProgramRegistry(programs_folder)
+        self.registry = registry or ProgramRegistry(programs_folder)
+        if write_behind is None:
+            write_behind = os.getenv("PROGRAM_WRITE_BEHIND", "0") not in {"0", "false", "False"}
+        if write_behind is True:
+            write_behind = WriteBehindBuffer(self)
+        self.buffer: "WriteBehindBuffer | None" = write_behind or None
+
+    # ---- Connections (one per thread) ----
+    @property
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: no implicit transactions; _tx() opens them explicitly
+            conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL-safe; fsync at checkpoint, not per commit
+            conn.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """BEGIN IMMEDIATE … COMMIT on this thread's connection (ROLLBACK on error)."""
+        conn = self.db
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
     def _init_db(self):
-        cur = self.db.cursor()
-        cur.execute("""CREATE TABLE IF NOT EXISTS users (
-          user_id TEXT PRIMARY KEY, created_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
-        cur.execute("""CREATE TABLE IF NOT EXISTS enrollments (
-          user_id TEXT NOT NULL, program_id TEXT NOT NULL,
-          current_step_index INTEGER NOT NULL DEFAULT 0,
-          started_at TEXT DEFAULT CURRENT_TIMESTAMP,
-          updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-          completed INTEGER DEFAULT 0,
-          PRIMARY KEY (user_id, program_id))""")
-        self.db.commit()
+        apply_sqlite_migrations(self.db)
 
     def ensure_user(self, user_id: str):
-        cur = self.db.cursor()
-        cur.execute("INSERT OR IGNORE INTO users(user_id) VALUES(?)", (user_id,))
-        self.db.commit()
+        with self._tx() as db:
+            db.execute("INSERT OR IGNORE INTO users(user_id) VALUES(?)", (user_id,))
 
+    # ---- Storage primitives (step numbers are 1-based) ----
     def enroll(self, user_id: str, program_id: str):
-        self.ensure_user(user_id)
-        cur = self.db.cursor()
-        cur.execute("""INSERT OR IGNORE INTO enrollments(user_id, program_id)
-                       VALUES (?, ?)""", (user_id, program_id))
-        self.db.commit()
+        if self.buffer:
+            return self.buffer.enroll(user_id, program_id)
+        with self._tx() as db:
+            db.execute("INSERT OR IGNORE INTO users(user_id) VALUES(?)", (user_id,))
+            if db.execute("""INSERT OR IGNORE INTO enrollments(user_id, program_id)
+                             VALUES (?, ?)""", (user_id, program_id)).rowcount:
+                record_events(db, [(utc_now(), user_id, program_id, "enroll", 0)])
+
+    def advance(self, user_id: str, program_id: str, n: int) -> "int | None":
+        """Enroll-or-advance; the step just served, or None if already complete."""
+        if self.buffer:
+            return self.buffer.advance(user_id, program_id, n)
+        now = utc_now()
+        with self._tx() as db:
+            db.execute("INSERT OR IGNORE INTO users(user_id) VALUES(?)", (user_id,))
+            # One statement; the WHERE guard makes a finished program a no-op
+            # (no row returned) even under concurrent calls. RETURNING gives the
+            # advanced index, which is the 1-based number of the step served.
+            row = db.execute("""INSERT INTO enrollments(user_id, program_id, current_step_index, completed, updated_at)
+                                VALUES (:u, :p, 1, :n <= 1, :now)
+                                ON CONFLICT(user_id, program_id) DO UPDATE SET
+                                  current_step_index = current_step_index + 1,
+                                  completed = current_step_index + 1 >= :n,
+                                  updated_at = :now
+                                WHERE completed = 0 AND current_step_index < :n
+                                RETURNING current_step_index""",
+                             {"u": user_id, "p": program_id, "n": n, "now": now}).fetchone()
+            if row is not None:
+                record_events(db, step_events(now, user_id, program_id, row[0], n))
+        return None if row is None else row[0]
+
+    def reset(self, user_id: str, program_id: str):
+        if self.buffer:
+            return self.buffer.reset(user_id, program_id)
+        now = utc_now()
+        with self._tx() as db:
+            if db.execute("""UPDATE enrollments SET current_step_index=0, completed=0,
+                             updated_at=? WHERE user_id=? AND program_id=?""",
+                          (now, user_id, program_id)).rowcount:
+                record_events(db, [(now, user_id, program_id, "reset", 0)])
+
+    # Cohorts: one set-based statement over json_each(ids), one transaction
+    def bulk_enroll(self, user_ids: Iterable[str], program_id: str) -> int:
+        """Enroll every id in `user_ids`; returns how many were not enrolled before."""
+        now, ids = utc_now(), json.dumps(list(dict.fromkeys(user_ids)))
+        with self._bypass_buffer(), self._tx() as db:
+            db.execute("INSERT OR IGNORE INTO users(user_id) SELECT value FROM json_each(?)", (ids,))
+            added = db.execute("""INSERT OR IGNORE INTO enrollments(user_id, program_id)
+                                  SELECT value, ? FROM json_each(?) RETURNING user_id""",
+                               (program_id, ids)).fetchall()
+            record_events(db, [(now, u, program_id, "enroll", 0) for (u,) in added])
+        return len(added)
+
+    def bulk_advance(self, user_ids: Iterable[str], program_id: str, n: int) -> Dict[str, int]:
+        """{user_id: step served} for ids that advanced; missing ids had finished."""
+        now, ids = utc_now(), json.dumps(list(dict.fromkeys(user_ids)))
+        with self._bypass_buffer(), self._tx() as db:
+            db.execute("INSERT OR IGNORE INTO users(user_id) SELECT value FROM json_each(?)", (ids,))
+            # Same guarded upsert as advance(); `WHERE true` lets SQLite parse
+            # ON CONFLICT after a SELECT.
+            rows = db.execute("""INSERT INTO enrollments(user_id, program_id, current_step_index, completed, updated_at)
+                                 SELECT value, :p, 1, :n <= 1, :now FROM json_each(:ids) WHERE true
+                                 ON CONFLICT(user_id, program_id) DO UPDATE SET
+                                   current_step_index = current_step_index + 1,
+                                   completed = current_step_index + 1 >= :n,
+                                   updated_at = :now
+                                 WHERE completed = 0 AND current_step_index < :n
+                                 RETURNING user_id, current_step_index""",
+                              {"p": program_id, "n": n, "now": now, "ids": ids}).fetchall()
+            record_events(db, [e for u, step in rows for e in step_events(now, u, program_id, step, n)])
+        return dict(rows)
+
+    def progress(self, user_ids: Iterable[str], program_id: str) -> Dict[str, int]:
+        """{user_id: current_step_index} for enrolled ids."""
+        if self.buffer:
+            self.buffer.flush()
+        rows = self.db.execute("""SELECT user_id, current_step_index FROM enrollments
+                                  WHERE program_id = ? AND user_id IN (SELECT value FROM json_each(?))""",
+                               (program_id, json.dumps(list(dict.fromkeys(user_ids))))).fetchall()
+        return dict(rows)
+
+    def due_page(self, cutoff: str, after: tuple = ("", "", ""), limit: int = 500) -> List[tuple]:
+        """
+        Unfinished enrollments last touched before `cutoff`, ordered by
+        (updated_at, user_id, program_id) and starting after the `after` key:
+        [(user_id, program_id, current_step_index, updated_at), ...].
+        """
+        if self.buffer:
+            self.buffer.flush()
+        return [tuple(r) for r in self.db.execute(
+            """SELECT user_id, program_id, current_step_index, updated_at FROM enrollments
+               WHERE completed = 0 AND updated_at < ? AND (updated_at, user_id, program_id) > (?, ?, ?)
+               ORDER BY updated_at, user_id, program_id LIMIT ?""", (cutoff, *after, limit))]
 
+    def funnel(self, program_id: str, since_day: str, until_day: str,
+               distinct_users: bool = False) -> Dict[Tuple[str, int], int]:
+        """
+        {(event, step): count} over days [since_day, until_day]: event counts
+        from the daily rollup, or distinct users from the raw event log.
+        """
+        if self.buffer:
+            self.buffer.flush()
+        if distinct_users:
+            sql = """SELECT event, step, COUNT(DISTINCT user_id) FROM program_events
+                     WHERE program_id = ? AND day BETWEEN ? AND ? GROUP BY event, step"""
+        else:
+            sql = """SELECT event, step, SUM(n) FROM program_step_daily
+                     WHERE program_id = ? AND day BETWEEN ? AND ? GROUP BY event, step"""
+        return {(e, st): c for e, st, c in self.db.execute(sql, (program_id, since_day, until_day))}
+
+    def rebuild_rollups(self):
+        """Recompute program_step_daily from program_events (backfills, repairs)."""
+        with self._bypass_buffer(), self._tx() as db:
+            db.execute("DELETE FROM program_step_daily")
+            db.execute("""INSERT INTO program_step_daily(program_id, day, event, step, n)
+                          SELECT program_id, day, event, step, COUNT(*) FROM program_events
+                          GROUP BY program_id, day, event, step""")
+
+    @contextmanager
+    def _bypass_buffer(self):
+        """Set-based writes go straight to SQLite; buffered acks are flushed first."""
+        if not self.buffer:
+            yield
+            return
+        with self.buffer.exclusive():
+            yield
+
+    # ---- Rendered API ----
     def next_step(self, user_id: str, program_id: str) -> str:
-        prog = self.registry.get(program_id)
-        steps = prog.get("steps", [])
-        cur = self.db.cursor()
-        row = cur.execute("""SELECT current_step_index, completed
-                             FROM enrollments WHERE user_id=? AND program_id=?""",
-                          (user_id, program_id)).fetchone()
-        if not row:
+        prog = self.registry.compiled(program_id)
+        if not prog.messages:
             self.enroll(user_id, program_id)
-            idx, completed = 0, 0
+            return prog.done
+        return prog.message(self.advance(user_id, program_id, len(prog.messages)))
+
+    def bulk_next_step(self, user_ids: Iterable[str], program_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        next_step() for a whole cohort. The upsert runs before this returns;
+        the iterator only renders {user_id, step, completed, message} rows.
+        """
+        prog = self.registry.compiled(program_id)
+        ids = list(dict.fromkeys(user_ids))
+        if not prog.messages:
+            self.bulk_enroll(ids, program_id)
+            return cohort_rows(ids, prog, {}, missing="done")
+        return cohort_rows(ids, prog, self.bulk_advance(ids, program_id, len(prog.messages)), missing="done")
+
+    def bulk_current(self, user_ids: Iterable[str], program_id: str) -> Iterator[Dict[str, Any]]:
+        """Last step served to each user, without advancing (step None = not enrolled)."""
+        prog = self.registry.compiled(program_id)
+        ids = list(dict.fromkeys(user_ids))
+        return cohort_rows(ids, prog, self.progress(ids, program_id), missing=None)
+
+
+def step_events(ts: str, user_id: str, program_id: str, step: int, n: int) -> List[tuple]:
+    """Events for serving `step` of an n-step program: a step, plus complete on the last one."""
+    events = [(ts, user_id, program_id, "step", step)]
+    if step >= n:
+        events.append((ts, user_id, program_id, "complete", step))
+    return events
+
+
+def record_events(db: sqlite3.Connection, events: List[tuple]):
+    """
+    Append (ts, user_id, program_id, event, step[, event_id]) rows and bump
+    their daily rollups (caller's transaction). event_id is set only by the
+    write-behind journal.
+    """
+    if not events:
+        return
+    db.executemany("""INSERT INTO program_events(ts, day, user_id, program_id, event, step, event_id)
+                      VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                   [(e[0], e[0][:10], *e[1:5], e[5] if len(e) > 5 else None) for e in events])
+    counts = Counter((p, ts[:10], e, st) for ts, _, p, e, st, *_ in events)
+    db.executemany("""INSERT INTO program_step_daily(program_id, day, event, step, n) VALUES (?, ?, ?, ?, ?)
+                      ON CONFLICT(program_id, day, event, step) DO UPDATE SET n = n + excluded.n""",
+                   [(*key, c) for key, c in counts.items()])
+
+
+def cohort_rows(ids: List[str], prog: CompiledProgram, steps_by_user: Dict[str, int],
+                missing: "str | None") -> Iterator[Dict[str, Any]]:
+    """
+    {user_id, step, completed, message} per id. Ids absent from `steps_by_user`
+    are "done" (program already finished) or, with missing=None, not enrolled.
+    """
+    n = len(prog.messages)
+    for user_id in ids:
+        step = steps_by_user.get(user_id)
+        if step is not None:
+            step = min(step, n)  # the program file may have lost steps since this user advanced
+            yield {"user_id": user_id, "step": step, "completed": step >= n,
+                   "message": prog.messages[step - 1] if step else None}
+        elif missing == "done":
+            yield {"user_id": user_id, "step": n, "completed": True, "message": prog.done}
         else:
-            idx, completed = row["current_step_index"], row["completed"]
+            yield {"user_id": user_id, "step": None, "completed": False, "message": None}
+
+
+class WriteBehindBuffer:
+    """
+    Group-commit mode for ProgramEngine (PROGRAM_WRITE_BEHIND=1).
+
+    enroll/next_step/reset update an in-memory overlay of enrollment rows and
+    return at once; a writer thread upserts every dirty row in one transaction
+    each `flush_ms` or as soon as `flush_every` rows are dirty. Reads go through
+    the overlay, so a user always sees their own acknowledged progress (the
+    overlay assumes this process is the only writer for its users).
 
-        if completed or idx >= len(steps):
-            return self._format_done(prog)
+    Durability (PROGRAM_WRITE_BEHIND_DURABILITY):
+      memory   a crash loses up to `flush_ms` of acknowledged progress
+      journal  every ack (row state and its program_events) is appended to
+               `<db>.wb.<seq>` before returning;
+               segments are replayed at startup and deleted once flushed.
+               Survives a process crash; not an OS crash (no per-ack fsync).
+    """
+    LAG_SAMPLES = 1000
 
-        step = steps[idx]
-        # advance progress
-        cur.execute("""UPDATE enrollments
-                       SET current_step_index=?, updated_at=?, completed=?
-                       WHERE user_id=? AND program_id=?""",
-                    (idx + 1, time.strftime("%Y-%m-%d %H:%M:%S"),
-                     1 if (idx + 1) >= len(steps) else 0, user_id, program_id))
-        self.db.commit()
+    def __init__(self, engine: "ProgramEngine", *, flush_ms: float | None = None,
+                 flush_every: int | None = None, durability: str | None = None,
+                 journal_path: str | None = None):
+        self.engine = engine
+        self.flush_ms = flush_ms if flush_ms is not None else float(os.getenv("PROGRAM_WRITE_BEHIND_MS", "50"))
+        self.flush_every = flush_every or int(os.getenv("PROGRAM_WRITE_BEHIND_MAX", "500"))
+        self.durability = durability or os.getenv("PROGRAM_WRITE_BEHIND_DURABILITY", "journal")
+        if self.durability not in ("memory", "journal"):
+            raise ValueError(f"Unknown write-behind durability: {self.durability!r}")
+        self.journal_path = journal_path or f"{engine.db_path}.wb"
+        self.max_rows = int(os.getenv("PROGRAM_WRITE_BEHIND_ROWS", "100000"))  # clean rows kept as a read cache
 
-        return self._format_step(step, prog)
+        # (user_id, program_id) -> [current_step_index, completed, updated_at]
+        self._rows: Dict[tuple, list] = {}
+        self._dirty: Dict[tuple, float] = {}  # key -> monotonic time first dirtied
+        self._events: List[tuple] = []  # program_events rows, committed with the rows they describe
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush (or bulk bypass) at a time
+        self._wake = threading.Event()
+        self._stop = False
+        self._journal = None
+        self._segment = 0
+        self.metrics = {"acks": 0, "flushes": 0, "rows_flushed": 0, "flush_errors": 0,
+                        "max_flush_rows": 0, "recovered_rows": 0}
+        self._lag_ms: deque = deque(maxlen=self.LAG_SAMPLES)
+        self._flush_rows: deque = deque(maxlen=self.LAG_SAMPLES)
+
+        if self.durability == "journal":
+            self._recover()
+            self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="program-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---- Acknowledged writes (memory only; caller never waits on disk) ----
+    def enroll(self, user_id: str, program_id: str):
+        key = (user_id, program_id)
+        with self._lock:
+            if self._row(key) is None:
+                now = utc_now()
+                self._rows[key] = [0, 0, now]
+                self._mark(key, [(now, user_id, program_id, "enroll", 0)])
+
+    def advance(self, user_id: str, program_id: str, n: int) -> "int | None":
+        """Step number just served (1-based), or None if the program was already complete."""
+        key = (user_id, program_id)
+        with self._lock:
+            row = self._row(key)
+            if row is None:  # auto-enroll; marked dirty below
+                row = self._rows[key] = [0, 0, None]
+            if row[1] or row[0] >= n:
+                return None
+            row[0] += 1
+            row[1] = int(row[0] >= n)
+            row[2] = utc_now()
+            self._mark(key, step_events(row[2], user_id, program_id, row[0], n))
+            return row[0]
 
     def reset(self, user_id: str, program_id: str):
-        cur = self.db.cursor()
-        cur.execute("""UPDATE enrollments SET current_step_index=0, completed=0,
-                       updated_at=? WHERE user_id=? AND program_id=?""",
-                    (time.strftime("%Y-%m-%d %H:%M:%S"), user_id, program_id))
-        self.db.commit()
-
-    # ---- Formatting (SukoonAI style: Answer → Source → Disclaimer) ----
-    def _format_step(self, step: Dict[str, Any], prog: Dict[str, Any]) -> str:
-        src = prog.get("id", "program.json")
-        en = step.get("en", "No English text.")
-        ur = step.get("ur", "Koi Urdu matn nahi mila.")
-        src_line = f"📖 Source: {src}"
-        disc = f"⚠️ {SukoonAI_DISCLAIMER_EN}\n⚠️ {SukoonAI_DISCLAIMER_UR}"
-        return f"{en}\n\n{ur}\n\n{src_line}\n{disc}"
-
-    def _format_done(self, prog: Dict[str, Any]) -> str:
-        src = prog.get("id", "program.json")
-        en = "🎉 Program complete! You can repeat or explore another program."
-        ur = "🎉 Program mukammal ho gaya! Aap dobara shuru kar sakte hain ya koi naya program koshish karein."
-        return self._format_step({"en": en, "ur": ur}, prog)
+        key = (user_id, program_id)
+        with self._lock:
+            row = self._row(key)
+            if row is None:  # not enrolled: same no-op as the UPDATE
+                return
+            row[0], row[1], row[2] = 0, 0, utc_now()
+            self._mark(key, [(row[2], user_id, program_id, "reset", 0)])
+
+    def _row(self, key: tuple) -> "list | None":
+        """Overlay row, loading the committed one on first touch (lock held)."""
+        row = self._rows.get(key)
+        if row is None:
+            found = self.engine.db.execute(
+                """SELECT current_step_index, completed, updated_at FROM enrollments
+                   WHERE user_id=? AND program_id=?""", key).fetchone()
+            if found is not None:
+                row = self._rows[key] = list(found)
+        return row
+
+    def _mark(self, key: tuple, events: List[tuple]):
+        # lock held
+        self._dirty.setdefault(key, time.monotonic())
+        if self._journal is not None:  # ids let recovery skip exactly the events already committed
+            events = [(*e, uuid.uuid4().hex) for e in events]
+        self._events.extend(events)
+        self.metrics["acks"] += 1
+        if self._journal is not None:
+            lines = [["row", *key, *self._rows[key]]] + [["event", *e] for e in events]
+            self._journal.write("".join(json.dumps(line) + "\n" for line in lines))
+            self._journal.flush()
+        if len(self._dirty) >= self.flush_every:
+            self._wake.set()
+
+    # ---- Flushing ----
+    def flush(self) -> int:
+        """Write every dirty row now, in one transaction. Returns rows written."""
+        with self._flush_lock:
+            return self._flush_locked()
+
+    def _flush_locked(self, strict: bool = False) -> int:
+        """Write the dirty rows; on failure they stay queued, and `strict` re-raises."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            events, self._events = self._events, []
+            batch = [(*key, *self._rows[key]) for key in dirty]
+            segment = self._rotate()
+        started = time.monotonic()
+        try:
+            self._write(batch, events)
+        except Exception as e:
+            with self._lock:  # retry next round; newer acks for the same key win
+                for key, since in dirty.items():
+                    self._dirty.setdefault(key, since)
+                self._events[:0] = events
+            self.metrics["flush_errors"] += 1
+            if strict:
+                raise
+            print("[WARN] program write-behind flush failed:", e)
+            return 0
+        if segment is not None:
+            for path in self._segments(upto=segment):
+                os.remove(path)
+        with self._lock:
+            if len(self._rows) > self.max_rows:
+                self._rows = {k: v for k, v in self._rows.items() if k in self._dirty}
+        self.metrics["flushes"] += 1
+        self.metrics["rows_flushed"] += len(batch)
+        self.metrics["max_flush_rows"] = max(self.metrics["max_flush_rows"], len(batch))
+        self._flush_rows.append(len(batch))
+        self._lag_ms.append((started - min(dirty.values())) * 1000)
+        return len(batch)
+
+    def _write(self, batch: List[tuple], events: List[tuple]):
+        with self.engine._tx() as db:
+            db.executemany("INSERT OR IGNORE INTO users(user_id) VALUES(?)", [(b[0],) for b in batch])
+            db.executemany("""INSERT INTO enrollments(user_id, program_id, current_step_index, completed, updated_at)
+                              VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                              ON CONFLICT(user_id, program_id) DO UPDATE SET
+                                current_step_index = excluded.current_step_index,
+                                completed = excluded.completed,
+                                updated_at = excluded.updated_at""", batch)
+            record_events(db, events)
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Flush, then hold acks and flushes while set-based SQL bypasses the
+        overlay. Raises if the flush fails: the bulk write must not run over
+        acks that never reached SQLite.
+        """
+        with self._flush_lock:
+            self._flush_locked(strict=True)
+            with self._lock:
+                try:
+                    yield
+                finally:
+                    # Clean rows may now be stale; dirty ones are still owed to SQLite
+                    self._rows = {k: v for k, v in self._rows.items() if k in self._dirty}
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_ms / 1000)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:  # e.g. journal rotation; keep the writer alive
+                self.metrics["flush_errors"] += 1
+                print("[WARN] program write-behind flush failed:", e)
+
+    def close(self):
+        if self._stop:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout=5.0)
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            if not self._dirty:  # everything acked is committed; the open segment is empty
+                os.remove(f"{self.journal_path}.{self._segment}")
+
+    # ---- Journal segments ----
+    def _segments(self, upto: "int | None" = None) -> List[str]:
+        paths = glob.glob(glob.escape(self.journal_path) + ".*")
+        seq = lambda p: int(p.rsplit(".", 1)[1]) if p.rsplit(".", 1)[1].isdigit() else -1
+        return sorted((p for p in paths if seq(p) >= 0 and (upto is None or seq(p) <= upto)), key=seq)
+
+    def _open_segment(self):
+        self._segment += 1
+        self._journal = open(f"{self.journal_path}.{self._segment}", "a", encoding="utf-8")
+
+    def _rotate(self) -> "int | None":
+        # lock held: acks after this point land in the next segment
+        if self._journal is None:
+            return None
+        self._journal.close()
+        flushed = self._segment
+        self._open_segment()
+        return flushed
+
+    def _recover(self):
+        """
+        Replay journal segments left by a crash: the last row state per key
+        wins, and events are appended unless their event_id is already
+        committed (a crash can land between a flush's commit and its segment
+        cleanup).
+        """
+        latest: Dict[tuple, tuple] = {}
+        events: List[tuple] = []
+        segments = self._segments()
+        for path in segments:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        kind, *fields = json.loads(line)
+                    except ValueError:  # torn final line
+                        continue
+                    if kind == "row":
+                        latest[(fields[0], fields[1])] = tuple(fields)
+                    elif kind == "event":
+                        events.append(tuple(fields))
+        db = self.engine.db
+        def committed(e):
+            if len(e) > 5:
+                return db.execute("SELECT 1 FROM program_events WHERE event_id=?", (e[5],)).fetchone()
+            # Segment written before event ids: best effort on the event's fields
+            return db.execute("""SELECT 1 FROM program_events
+                                 WHERE user_id=? AND program_id=? AND ts=? AND event=? AND step=?""",
+                              (e[1], e[2], e[0], e[3], e[4])).fetchone()
+
+        events = [e for e in events if committed(e) is None]
+        if latest or events:
+            self._write(list(latest.values()), events)
+            self.metrics["recovered_rows"] = len(latest)
+        for path in segments:
+            os.remove(path)
+        self._segment = max((int(p.rsplit(".", 1)[1]) for p in segments), default=0)
+
+    # ---- Metrics ----
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._dirty)
+            oldest = min(self._dirty.values(), default=None)
+        return {
+            **self.metrics,
+            "durability": self.durability,
+            "flush_ms": self.flush_ms,
+            "flush_every": self.flush_every,
+            "pending": pending,
+            "pending_age_ms": round((time.monotonic() - oldest) * 1000, 1) if oldest else 0.0,
+            "flush_rows": summarize(list(self._flush_rows), digits=1),
+            "lag_ms": summarize(list(self._lag_ms), digits=1),
+        }
+
+
+class AsyncProgramEngine:
+    """
+    Async program API over a pluggable ProgramStorage (see program_storage.py).
+    Storage only moves step counters; messages come pre-rendered from the
+    registry, so every backend serves identical text.
+    """
+    def __init__(self, db_path="sehat.db", programs_folder="programs", *,
+                 storage: "ProgramStorage | None" = None, workers: int | None = None):
+        self.registry = ProgramRegistry(programs_folder)
+        self.storage = storage or storage_from_env(db_path, self.registry, workers)
+
+    async def enroll(self, user_id: str, program_id: str):
+        await self.storage.enroll(user_id, program_id)
+
+    async def next_step(self, user_id: str, program_id: str) -> str:
+        prog = self.registry.compiled(program_id)
+        if not prog.messages:
+            await self.storage.enroll(user_id, program_id)
+            return prog.done
+        return prog.message(await self.storage.advance(user_id, program_id, len(prog.messages)))
+
+    async def reset(self, user_id: str, program_id: str):
+        await self.storage.reset(user_id, program_id)
+
+    async def bulk_enroll(self, user_ids: List[str], program_id: str) -> int:
+        return await self.storage.bulk_enroll(list(dict.fromkeys(user_ids)), program_id)
+
+    async def bulk_next_step(self, user_ids: List[str], program_id: str) -> Iterator[Dict[str, Any]]:
+        prog = self.registry.compiled(program_id)
+        ids = list(dict.fromkeys(user_ids))
+        if not prog.messages:
+            await self.storage.bulk_enroll(ids, program_id)
+            return cohort_rows(ids, prog, {}, missing="done")
+        return cohort_rows(ids, prog, await self.storage.bulk_advance(ids, program_id, len(prog.messages)),
+                           missing="done")
+
+    async def bulk_current(self, user_ids: List[str], program_id: str) -> Iterator[Dict[str, Any]]:
+        ids = list(dict.fromkeys(user_ids))
+        return cohort_rows(ids, self.registry.compiled(program_id),
+                           await self.storage.progress(ids, program_id), missing=None)
+
+    async def funnel(self, program_id: str, days: int = 30, distinct_users: bool = False) -> Dict[str, Any]:
+        """
+        Enrolled → step 1..n → completed over the last `days` UTC days.
+        `reached` per step is relative to step 1 in `rate`; with
+        distinct_users a user counts once per step however often they reset.
+        """
+        prog = self.registry.compiled(program_id)
+        t = time.perf_counter()
+        since, until = utc_now(-(days - 1) * 86400)[:10], utc_now()[:10]
+        counts = await self.storage.funnel(program_id, since, until, distinct_users)
+        reached = [counts.get(("step", i), 0) for i in range(1, len(prog.messages) + 1)]
+        first = reached[0] if reached else 0
+        return {
+            "program_id": program_id, "since": since, "until": until,
+            "source": "events" if distinct_users else "rollup",
+            "enrolled": counts.get(("enroll", 0), 0),
+            "started": first,
+            "completed": sum(c for (e, _), c in counts.items() if e == "complete"),
+            "resets": counts.get(("reset", 0), 0),
+            "steps": [{"step": i, "reached": r, "rate": round(r / first, 4) if first else 0.0}
+                      for i, r in enumerate(reached, 1)],
+            "ms": round((time.perf_counter() - t) * 1000, 3),
+        }
+
+    async def start(self):
+        await self.storage.start()
+
+    async def close(self):
+        await self.storage.close()
@@ -0,0 +1,191 @@
+"""
+Due-step scheduler for daily program reminders.
+
+An enrollment is due when it is not completed and its updated_at is older
+than PROGRAM_DUE_AFTER_SECS (24h). `DueStepScheduler.run_once()` walks due
+enrollments with keyset pagination over the enrollments_due index (no
+OFFSET, no table scan) and hands each page to a sink as one batch of
+{user_id, program_id, step, due_since, message} rows.
+
+Each run covers the window [last cutoff, this cutoff), persisted in a small
+state file, so a user is reminded once per step they fall behind on. Run
+one worker per deployment:
+    python -m program_scheduler once
+    python -m program_scheduler run --interval 300
+    python -m program_scheduler once --sink jsonl:data/reminders.jsonl --all
+
+Sinks (PROGRAM_REMINDER_SINK): "jsonl:<path>" appends one JSON line per due
+step; "queue" keeps batches on an in-process queue.Queue (tests, embedding
+the worker). Anything with emit(batch) (sync or async) plugs in.
+"""
+import argparse, asyncio, base64, inspect, json, os, queue, time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from program_engine import AsyncProgramEngine
+from program_storage import utc_now
+
+DUE_AFTER_SECS = float(os.getenv("PROGRAM_DUE_AFTER_SECS", str(24 * 3600)))
+DUE_PAGE_SIZE = int(os.getenv("PROGRAM_DUE_PAGE_SIZE", "1000"))
+REMINDER_SINK = os.getenv("PROGRAM_REMINDER_SINK", "jsonl:data/reminders.jsonl")
+SCHEDULER_STATE = os.getenv("PROGRAM_SCHEDULER_STATE", "data/reminder_state.json")
+
+
+# ---- Sinks ----
+class ReminderSink(ABC):
+    @abstractmethod
+    def emit(self, batch: List[Dict[str, Any]]):
+        """Deliver one page of due-step rows."""
+
+    def close(self):
+        pass
+
+
+class JsonlSink(ReminderSink):
+    """Local stand-in for a push/SMS provider: one JSON line per due step."""
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def emit(self, batch):
+        self._f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch))
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class QueueSink(ReminderSink):
+    """Batches land on `self.queue` for an in-process consumer."""
+    def __init__(self, maxsize: int = 0):
+        self.queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize)
+
+    def emit(self, batch):
+        self.queue.put(batch)
+
+
+def sink_from_spec(spec: str = REMINDER_SINK) -> ReminderSink:
+    kind, _, arg = spec.partition(":")
+    if kind == "jsonl":
+        return JsonlSink(arg or "data/reminders.jsonl")
+    if kind == "queue":
+        return QueueSink(int(arg) if arg else 0)
+    raise ValueError(f"Unknown reminder sink: {spec!r}")
+
+
+# ---- Cursors for the paginated API ----
+def encode_cursor(key: Tuple[str, str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[str, str, str]:
+    if not cursor:
+        return ("", "", "")
+    updated_at, user_id, program_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return (updated_at, user_id, program_id)
+
+
+# ---- Scheduler ----
+class DueStepScheduler:
+    def __init__(self, engine: AsyncProgramEngine, sink: Optional[ReminderSink] = None, *,
+                 due_after_secs: float = DUE_AFTER_SECS, page_size: int = DUE_PAGE_SIZE,
+                 state_path: Optional[str] = SCHEDULER_STATE):
+        self.engine = engine
+        self.sink = sink
+        self.due_after_secs = due_after_secs
+        self.page_size = page_size
+        self.state_path = Path(state_path) if state_path else None
+
+    def _rows(self, page: List[tuple]) -> List[Dict[str, Any]]:
+        out = []
+        for user_id, program_id, idx, updated_at in page:
+            try:
+                prog = self.engine.registry.compiled(program_id)
+            except KeyError:  # program file removed since enrollment
+                continue
+            if idx < len(prog.messages):
+                out.append({"user_id": user_id, "program_id": program_id, "step": idx + 1,
+                            "due_since": updated_at, "message": prog.messages[idx]})
+        return out
+
+    async def page(self, cutoff: str, after: Tuple[str, str, str] = ("", "", ""),
+                   limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, str, str]]]:
+        """One page of due steps and the key to continue after (None = last page)."""
+        limit = limit or self.page_size
+        raw = await self.engine.storage.due_page(cutoff, after, limit)
+        nxt = (raw[-1][3], raw[-1][0], raw[-1][1]) if len(raw) == limit else None
+        return self._rows(raw), nxt
+
+    async def pages(self, cutoff: str, since: Optional[str] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        key: Optional[Tuple[str, str, str]] = (since or "", "", "")
+        while key is not None:
+            rows, key = await self.page(cutoff, key)
+            if rows:
+                yield rows
+
+    def cutoff(self) -> str:
+        return utc_now(-self.due_after_secs)
+
+    def _load_watermark(self) -> Optional[str]:
+        if self.state_path and self.state_path.exists():
+            return json.loads(self.state_path.read_text(encoding="utf-8")).get("watermark")
+        return None
+
+    def _save_watermark(self, watermark: str):
+        if self.state_path:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"watermark": watermark}), encoding="utf-8")
+            os.replace(tmp, self.state_path)
+
+    async def run_once(self, *, everything: bool = False) -> Dict[str, Any]:
+        """Emit steps that became due since the last run (all due steps with everything=True)."""
+        t0 = time.perf_counter()
+        cutoff = self.cutoff()
+        since = None if everything else self._load_watermark()
+        emitted = batches = 0
+        async for batch in self.pages(cutoff, since):
+            result = self.sink.emit(batch)
+            if inspect.isawaitable(result):
+                await result
+            emitted += len(batch)
+            batches += 1
+        self._save_watermark(cutoff)
+        return {"since": since, "cutoff": cutoff, "emitted": emitted, "batches": batches,
+                "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    async def run_forever(self, interval_secs: float):
+        while True:
+            print("[reminders]", json.dumps(await self.run_once()))
+            await asyncio.sleep(interval_secs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Emit due program steps to a reminder sink")
+    ap.add_argument("cmd", choices=["once", "run"])
+    ap.add_argument("--interval", type=float, default=300, help="Seconds between runs (run)")
+    ap.add_argument("--sink", default=REMINDER_SINK)
+    ap.add_argument("--all", action="store_true", help="Ignore the watermark: emit every due step")
+    args = ap.parse_args(argv)
+
+    async def go():
+        engine = AsyncProgramEngine(db_path=os.getenv("PROGRAM_DB_PATH", "sehat.db"),
+                                    programs_folder=os.getenv("PROGRAMS_DIR", "programs"))
+        sink = sink_from_spec(args.sink)
+        scheduler = DueStepScheduler(engine, sink)
+        try:
+            if args.cmd == "once":
+                print(json.dumps(await scheduler.run_once(everything=args.all)))
+            else:
+                await scheduler.run_forever(args.interval)
+        finally:
+            sink.close()
+            await engine.close()
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,88 @@
+import asyncio
 import os
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+
+from packages.rag.answer_cache import ANSWER_CACHE_ENABLED, SemanticAnswerCache, index_version
+from packages.rag.context import pack
+from packages.rag.embeddings import INDEX_EMBEDDING_MODEL, get_embeddings
+from packages.rag.langid import ENGLISH, detect_language
+from packages.rag.llm import chat_model_from_env
+from packages.rag.mmr import diversify, embed_query
+from packages.rag.query_log import get_query_logger
+from packages.rag.telemetry import StageTimer, chunk_id, get_telemetry, usage_tokens
+from packages.rag.translate import Translator
 
 router = APIRouter()
 
 # ------------------------
-# Load FAISS Index
+# FAISS Index (loaded lazily on the first question, off the event loop,
+# and reloaded when the files under INDEX_PATH change)
 # ------------------------
-INDEX_PATH = "data/index/index"
-try:
-    db = FAISS.load_local(
+INDEX_PATH = os.getenv("QUERY_INDEX_PATH", "data/index/index")
+_db = None
+_db_version = None  # answer-cache entries are only valid for this index
+_db_lock = asyncio.Lock()
+
+
+def _load_db():
+    return FAISS.load_local(
         INDEX_PATH,
-        OpenAIEmbeddings(),
+        get_embeddings(INDEX_EMBEDDING_MODEL),
         allow_dangerous_deserialization=True
     )
-    retriever = db.as_retriever(search_kwargs={"k": 5})
-except Exception as e:
-    print("[ERROR] Could not load FAISS index:", e)
-    db = None
-    retriever = None
+
+
+async def get_db():
+    """
+    Shared index and its version. Each request stats the index files; a
+    rebuilt index is loaded once and swapped in. A failed load is retried on
+    the next request while the previous index (if any) keeps serving.
+    """
+    global _db, _db_version
+    version = index_version(INDEX_PATH)
+    if _db is None or version != _db_version:
+        async with _db_lock:
+            if _db is None or version != _db_version:
+                try:
+                    db = await asyncio.to_thread(_load_db)
+                    _db, _db_version = db, version
+                except Exception as e:
+                    print("[ERROR] Could not load FAISS index:", e)
+    return _db, _db_version
+
+# ------------------------
+# Concurrency + timeouts (per worker process)
+# ------------------------
+MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "16"))
+QUEUE_TIMEOUT_SECS = float(os.getenv("QUERY_QUEUE_TIMEOUT_SECS", "10"))
+SEARCH_TIMEOUT_SECS = float(os.getenv("QUERY_SEARCH_TIMEOUT_SECS", "5"))
+LLM_TIMEOUT_SECS = float(os.getenv("QUERY_LLM_TIMEOUT_SECS", "30"))
+_slots = asyncio.Semaphore(MAX_CONCURRENCY)
 
 # ------------------------
-# Setup LLM
+# Setup LLM (LLM_PROVIDER=fake for load tests, see packages/rag/llm.py)
 # ------------------------
 api_key = os.environ.get("OPENAI_API_KEY")
-if api_key:
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=api_key)
-    mode = "retriever+LLM"
-else:
-    llm = None
-    mode = "retriever-only"
+llm, mode = chat_model_from_env(api_key)
+
+# English questions (the majority) skip translation entirely; Urdu / Roman Urdu ones
+# hit the translation cache or lexicon first and the LLM (bounded by LLM_TIMEOUT_SECS) last
+translator = Translator(llm)
+
+# Paraphrases of answered questions with the same evidence skip the LLM
+answer_cache = SemanticAnswerCache(enabled=ANSWER_CACHE_ENABLED)
+
+# ------------------------
+# Query logging (opt-in; same buffered logger as the retriever CLI)
+# ------------------------
+qlog = get_query_logger(
+    os.getenv("QUERY_LOG_DIR", "logs"),
+    enabled=os.getenv("QUERY_LOG", "0") in {"1", "true", "True"},
+)
+# One row per request with stage timings (TELEMETRY=0 disables)
+telemetry = get_telemetry()
 
 # ------------------------
 # SYSTEM PROMPT
@@ -68,31 +119,99 @@ class QueryResponse(BaseModel):
 # ------------------------
 # Endpoint
 # ------------------------
-@router.post("/ask", response_model=QueryResponse)
-async def ask_question(req: QueryRequest):
-    user_q = req.question
+async def _until_disconnect(request: Request, coro, poll_secs: float = 0.25):
+    """Await `coro`, cancelling it if the client goes away first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_secs)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(499, "Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _search(db, query: str):
+    """Embed once; the vector feeds both MMR retrieval and the answer cache."""
+    query_vec = embed_query(db, query)
+    return query_vec, diversify(db, query, 3, query_vec=query_vec)
+
+
+@router.get("/cache")
+async def cache_stats():
+    return {"entries": len(answer_cache), "index_version": answer_cache.version, **answer_cache.stats.as_dict()}
 
-    if not retriever:
+
+@router.post("/ask", response_model=QueryResponse)
+async def ask_question(req: QueryRequest, request: Request):
+    try:
+        await asyncio.wait_for(_slots.acquire(), QUEUE_TIMEOUT_SECS)
+    except asyncio.TimeoutError:
+        raise HTTPException(503, "Too many questions in flight; retry shortly")
+    try:
+        return await _until_disconnect(request, _answer(req.question))
+    finally:
+        _slots.release()
+
+
+async def _answer(user_q: str) -> dict:
+    db, version = await get_db()
+    if db is None:
         return {"answer": "Error: FAISS index not available.", "mode": mode}
 
-    # Retrieve docs
-    docs_and_scores = db.similarity_search_with_score(user_q, k=5)
-    results = []
-    for doc, score in docs_and_scores:
-        norm_sim = 1 / (1 + score)
-        src = doc.metadata.get("source", "unknown")
-        snippet = doc.page_content[:300]
-        results.append((src, norm_sim, snippet))
-    results.sort(key=lambda x: x[1], reverse=True)
-    top_results = results[:3]
-
-    # Build context
-    context_text = "\n\n".join(
-        [f"Source: {src}\nContent: {snippet}" for src, sim, snippet in top_results]
-    )
+    timer = StageTimer()
+    cache = {}
+
+    # Retrieve docs (Urdu / Roman Urdu questions are searched in English);
+    # over-fetch and keep 3 diverse chunks instead of near-duplicate neighbours
+    with timer.stage("translate"):
+        lang = detect_language(user_q)
+        query_for_retrieval = user_q
+        if lang != ENGLISH:
+            try:
+                translation = await asyncio.wait_for(
+                    asyncio.to_thread(translator.translate, user_q, lang),
+                    LLM_TIMEOUT_SECS,
+                )
+                query_for_retrieval, cache["translation"] = translation.text, translation.source
+            except asyncio.TimeoutError:
+                # Search with the original words rather than failing the request
+                cache["translation"] = "timeout"
+
+    with timer.stage("retrieve"):
+        try:
+            query_vec, docs_and_scores = await asyncio.wait_for(
+                asyncio.to_thread(_search, db, query_for_retrieval),
+                SEARCH_TIMEOUT_SECS,
+            )
+        except asyncio.TimeoutError:
+            telemetry.record("api", stages=timer.ms, total_ms=timer.total_ms, lang=lang, cache=cache, error=True)
+            raise HTTPException(504, "Search timed out")
+        results = []
+        for doc, score in docs_and_scores:
+            norm_sim = 1 / (1 + float(score))
+            src = doc.metadata.get("source", "unknown")
+            snippet = doc.page_content[:300]
+            results.append((src, norm_sim, snippet, chunk_id(doc), doc.page_content))
+        results.sort(key=lambda x: x[1], reverse=True)
+        top_results = [r[:3] for r in results[:3]]
+        top_ids = [r[3] for r in results[:3]]
+
+    # Build context: merge overlapping chunks, drop repeats, fill the token budget
+    packed = pack([(text, src, sim) for src, sim, _, _, text in results[:3]], baseline_chars=300)
+    context_text = packed.text
 
     # LLM synthesis
-    if llm:
+    tokens, error = (0, 0), False
+    cached = answer_cache.get(query_vec, top_ids, version) if llm else None
+    if cached is not None:
+        answer, cache["answer"] = cached, "hit"
+    elif llm:
+        cache["answer"] = "miss"
         final_prompt = f"""{SYSTEM_PROMPT}
 
 User query: {user_q}
@@ -102,12 +221,21 @@ Relevant context from knowledge sources:
 
 Now answer bilingually (English + Roman Urdu) in a natural conversational style.
 """
-        try:
-            answer = llm.invoke(final_prompt).content
-        except Exception as e:
-            answer = f"[ERROR] LLM call failed: {e}"
+        with timer.stage("synthesize"):
+            try:
+                message = await asyncio.wait_for(llm.ainvoke(final_prompt), LLM_TIMEOUT_SECS)
+                answer, tokens = message.content, usage_tokens(message)
+            except asyncio.TimeoutError:
+                answer, error = f"[ERROR] LLM call timed out after {LLM_TIMEOUT_SECS:g}s", True
+            except Exception as e:
+                answer, error = f"[ERROR] LLM call failed: {e}", True
+        if not error:
+            answer_cache.put(query_vec, top_ids, answer, version)
     else:
         # fallback to retrieval-only
         answer = "\n".join([f"- {src} → {snippet}" for src, _, snippet in top_results])
 
+    qlog.log_query(user_q, mode, top_results, answer if llm else None)
+    telemetry.record("api", stages=timer.ms, total_ms=timer.total_ms, lang=lang,
+                     tokens=tokens, cache=cache, top_k=top_ids, error=error)
     return {"answer": answer, "mode": mode}
@@ -0,0 +1,109 @@
+"""
+Accuracy and speed of language identification on our logged questions.
+
+Compares packages/rag/langid.py against the legacy substring heuristic on the
+hand-labelled set (packages/rag/data/langid_eval.tsv) and reports how each
+classifies the unique questions found in logs/query_log_*.csv(.gz).
+Accuracy counts only rows that do not occur in the model's training seed.
+Every Urdu/Roman-Urdu verdict on an English question is a wasted LLM call.
+Usage:
+    python -m scripts.bench_langid [--json]
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import pathlib
+import time
+from collections import Counter
+
+from packages.rag import langid
+from packages.rag.langid import detect_language
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+EVAL = ROOT / "packages" / "rag" / "data" / "langid_eval.tsv"
+LOG_DIR = ROOT / "logs"
+
+def legacy_detect(text: str) -> str:
+    """The substring heuristic previously inlined in packages/rag/retriever.py."""
+    for ch in text:
+        if '؀' <= ch <= 'ۿ':
+            return "urdu-script"
+    roman_urdu_markers = ["hai", "kya", "nahi", "ka", "ki", "tum", "main"]
+    if any(marker in text.lower() for marker in roman_urdu_markers):
+        return "roman-urdu"
+    return "english"
+
+def load_eval():
+    rows = []
+    for line in EVAL.read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        text, label = line.rsplit("\t", 1)
+        rows.append((text, label.strip()))
+    return rows
+
+def in_seed(text):
+    """True if `text` occurs verbatim (word for word) in the character model's training seed."""
+    seed = " " + " ".join(langid._WORD.findall((langid._SEED_UR + langid._SEED_EN).lower())) + " "
+    words = " ".join(langid._WORD.findall(text.lower()))
+    return bool(words) and f" {words} " in seed
+
+def logged_questions():
+    seen = {}
+    for path in sorted(LOG_DIR.glob("query_log_*.csv*")):
+        raw = gzip.open(path, "rt", encoding="utf-8") if path.suffix == ".gz" else path.open(encoding="utf-8")
+        with raw as f:
+            for row in csv.DictReader(io.StringIO(f.read())):
+                q = (row.get("query") or "").strip()
+                if q and q != "query":
+                    seen[q] = seen.get(q, 0) + 1
+    return seen
+
+def evaluate(fn, rows):
+    correct = fp = 0
+    for text, label in rows:
+        pred = fn(text)
+        correct += pred == label
+        fp += label == "english" and pred != "english"
+    return correct / len(rows), fp
+
+def time_per_query_us(fn, texts, repeat=200):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            fn(t)
+    return (time.perf_counter() - t0) / (repeat * len(texts)) * 1e6
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    labelled = load_eval()
+    rows = [(t, label) for t, label in labelled if not in_seed(t)]  # accuracy on held-out rows only
+    texts = [t for t, _ in rows]
+    logged = logged_questions()
+    report = {"eval_size": len(labelled), "held_out": len(rows), "logged_unique": len(logged)}
+    for name, fn in (("langid", detect_language), ("legacy", legacy_detect)):
+        acc, fp = evaluate(fn, rows)
+        report[name] = {
+            "accuracy": round(acc, 3),
+            "english_false_positives": fp,
+            "us_per_query": round(time_per_query_us(fn, texts), 2),
+            "logged_labels": dict(Counter(fn(q) for q in logged)),
+        }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return
+    print(f"eval set: {report['eval_size']} labelled ({report['held_out']} held out from the seed), "
+          f"logged questions: {report['logged_unique']} unique")
+    print(f"{'detector':<8} {'accuracy':>9} {'EN false +':>11} {'µs/query':>9}  logged labels")
+    for name in ("langid", "legacy"):
+        r = report[name]
+        print(f"{name:<8} {r['accuracy']:>9.3f} {r['english_false_positives']:>11} {r['us_per_query']:>9.2f}  {r['logged_labels']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Cohort onboarding benchmark: N per-user enroll()/next_step() calls versus one
+bulk_enroll()/bulk_next_step() each, on fresh SQLite files.
+
+Usage:
+    python -m scripts.bench_program_bulk --users 10000
+    python -m scripts.bench_program_bulk --users 10000 --json
+"""
+import argparse
+import json
+import pathlib
+import tempfile
+import time
+
+from program_engine import ProgramEngine
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+def timed(fn):
+    t = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - t) * 1000, 1)
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-user vs bulk cohort operations")
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--program", default=None, help="Program id (default: first in --programs)")
+    ap.add_argument("--programs", default=str(ROOT / "programs"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    users = [f"cohort-{i}" for i in range(args.users)]
+    results = {}
+    for mode in ("per-user", "bulk"):
+        engine = ProgramEngine(db_path=str(tmp / f"{mode}.db"), programs_folder=args.programs)
+        pid = args.program or engine.registry.list_programs()[0]["id"]
+        if mode == "per-user":
+            enroll = lambda: [engine.enroll(u, pid) for u in users]
+            advance = lambda: [engine.next_step(u, pid) for u in users]
+        else:
+            enroll = lambda: engine.bulk_enroll(users, pid)
+            advance = lambda: list(engine.bulk_next_step(users, pid))
+        results[mode] = {"enroll_ms": timed(enroll), "next_ms": timed(advance)}
+
+    if args.json:
+        print(json.dumps({"users": args.users, **results}))
+        return
+    print(f"{args.users} users")
+    for mode, r in results.items():
+        print(f"{mode:<9} enroll {r['enroll_ms']:>9} ms   next {r['next_ms']:>9} ms")
+    print(f"speedup   enroll {results['per-user']['enroll_ms'] / max(results['bulk']['enroll_ms'], 0.1):.0f}x"
+          f"   next {results['per-user']['next_ms'] / max(results['bulk']['next_ms'], 0.1):.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Concurrency benchmark for ProgramEngine: parallel next_step/enroll traffic
+against one SQLite file, as FastAPI's threadpool produces it.
+
+Reports throughput, p50/p95/p99 latency and errors (e.g. "database is locked").
+Run it on a commit before and after a storage change to compare.
+Usage:
+    python -m scripts.bench_program_engine --threads 16 --ops 4000 --users 500
+    python -m scripts.bench_program_engine --hot-user --json   # every thread on one enrollment
+    python -m scripts.bench_program_engine --write-behind --durability memory
+"""
+import argparse
+import json
+import pathlib
+import random
+import tempfile
+import threading
+import time
+
+from packages.rag.latency import summarize
+from program_engine import ProgramEngine, WriteBehindBuffer
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+def main():
+    ap = argparse.ArgumentParser(description="ProgramEngine concurrency benchmark")
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--ops", type=int, default=4000, help="Total operations across threads")
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--enroll-ratio", type=float, default=0.1, help="Share of ops that are enroll()")
+    ap.add_argument("--hot-user", action="store_true", help="All threads advance the same enrollment")
+    ap.add_argument("--write-behind", action="store_true", help="Group-commit buffer instead of a commit per call")
+    ap.add_argument("--durability", choices=["memory", "journal"], default="journal")
+    ap.add_argument("--db", default=None, help="SQLite file (default: fresh temp file)")
+    ap.add_argument("--programs", default=str(ROOT / "programs"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    db_path = args.db or str(pathlib.Path(tempfile.mkdtemp()) / "bench.db")
+    buffer = None
+    engine = ProgramEngine(db_path=db_path, programs_folder=args.programs)
+    if args.write_behind:
+        buffer = engine.buffer = WriteBehindBuffer(engine, durability=args.durability)
+    program_ids = [p["id"] for p in engine.registry.list_programs()]
+    per_thread = args.ops // args.threads
+    lat_ms, errors = [], []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        mine, errs = [], []
+        for _ in range(per_thread):
+            user = "hot" if args.hot_user else f"u{rng.randrange(args.users)}"
+            pid = rng.choice(program_ids)
+            t = time.perf_counter()
+            try:
+                if rng.random() < args.enroll_ratio:
+                    engine.enroll(user, pid)
+                else:
+                    engine.next_step(user, pid)
+            except Exception as e:
+                errs.append(type(e).__name__ + ": " + str(e))
+            mine.append((time.perf_counter() - t) * 1000)
+        with lock:
+            lat_ms.extend(mine)
+            errors.extend(errs)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    if buffer:
+        buffer.close()  # final flush belongs to the run
+        wall = time.perf_counter() - t0
+
+    result = {
+        "threads": args.threads,
+        "ops": len(lat_ms),
+        "errors": len(errors),
+        "error_kinds": sorted(set(errors))[:5],
+        "ops_per_s": round(len(lat_ms) / wall, 1),
+        "latency_ms": summarize(lat_ms, digits=3),
+        "db": db_path,
+    }
+    if buffer:
+        result["write_behind"] = buffer.stats()
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for k, v in result.items():
+            print(f"{k:>12}: {v}")
+
+if __name__ == "__main__":
+    main()
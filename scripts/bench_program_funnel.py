@@ -0,0 +1,100 @@
+"""
+Funnel query benchmark: N synthetic program events in a fresh SQLite file.
+
+Times the /funnel query three ways over the same 30-day window: the
+program_step_daily rollup (what the route serves), COUNT(DISTINCT user_id)
+over program_events (distinct_users=true), and a plain COUNT(*) scan of the
+event log, the query the rollup replaces.
+Usage:
+    python -m scripts.bench_program_funnel --events 1000000
+    python -m scripts.bench_program_funnel --events 1000000 --json
+"""
+import argparse
+import json
+import pathlib
+import random
+import tempfile
+import time
+
+from program_engine import ProgramEngine
+from program_storage import utc_now
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+DAY = 86400
+
+def populate(engine, n, program_ids, days=60, seed=0):
+    """Users walk enroll → step 1..k (some finishing, a few resetting), spread over `days`."""
+    rng = random.Random(seed)
+    rows, user = [], 0
+    while len(rows) < n:
+        user += 1
+        pid = rng.choice(program_ids)
+        steps = len(engine.registry.compiled(pid).messages)
+        ts = -rng.uniform(0, days * DAY)
+        reached = min(steps, int(rng.expovariate(0.35)) + 1)
+        walk = [("enroll", 0)] + [("step", i) for i in range(1, reached + 1)]
+        if reached == steps:
+            walk.append(("complete", steps))
+        elif rng.random() < 0.05:
+            walk.append(("reset", 0))
+        for event, step in walk:
+            stamp = utc_now(min(0, ts))
+            rows.append((stamp, stamp[:10], f"u{user}", pid, event, step))
+            ts += rng.uniform(0.5, 1.5) * DAY
+    with engine._tx() as db:
+        db.executemany("""INSERT INTO program_events(ts, day, user_id, program_id, event, step)
+                          VALUES (?, ?, ?, ?, ?, ?)""", rows[:n])
+    return min(n, len(rows))
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, (time.perf_counter() - t) * 1000)
+    return out, round(best, 2)
+
+def main():
+    ap = argparse.ArgumentParser(description="Program funnel: rollup vs raw event scans")
+    ap.add_argument("--events", type=int, default=1000000)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--programs", default=str(ROOT / "programs"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    engine = ProgramEngine(db_path=str(tmp / "funnel.db"), programs_folder=str(args.programs), write_behind=False)
+    program_ids = [p["id"] for p in engine.registry.list_programs()]
+    t = time.perf_counter()
+    inserted = populate(engine, args.events, program_ids)
+    load_ms = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    engine.rebuild_rollups()
+    rollup_ms = (time.perf_counter() - t) * 1000
+
+    pid = program_ids[0]
+    since, until = utc_now(-(args.days - 1) * DAY)[:10], utc_now()[:10]
+    raw_sql = """SELECT event, step, COUNT(*) FROM program_events
+                 WHERE program_id = ? AND day BETWEEN ? AND ? GROUP BY event, step"""
+    rollup, rollup_q = timed(lambda: engine.funnel(pid, since, until), args.repeat)
+    distinct, distinct_q = timed(lambda: engine.funnel(pid, since, until, distinct_users=True), args.repeat)
+    raw, raw_q = timed(lambda: {(e, s): c for e, s, c in engine.db.execute(raw_sql, (pid, since, until))},
+                       args.repeat)
+
+    result = {
+        "events": inserted, "program_id": pid, "window": [since, until],
+        "load_ms": round(load_ms, 1), "rebuild_rollups_ms": round(rollup_ms, 1),
+        "rollup_rows": engine.db.execute("SELECT COUNT(*) FROM program_step_daily").fetchone()[0],
+        "query_ms": {"rollup": rollup_q, "raw_distinct": distinct_q, "raw_count": raw_q},
+        "rollup_matches_raw": rollup == raw,
+        "step1": {"events": rollup.get(("step", 1), 0), "users": distinct.get(("step", 1), 0)},
+    }
+    if args.json:
+        print(json.dumps(result))
+        return
+    for k, v in result.items():
+        print(f"{k:>20}: {v}")
+
+if __name__ == "__main__":
+    main()
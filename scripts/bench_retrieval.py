@@ -0,0 +1,102 @@
+"""
+Retrieval quality + latency across backends, scored on a golden set built from
+logs/query_log_*.csv(.gz) and packages/rag/data/retrieval_labels.tsv.
+
+Every backend indexes the same chunks of data/clean/*.md with the same
+vectors; the default hashing provider needs no network or API key.
+Usage:
+    python -m scripts.bench_retrieval
+    python -m scripts.bench_retrieval --provider openai --model text-embedding-ada-002
+    python -m scripts.bench_retrieval --json out.json --baseline last.json   # exit 1 on regression
+"""
+import argparse
+import json
+import pathlib
+import sys
+
+import numpy as np
+
+from packages.rag.embeddings import cached_embeddings
+from packages.rag.retrieval_eval import BACKENDS, LABELS_PATH, Corpus, evaluate, golden_set
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+def regressions(results, baseline, tolerance):
+    """Metric drops larger than `tolerance` versus a previous --json output."""
+    before = {r["backend"]: r for r in baseline["results"]}
+    out = []
+    for r in results:
+        old = before.get(r["backend"])
+        if not old:
+            continue
+        for metric, value in r.items():
+            if (metric == "mrr" or metric.startswith("recall@")) and metric in old:
+                if value < old[metric] - tolerance:
+                    out.append(f"{r['backend']} {metric}: {old[metric]} → {value}")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Retrieval quality + latency benchmark")
+    ap.add_argument("--clean-dir", default=str(ROOT / "data" / "clean"))
+    ap.add_argument("--log-dir", default=str(ROOT / "logs"))
+    ap.add_argument("--labels", default=str(LABELS_PATH))
+    ap.add_argument("--provider", default="hash", help="hash (offline, default) | openai")
+    ap.add_argument("--model", default=None, help="Embedding model for --provider openai")
+    ap.add_argument("--dims", type=int, default=384, help="Vector size for the hashing provider")
+    ap.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated subset of " + ", ".join(BACKENDS))
+    ap.add_argument("--k", default="1,3,5", help="Cut-offs for recall@k")
+    ap.add_argument("--repeat", type=int, default=20, help="Timed searches per query")
+    ap.add_argument("--json", default=None, help="Write machine-readable results here ('-' for stdout)")
+    ap.add_argument("--baseline", default=None, help="Previous --json output; exit 1 if quality regressed")
+    ap.add_argument("--tolerance", type=float, default=0.01)
+    args = ap.parse_args()
+
+    ks = [int(k) for k in args.k.split(",")]
+    golden = golden_set(args.log_dir, args.labels)
+    if not golden:
+        sys.exit("[ERROR] Empty golden set: no logged queries and no hand labels")
+    kwargs = {"dims": args.dims} if args.provider == "hash" else {}
+    # Vectors go through the shared store, so repeated runs don't re-pay the API
+    emb = cached_embeddings(args.model, provider=args.provider, **kwargs)
+    corpus = Corpus.from_clean_dir(args.clean_dir, emb)
+    qvecs = np.asarray([emb.embed_query(g.query) for g in golden], dtype="float32")
+
+    results = []
+    for name in args.backends.split(","):
+        backend = BACKENDS[name.strip()](corpus)
+        results.append(evaluate(backend, golden, qvecs, corpus, ks=ks, repeat=args.repeat).as_dict())
+
+    origins = {o: sum(g.origin == o for g in golden) for o in ("log", "hand")}
+    print(f"golden set: {len(golden)} questions ({origins['log']} from logs, {origins['hand']} hand-labelled), "
+          f"{len(corpus.texts)} chunks, provider={args.provider}", file=sys.stderr)
+    header = f"{'backend':<14}" + "".join(f"{'R@' + str(k):>8}" for k in ks) + f"{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header, file=sys.stderr)
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['backend']:<14}" + "".join(f"{r[f'recall@{k}']:>8.3f}" for k in ks)
+              + f"{r['mrr']:>8.3f}{lat['p50']:>10.3f}{lat['p95']:>10.3f}{lat['p99']:>10.3f}", file=sys.stderr)
+    if origins["log"]:
+        print("note: log labels are the exact dense (faiss-flat) retriever's own top source, so they favour "
+              "the dense backends over hybrid; compare backends on the hand-labelled rows below", file=sys.stderr)
+    if origins["hand"]:
+        print(f"hand-labelled only ({origins['hand']} questions):", file=sys.stderr)
+        for r in results:
+            hand = r["by_origin"]["hand"]
+            print(f"{r['backend']:<14}" + "".join(f"{hand[f'recall@{k}']:>8.3f}" for k in ks)
+                  + f"{hand['mrr']:>8.3f}", file=sys.stderr)
+
+    report = {"golden": len(golden), "golden_by_origin": origins, "chunks": len(corpus.texts), "provider": args.provider, "results": results}
+    if args.json == "-":
+        print(json.dumps(report))
+    elif args.json:
+        pathlib.Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+        bad = regressions(results, baseline, args.tolerance)
+        for line in bad:
+            print(f"[ERROR] regression: {line}", file=sys.stderr)
+        sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Build a full-size FAISS index offline and measure search latency.
+
+Uses the local hashing embedding provider, so it needs no network access and
+no API key; suitable for CI and load-test setup.
+Usage:
+    python -m scripts.bench_search --chunks 50000 --dims 384 --queries 500
+    python -m scripts.bench_search --save data/indices/bench   # keep the index
+"""
+import argparse
+import json
+import pathlib
+import statistics
+import time
+from itertools import cycle, islice
+
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from packages.rag.embeddings import HashingEmbeddings
+from packages.rag.latency import percentile
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+CLEAN_DIR = ROOT / "data" / "clean"
+
+QUERIES = [
+    "What is anxiety?",
+    "How to cope with stress?",
+    "What is WHO's definition of depression?",
+    "Depression ki alamat kya hain?",
+    "How much sleep do adults need?",
+    "signs of panic attack",
+]
+
+def corpus_chunks(n):
+    """Real cleaned chunks, repeated with a distinguishing suffix up to n."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    base = []
+    for path in sorted(CLEAN_DIR.glob("*.md")):
+        for c in splitter.split_text(path.read_text(encoding="utf-8")):
+            base.append((c, path.name))
+    if not base:
+        raise RuntimeError(f"No cleaned docs under {CLEAN_DIR}")
+    for i, (text, src) in enumerate(islice(cycle(base), n)):
+        copy = i // len(base)
+        yield (text if copy == 0 else f"{text}\n(copy {copy})"), {"source": src, "copy": copy}
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline index build + search latency benchmark")
+    ap.add_argument("--chunks", type=int, default=20000)
+    ap.add_argument("--dims", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--save", default=None, help="Optional directory to save the built index")
+    ap.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = ap.parse_args()
+
+    emb = HashingEmbeddings(args.dims)
+
+    t0 = time.perf_counter()
+    db = None
+    batch = []
+    for item in corpus_chunks(args.chunks):
+        batch.append(item)
+        if len(batch) == args.batch_size:
+            db = _add(db, emb, batch)
+            batch = []
+    if batch:
+        db = _add(db, emb, batch)
+    build_s = time.perf_counter() - t0
+
+    if args.save:
+        db.save_local(args.save)
+
+    lat_ms = []
+    for q in islice(cycle(QUERIES), args.queries):
+        t = time.perf_counter()
+        db.similarity_search_with_score(q, k=args.k)
+        lat_ms.append((time.perf_counter() - t) * 1000)
+
+    result = {
+        "chunks": args.chunks,
+        "dims": args.dims,
+        "build_s": round(build_s, 2),
+        "build_chunks_per_s": round(args.chunks / build_s, 1),
+        "queries": len(lat_ms),
+        "p50_ms": round(percentile(lat_ms, 50), 3),
+        "p95_ms": round(percentile(lat_ms, 95), 3),
+        "p99_ms": round(percentile(lat_ms, 99), 3),
+        "mean_ms": round(statistics.fmean(lat_ms), 3),
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for k, v in result.items():
+            print(f"{k:>20}: {v}")
+
+def _add(db, emb, batch):
+    texts = [t for t, _ in batch]
+    metas = [m for _, m in batch]
+    pairs = list(zip(texts, emb.embed_documents(texts)))
+    if db is None:
+        return FAISS.from_embeddings(pairs, emb, metadatas=metas)
+    db.add_embeddings(pairs, metadatas=metas)
+    return db
+
+if __name__ == "__main__":
+    main()
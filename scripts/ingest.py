@@ -9,15 +9,17 @@ import os
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
 
 from scripts.fetch_medlineplus import main as fetch_medlineplus  # reuse
+from packages.rag.embed_store import EmbeddingStore
+from packages.rag.embeddings import cached_embeddings, embedding_provider
 from dotenv import load_dotenv
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 RAW_DIRS = [ROOT / "data" / "raw" / "medlineplus", ROOT / "data" / "raw" / "gem"]
 CHUNK_OUT = ROOT / "data" / "processed" / "chunks"
 INDEX_DIR = ROOT / "data" / "indices" / "faiss"
+EMBED_STORE = ROOT / "data" / "embeddings" / "store.sqlite3"
 
 def read_all_txt():
     records = []
@@ -31,7 +33,7 @@ def read_all_txt():
 def main():
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    if not api_key and embedding_provider() == "openai":
         raise RuntimeError("OPENAI_API_KEY missing. Create .env from .env.example")
 
     # Step 1: fetch MedlinePlus (safe & public)
@@ -58,13 +60,17 @@ def main():
         for c, m in zip(chunks[:20], metas[:20]):
             f.write(f"### {m}\\n{c}\\n\\n")
 
-    # Step 4: embeddings & FAISS
-    embeddings = OpenAIEmbeddings(api_key=api_key, model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"))
+    # Step 4: embeddings (via the shared content-addressed store) & FAISS
+    store = EmbeddingStore(EMBED_STORE)
+    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    kwargs = {"api_key": api_key} if embedding_provider() == "openai" else {}
+    embeddings = cached_embeddings(model, store=store, **kwargs)
     vs = FAISS.from_texts(chunks, embedding=embeddings, metadatas=metas)
 
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
     vs.save_local(INDEX_DIR.as_posix())
     print(f"Saved FAISS index to {INDEX_DIR}")
+    print(f"Embedding store: {store.stats.summary()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,337 @@
+"""
+Capacity load test for app.py: a weighted mix of /api/program/enroll,
+/api/program/next and /api/query/ask traffic, sent open-loop at a target RPS.
+
+Arrivals follow a fixed clock (or Poisson with --arrivals poisson) instead of
+waiting for responses, so an overloaded server shows up as latency, errors
+and `dropped` (arrivals refused at --max-inflight) rather than as a quietly
+lower send rate. `send_lag_ms` reports how late the client itself fired;
+if its p99 is high, the load generator is the bottleneck, not the app.
+
+--spawn starts app.py under uvicorn with LLM_PROVIDER=fake and
+EMBEDDING_PROVIDER=hash over a throwaway FAISS index built from data/clean
+and a temp SQLite file, so a run needs no network, API key or real data.
+The spawned app runs with ANSWER_CACHE=0: the question pool is small, so a
+warm cache would turn most asks into hits and hide the LLM path
+(--answer-cache to measure it anyway). Each stage reports the answer-cache
+hit rate from /api/query/cache (one worker's counters with --workers > 1).
+
+Exit codes (for CI): 0 all gates passed, 1 a gate failed, 2 the app never
+became ready.
+Usage:
+    python -m scripts.loadtest --spawn --rps 50 --duration 30
+    python -m scripts.loadtest --spawn --rps 10,25,50,100 --duration 20          # step up to the knee
+    python -m scripts.loadtest --url http://localhost:8000 --mix enroll=1,next=6,ask=3
+    python -m scripts.loadtest --spawn --rps 40 --max-error-rate 0.01 --max-p95-ms next=200,ask=1500 --json --out loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from packages.rag.latency import summarize
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+LABELS = ROOT / "packages" / "rag" / "data" / "retrieval_labels.tsv"
+FALLBACK_QUESTIONS = ["What is anxiety?", "How can I sleep better?", "stress kam kaise karein"]
+ROUTES = {
+    "enroll": "/api/program/enroll",
+    "next": "/api/program/next",
+    "ask": "/api/query/ask",
+}
+
+
+def parse_pairs(spec, cast=float, default_key="*"):
+    """'next=6,ask=3' → {'next': 6.0, 'ask': 3.0}; a bare '200' → {'*': 200.0}."""
+    out = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        key, _, value = part.rpartition("=")
+        out[key.strip() or default_key] = cast(value)
+    return out
+
+
+def load_questions(path=LABELS):
+    if not path.exists():
+        return FALLBACK_QUESTIONS
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [l.split("\t", 1)[0].strip() for l in lines if l.strip() and not l.startswith("#")] or FALLBACK_QUESTIONS
+
+
+class Workload:
+    """Draws (route kind, JSON body) pairs from the weighted mix over a fixed user population."""
+
+    def __init__(self, mix, users, program_ids, questions, seed=0):
+        unknown = set(mix) - set(ROUTES)
+        if unknown:
+            raise ValueError(f"Unknown route(s) in --mix: {sorted(unknown)} (expected {sorted(ROUTES)})")
+        self.kinds = [k for k, w in mix.items() if w > 0]
+        self.weights = [mix[k] for k in self.kinds]
+        self.users, self.program_ids, self.questions = users, program_ids, questions
+        self.rng = random.Random(seed)
+
+    def draw(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        user = f"load-{self.rng.randrange(self.users)}"
+        if kind == "ask":
+            return kind, {"user_id": user, "question": self.rng.choice(self.questions)}
+        return kind, {"user_id": user, "program_id": self.rng.choice(self.program_ids)}
+
+
+def arrivals(rps, duration, poisson, rng):
+    """Offsets (seconds from stage start) at which to fire requests."""
+    if not poisson:
+        return [i / rps for i in range(int(rps * duration))]
+    out, t = [], rng.expovariate(rps)
+    while t < duration:
+        out.append(t)
+        t += rng.expovariate(rps)
+    return out
+
+
+async def run_stage(client, workload, rps, duration, *, max_inflight=1000, poisson=False, record=True):
+    lat = defaultdict(list)
+    sent, errors, statuses, lag = Counter(), Counter(), Counter(), []
+    dropped, inflight = 0, 0
+    tasks = []
+
+    async def one(kind, body):
+        nonlocal inflight
+        t = time.perf_counter()
+        try:
+            r = await client.post(ROUTES[kind], json=body)
+            status = r.status_code
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError:
+            status = "conn_error"
+        finally:
+            inflight -= 1
+        lat[kind].append((time.perf_counter() - t) * 1000)
+        statuses[status] += 1
+        errors[kind] += status != 200
+
+    t0 = time.perf_counter()
+    for offset in arrivals(rps, duration, poisson, workload.rng):
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag.append(max(0.0, -delay) * 1000)
+        kind, body = workload.draw()
+        sent[kind] += 1
+        if inflight >= max_inflight:
+            dropped += 1
+            errors[kind] += 1
+            continue
+        inflight += 1
+        tasks.append(asyncio.create_task(one(kind, body)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - t0
+    if not record:
+        return None
+
+    completed = sum(len(v) for v in lat.values())
+    total, total_errors = sum(sent.values()), sum(errors.values())
+    return {
+        "target_rps": rps,
+        "duration_s": round(wall, 2),
+        "sent": total,
+        "completed": completed,
+        "dropped": dropped,
+        "achieved_rps": round(completed / wall, 1),
+        "ok_rps": round((total - total_errors) / wall, 1),
+        "errors": total_errors,
+        "error_rate": round(total_errors / total, 4) if total else 0.0,
+        "status": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "latency_ms": summarize([x for v in lat.values() for x in v]),
+        "routes": {
+            kind: {"sent": sent[kind], "errors": errors[kind], "error_rate": round(errors[kind] / sent[kind], 4),
+                   "latency_ms": summarize(lat[kind])}
+            for kind in sorted(sent)
+        },
+        "send_lag_ms": summarize(lag),
+    }
+
+
+def check(stage, max_error_rate=None, max_p95=None, max_p99=None):
+    """Gate violations for one stage; limits keyed by route kind, '*' = whole stage."""
+    out = []
+    if max_error_rate is not None and stage["error_rate"] > max_error_rate:
+        out.append(f"{stage['target_rps']} rps: error rate {stage['error_rate']:.2%} > {max_error_rate:.2%}")
+    for pct, limits in (("p95", max_p95 or {}), ("p99", max_p99 or {})):
+        for key, limit in limits.items():
+            summary = stage["latency_ms"] if key == "*" else stage["routes"].get(key, {}).get("latency_ms")
+            if summary and summary[pct] > limit:
+                out.append(f"{stage['target_rps']} rps: {key} {pct} {summary[pct]}ms > {limit:g}ms")
+    return out
+
+
+# ---------------------------- --spawn ----------------------------------------
+
+def build_fake_index(index_path):
+    """FAISS index over data/clean with the hash provider the spawned app will query with."""
+    from packages.rag.embeddings import HashingEmbeddings
+    from packages.rag.pipeline import build_index
+
+    build_index(ROOT / "data" / "clean", index_path, HashingEmbeddings(), log=lambda _: None)
+
+
+def app_py():
+    """uvicorn --factory target: app.py by path (the app/ package shadows `app:app`)."""
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location("sukoon_app", ROOT / "app.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_app(tmp, workers, fake_llm_ms, port, answer_cache=False):
+    index_path = tmp / "index" / "index"
+    build_fake_index(index_path)
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(fake_llm_ms),
+        "EMBEDDING_PROVIDER": "hash",
+        "QUERY_INDEX_PATH": str(index_path),
+        "PROGRAM_DB_PATH": str(tmp / "sehat.db"),
+        "TRANSLATION_CACHE_PATH": str(tmp / "translation_cache.sqlite3"),
+        "TELEMETRY": "0",
+        "QUERY_LOG": "0",
+        "ANSWER_CACHE": "1" if answer_cache else "0",
+    }
+    cmd = [sys.executable, "-m", "uvicorn", "scripts.loadtest:app_py", "--factory", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(cmd, cwd=str(ROOT), env=env)
+
+
+async def wait_ready(client, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ping")).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    return False
+
+
+# ---------------------------- main -------------------------------------------
+
+async def cache_counters(client):
+    """(hits, lookups) from the app's answer cache, or None if it isn't exposed."""
+    try:
+        r = await client.get("/api/query/cache")
+        stats = r.json() if r.status_code == 200 else {}
+    except (httpx.HTTPError, ValueError):
+        return None
+    return (stats["hits"], stats["lookups"]) if "lookups" in stats else None
+
+
+async def main_async(args, url):
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        if not await wait_ready(client, args.ready_timeout):
+            return None
+        program_ids = [p["id"] for p in (await client.get("/api/program/list")).json()]
+        workload = Workload(parse_pairs(args.mix), args.users, program_ids, load_questions(), args.seed)
+        rates = [float(r) for r in args.rps.split(",")]
+        if args.warmup > 0:
+            await run_stage(client, workload, rates[0], args.warmup, max_inflight=args.max_inflight,
+                            poisson=args.arrivals == "poisson", record=False)
+        stages = []
+        for rps in rates:
+            before = await cache_counters(client)
+            stage = await run_stage(client, workload, rps, args.duration, max_inflight=args.max_inflight,
+                                    poisson=args.arrivals == "poisson")
+            after = await cache_counters(client)
+            if before and after:
+                hits, lookups = after[0] - before[0], after[1] - before[1]
+                stage["answer_cache"] = {"hits": hits, "lookups": lookups,
+                                         "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+            stages.append(stage)
+        return stages
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Open-loop load test for the program and query APIs")
+    ap.add_argument("--url", default=None, help="Running app (default: --spawn one)")
+    ap.add_argument("--spawn", action="store_true", help="Start app.py with fake LLM + hash embeddings")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    ap.add_argument("--fake-llm-ms", type=float, default=300, help="Fake LLM latency for --spawn")
+    ap.add_argument("--answer-cache", action="store_true",
+                    help="--spawn with ANSWER_CACHE=1 (default 0, so every ask reaches the fake LLM)")
+    ap.add_argument("--rps", default="20", help="Target rate; comma-separated for successive stages")
+    ap.add_argument("--duration", type=float, default=30, help="Seconds per stage")
+    ap.add_argument("--warmup", type=float, default=5, help="Unrecorded seconds at the first rate")
+    ap.add_argument("--mix", default="enroll=1,next=6,ask=3")
+    ap.add_argument("--users", type=int, default=5000)
+    ap.add_argument("--arrivals", choices=["uniform", "poisson"], default="uniform")
+    ap.add_argument("--max-inflight", type=int, default=1000)
+    ap.add_argument("--timeout", type=float, default=30, help="Per-request client timeout (s)")
+    ap.add_argument("--ready-timeout", type=float, default=60)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-error-rate", type=float, default=None)
+    ap.add_argument("--max-p95-ms", default=None, help="'500' for all traffic or 'next=200,ask=1500'")
+    ap.add_argument("--max-p99-ms", default=None)
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--out", default=None, help="Also write the JSON report here")
+    args = ap.parse_args()
+
+    proc, url = None, args.url
+    if not url:
+        port = free_port()
+        proc = spawn_app(pathlib.Path(tempfile.mkdtemp()), args.workers, args.fake_llm_ms, port,
+                         answer_cache=args.answer_cache)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        stages = asyncio.run(main_async(args, url))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+    if stages is None:
+        print(f"[ERROR] {url} not ready after {args.ready_timeout:g}s", file=sys.stderr)
+        sys.exit(2)
+
+    violations = [v for s in stages for v in check(s, args.max_error_rate, parse_pairs(args.max_p95_ms),
+                                                    parse_pairs(args.max_p99_ms))]
+    report = {"url": url, "spawned": proc is not None, "mix": parse_pairs(args.mix), "stages": stages,
+              "passed": not violations, "violations": violations}
+    if args.out:
+        pathlib.Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"{'target':>7} {'ok rps':>7} {'sent':>6} {'err%':>6} {'drop':>5} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'cache':>6}  per route p95")
+        for s in stages:
+            lat = s["latency_ms"]
+            routes = ", ".join(f"{k} {r['latency_ms']['p95']}" for k, r in s["routes"].items())
+            cache = f"{s['answer_cache']['hit_rate']:.0%}" if s.get("answer_cache", {}).get("lookups") else "-"
+            print(f"{s['target_rps']:>7g} {s['ok_rps']:>7} {s['sent']:>6} {s['error_rate']:>6.1%} "
+                  f"{s['dropped']:>5} {lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8} {cache:>6}  {routes}")
+        for v in violations:
+            print("[FAIL]", v)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
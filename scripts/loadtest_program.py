@@ -0,0 +1,139 @@
+"""
+Concurrent /api/program/next load test: sync (threadpool + blocking SQLite)
+versus async (AsyncProgramEngine) routes, measured in-process over ASGI.
+
+While /next traffic runs, an async /ping probe fires every few ms; its latency
+shows whether the event loop stays responsive under load.
+Usage:
+    python -m scripts.loadtest_program --requests 3000 --concurrency 200
+    python -m scripts.loadtest_program --url http://localhost:8000   # live server, current routes only
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import random
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from packages.rag.latency import summarize
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+def build_sync_app(db_path, programs):
+    """The pre-async routes: plain `def` handlers calling ProgramEngine directly."""
+    from program_engine import ProgramEngine
+
+    engine = ProgramEngine(db_path=db_path, programs_folder=programs)
+    app = FastAPI()
+
+    @app.post("/api/program/next")
+    def next_step(body: dict):
+        return {"message": engine.next_step(body["user_id"], body["program_id"]), "stopped": False}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app, engine.registry
+
+def build_async_app(db_path, programs):
+    os.environ["PROGRAM_DB_PATH"] = db_path
+    os.environ["PROGRAMS_DIR"] = programs
+    import api_program
+
+    app = FastAPI(lifespan=api_program.lifespan)
+    app.include_router(api_program.router, prefix="/api/program")
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app, api_program.engine.registry
+
+async def drive(client, program_ids, requests, concurrency, users, ping_every):
+    lat, errors = [], 0
+    ping_lat = []
+    sem = asyncio.Semaphore(concurrency)
+    rng = random.Random(0)
+    done = asyncio.Event()
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            body = {"user_id": f"u{rng.randrange(users)}", "program_id": rng.choice(program_ids)}
+            t = time.perf_counter()
+            try:
+                r = await client.post("/api/program/next", json=body)
+                errors += r.status_code != 200
+            except Exception:
+                errors += 1
+            lat.append((time.perf_counter() - t) * 1000)
+
+    async def prober():
+        while not done.is_set():
+            t = time.perf_counter()
+            await client.get("/ping")
+            ping_lat.append((time.perf_counter() - t) * 1000)
+            await asyncio.sleep(ping_every)
+
+    probe = asyncio.create_task(prober())
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    wall = time.perf_counter() - t0
+    done.set()
+    await probe
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / wall, 1),
+        "next_ms": summarize(lat),
+        "ping_ms": summarize(ping_lat),
+    }
+
+def client_for(app=None, url=None):
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=30)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=30)
+
+async def main_async(args):
+    programs = str(ROOT / "programs")
+    results = {}
+    if args.url:
+        async with client_for(url=args.url) as c:
+            ids = [p["id"] for p in (await c.get("/api/program/list")).json()]
+            results["live"] = await drive(c, ids, args.requests, args.concurrency, args.users, args.ping_every)
+    else:
+        tmp = pathlib.Path(tempfile.mkdtemp())
+        for name, build in (("sync", build_sync_app), ("async", build_async_app)):
+            app, registry = build(str(tmp / f"{name}.db"), programs)
+            ids = [p["id"] for p in registry.list_programs()]
+            async with client_for(app) as c:
+                results[name] = await drive(c, ids, args.requests, args.concurrency, args.users, args.ping_every)
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description="Program API load test (sync vs async routes)")
+    ap.add_argument("--requests", type=int, default=3000)
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--ping-every", type=float, default=0.005, help="Seconds between /ping probes")
+    ap.add_argument("--url", default=None, help="Target a running server instead of in-process apps")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{'variant':<8} {'rps':>8} {'errors':>7} {'next p50':>9} {'p95':>8} {'p99':>8}   {'ping p50':>9} {'p99':>8}")
+    for name, r in results.items():
+        n, p = r["next_ms"], r["ping_ms"]
+        print(f"{name:<8} {r['rps']:>8} {r['errors']:>7} {n['p50']:>9} {n['p95']:>8} {n['p99']:>8}   {p['p50']:>9} {p['p99']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+from app.api import main
+from app.api.main import EMBEDDING_DIM, EMBEDDING_MODEL, IngestChunk, _sync_embeddings_with_store
+from packages.rag.embed_store import EmbeddingStore
+
+
+def _vec(i):
+    v = [0.0] * EMBEDDING_DIM
+    v[i] = 1.0
+    return v
+
+
+def test_client_vectors_are_cached_only_under_their_declared_model(monkeypatch, tmp_path):
+    store = EmbeddingStore(tmp_path / "store.sqlite3")
+    store.put_many(EMBEDDING_MODEL, EMBEDDING_DIM, ["known"], [_vec(0)])
+    monkeypatch.setattr(main, "_EMBED_STORE", store)
+
+    items = [
+        IngestChunk(content="undeclared", ord=0, embedding=_vec(1)),
+        IngestChunk(content="declared", ord=1, embedding=_vec(2), embedding_model="client-model"),
+        IngestChunk(content="known", ord=2),
+    ]
+    _sync_embeddings_with_store(items)
+
+    assert store.get_many(EMBEDDING_MODEL, EMBEDDING_DIM, ["undeclared", "declared"]) == [None, None]
+    assert store.get_many("client-model", EMBEDDING_DIM, ["declared"]) == [_vec(2)]
+    assert items[2].embedding == _vec(0)  # filled from the server model's own vectors
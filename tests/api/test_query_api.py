@@ -0,0 +1,137 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+from langchain_community.vectorstores import FAISS
+
+import query_api
+from packages.rag.embeddings import HashingEmbeddings
+
+
+class SlowLLM:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(content="[English] ok", usage_metadata={"input_tokens": 10, "output_tokens": 2})
+
+
+def _setup(monkeypatch, delay=0.3, loads=None):
+    def load():
+        if loads is not None:
+            loads.append(1)
+        return FAISS.from_texts(["Anxiety is worry.", "Sleep helps."], HashingEmbeddings(32),
+                                metadatas=[{"source": "a.md"}, {"source": "b.md"}])
+    monkeypatch.setattr(query_api, "_db", None)
+    monkeypatch.setattr(query_api, "_load_db", load)
+    monkeypatch.setattr(query_api, "llm", SlowLLM(delay))
+    monkeypatch.setattr(query_api.telemetry, "enabled", False)
+    monkeypatch.setattr(query_api, "answer_cache", query_api.SemanticAnswerCache(enabled=False))
+    app = FastAPI()
+    app.include_router(query_api.router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _ask(client, q="What is anxiety?"):
+    return client.post("/ask", json={"user_id": "u1", "question": q})
+
+
+def test_slow_llm_does_not_serialize_requests(monkeypatch):
+    loads = []
+
+    async def run():
+        async with _setup(monkeypatch, delay=0.3, loads=loads) as client:
+            return await asyncio.gather(*[_ask(client) for _ in range(6)])
+
+    responses = asyncio.run(run())
+    assert all(r.status_code == 200 and r.json()["answer"] == "[English] ok" for r in responses)
+    assert query_api.llm.max_in_flight == 6  # the six LLM calls overlap instead of queueing
+    assert loads == [1]  # index loaded once, lazily
+
+
+def test_llm_timeout_returns_error_answer(monkeypatch):
+    monkeypatch.setattr(query_api, "LLM_TIMEOUT_SECS", 0.05)
+
+    async def run():
+        async with _setup(monkeypatch, delay=1.0) as client:
+            return await _ask(client)
+
+    r = asyncio.run(run())
+    assert r.status_code == 200
+    assert r.json()["answer"].startswith("[ERROR] LLM call timed out")
+
+
+def test_slow_translation_falls_back_to_the_original_question(monkeypatch):
+    monkeypatch.setattr(query_api, "LLM_TIMEOUT_SECS", 0.05)
+
+    class SlowTranslator:
+        def translate(self, text, lang):
+            time.sleep(0.5)
+
+    monkeypatch.setattr(query_api, "translator", SlowTranslator())
+
+    async def run():
+        async with _setup(monkeypatch, delay=0.0) as client:
+            return await _ask(client, "mujhe neend nahi aati, kya karun?")
+
+    r = asyncio.run(run())
+    assert r.status_code == 200
+    assert r.json()["answer"] == "[English] ok"
+
+
+def test_repeated_question_is_served_from_answer_cache(monkeypatch):
+    async def run():
+        async with _setup(monkeypatch, delay=0.0) as client:
+            monkeypatch.setattr(query_api, "answer_cache", query_api.SemanticAnswerCache())
+            first = await _ask(client, "What is anxiety?")
+            second = await _ask(client, "what is anxiety")
+            stats = (await client.get("/cache")).json()
+            return first, second, stats
+
+    first, second, stats = asyncio.run(run())
+    assert first.json()["answer"] == second.json()["answer"] == "[English] ok"
+    assert query_api.llm.calls == 1
+    assert stats["hits"] == 1 and stats["entries"] == 1
+
+
+def test_rebuilt_index_is_reloaded_and_misses_the_answer_cache(monkeypatch, tmp_path):
+    index = tmp_path / "index"
+
+    def build(texts):
+        FAISS.from_texts(texts, HashingEmbeddings(32), metadatas=[{"source": f"{i}.md"} for i in range(len(texts))]
+                         ).save_local(str(index))
+
+    build(["Anxiety is worry.", "Sleep helps."])
+    loads = []
+
+    def load():
+        loads.append(1)
+        return FAISS.load_local(str(index), HashingEmbeddings(32), allow_dangerous_deserialization=True)
+
+    async def run():
+        async with _setup(monkeypatch, delay=0.0) as client:
+            monkeypatch.setattr(query_api, "INDEX_PATH", str(index))
+            monkeypatch.setattr(query_api, "_load_db", load)
+            monkeypatch.setattr(query_api, "answer_cache", query_api.SemanticAnswerCache())
+            await _ask(client)
+            await _ask(client)  # same index: cache hit, no reload
+            build(["Anxiety is a feeling of worry or fear.", "Sleep helps the body recover."])
+            await _ask(client)
+            return (await client.get("/cache")).json()
+
+    stats = asyncio.run(run())
+    assert loads == [1, 1]
+    assert query_api.llm.calls == 2
+    assert stats["hits"] == 1 and stats["invalidations"] == 1
@@ -0,0 +1,13 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def programs(tmp_path):
+    """Folder holding p3: a three-step bilingual program."""
+    progs = tmp_path / "programs"
+    progs.mkdir()
+    steps = [{"id": f"day{i}", "en": f"Day {i} en", "ur": f"Din {i} ur"} for i in range(1, 4)]
+    (progs / "p3.json").write_text(json.dumps({"id": "p3", "name": "Three", "steps": steps}), encoding="utf-8")
+    return str(progs)
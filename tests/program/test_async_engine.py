@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from program_engine import AsyncProgramEngine
+
+
+@pytest.fixture
+def engine(tmp_path, programs):
+    eng = AsyncProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs, workers=4)
+    yield eng
+    asyncio.run(eng.close())
+
+
+def test_concurrent_async_next_serves_each_step_once(engine):
+    async def run():
+        await asyncio.gather(*[engine.enroll(f"u{i}", "p3") for i in range(20)])
+        return await asyncio.gather(*[engine.next_step("shared", "p3") for _ in range(10)])
+
+    served = [m.split("\n")[0] for m in asyncio.run(run())]
+    steps = [m for m in served if m.startswith("Day")]
+    assert sorted(steps) == ["Day 1 en", "Day 2 en", "Day 3 en"]
+    assert sum("Program complete" in m for m in served) == 7
+
+
+def test_async_reset_restarts_program(engine):
+    async def run():
+        await engine.next_step("u1", "p3")
+        await engine.reset("u1", "p3")
+        return await engine.next_step("u1", "p3")
+
+    assert asyncio.run(run()).startswith("Day 1 en")
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+# api_program opens its engine at import; keep it off the tracked sehat.db
+os.environ.setdefault("PROGRAM_DB_PATH", os.path.join(tempfile.mkdtemp(), "sehat.db"))
+import api_program  # noqa: E402
+from program_engine import AsyncProgramEngine, ProgramEngine  # noqa: E402
+
+
+@pytest.fixture
+def programs(programs):
+    """p3 plus a program with no steps."""
+    with open(os.path.join(programs, "empty.json"), "w", encoding="utf-8") as f:
+        json.dump({"id": "empty", "name": "Empty", "steps": []}, f)
+    return programs
+
+
+@pytest.fixture
+def engine(tmp_path, programs):
+    return ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs)
+
+
+def test_bulk_enroll_counts_only_new_enrollments(engine):
+    assert engine.bulk_enroll(["a", "b", "b"], "p3") == 2
+    assert engine.bulk_enroll(["a", "b", "c"], "p3") == 1
+    assert engine.db.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 3
+
+
+def test_bulk_next_matches_per_user_semantics(engine):
+    engine.next_step("ahead", "p3")
+    engine.next_step("ahead", "p3")
+    for _ in range(3):
+        engine.next_step("done", "p3")
+    rows = {r["user_id"]: r for r in engine.bulk_next_step(["fresh", "ahead", "done", "fresh"], "p3")}
+
+    assert len(rows) == 3  # duplicate ids advance once
+    assert rows["fresh"]["step"] == 1 and rows["fresh"]["message"].startswith("Day 1 en")
+    assert rows["ahead"]["step"] == 3 and rows["ahead"]["completed"]
+    assert rows["ahead"]["message"].startswith("Day 3 en")
+    assert rows["done"]["completed"] and "Program complete" in rows["done"]["message"]
+    assert engine.next_step("fresh", "p3").startswith("Day 2 en")
+
+
+def test_bulk_next_on_program_without_steps_enrolls_and_completes(engine):
+    rows = list(engine.bulk_next_step(["a"], "empty"))
+    assert rows[0]["completed"] and "Program complete" in rows[0]["message"]
+
+
+def test_bulk_current_does_not_advance(engine):
+    engine.next_step("a", "p3")
+    engine.enroll("b", "p3")
+    rows = {r["user_id"]: r for r in engine.bulk_current(["a", "b", "ghost"], "p3")}
+    assert rows["a"]["step"] == 1 and rows["a"]["message"].startswith("Day 1 en")
+    assert rows["b"]["step"] == 0 and rows["b"]["message"] is None
+    assert rows["ghost"]["step"] is None
+    assert engine.next_step("a", "p3").startswith("Day 2 en")
+
+
+def test_bulk_routes_stream_ndjson(tmp_path, programs, monkeypatch):
+    eng = AsyncProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs)
+    monkeypatch.setattr(api_program, "engine", eng)
+    monkeypatch.setattr(api_program, "NDJSON_BATCH", 2)
+    app = FastAPI()
+    app.include_router(api_program.router, prefix="/api/program")
+    ids = [f"u{i}" for i in range(5)]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+            enrolled = (await c.post("/api/program/bulk/enroll", json={"program_id": "p3", "user_ids": ids})).json()
+            nxt = await c.post("/api/program/bulk/next", json={"program_id": "p3", "user_ids": ids})
+            missing = await c.post("/api/program/bulk/next", json={"program_id": "nope", "user_ids": ids})
+            return enrolled, nxt, missing
+
+    enrolled, nxt, missing = asyncio.run(run())
+    asyncio.run(eng.close())
+    assert enrolled == {"ok": True, "enrolled": 5, "already_enrolled": 0}
+    assert nxt.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in nxt.text.splitlines()]
+    assert [r["user_id"] for r in rows] == ids
+    assert all(r["step"] == 1 for r in rows)
+    assert missing.status_code == 404
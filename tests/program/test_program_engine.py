@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from program_engine import ProgramEngine
+
+
+@pytest.fixture
+def engine(tmp_path, programs):
+    return ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs)
+
+
+def _progress(engine, user, pid="p3"):
+    return engine.db.execute(
+        "SELECT current_step_index, completed FROM enrollments WHERE user_id=? AND program_id=?", (user, pid)
+    ).fetchone()
+
+
+def test_next_step_walks_program_then_completes(engine):
+    assert engine.next_step("u1", "p3").startswith("Day 1 en")  # auto-enrolls
+    assert engine.next_step("u1", "p3").startswith("Day 2 en")
+    assert engine.next_step("u1", "p3").startswith("Day 3 en")
+    assert tuple(_progress(engine, "u1")) == (3, 1)
+    assert "Program complete" in engine.next_step("u1", "p3")
+    assert tuple(_progress(engine, "u1")) == (3, 1)
+
+    engine.reset("u1", "p3")
+    assert engine.next_step("u1", "p3").startswith("Day 1 en")
+
+
+def test_enroll_is_idempotent(engine):
+    engine.enroll("u2", "p3")
+    engine.enroll("u2", "p3")
+    assert tuple(_progress(engine, "u2")) == (0, 0)
+    assert engine.db.execute("SELECT COUNT(*) FROM users WHERE user_id='u2'").fetchone()[0] == 1
+
+
+def test_concurrent_next_serves_each_step_exactly_once(engine):
+    served, errors = [], []
+
+    def worker():
+        try:
+            for _ in range(5):
+                served.append(engine.next_step("shared", "p3").split("\n")[0])
+        except Exception as e:  # "database is locked" would land here
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    steps = [m for m in served if m.startswith("Day")]
+    assert sorted(steps) == ["Day 1 en", "Day 2 en", "Day 3 en"]
+    assert len(served) == 40
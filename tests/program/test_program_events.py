@@ -0,0 +1,66 @@
+import pytest
+
+from program_engine import ProgramEngine, WriteBehindBuffer
+
+
+def _events(engine):
+    return [tuple(r) for r in engine.db.execute(
+        "SELECT user_id, event, step FROM program_events ORDER BY id")]
+
+
+def _rollup(engine):
+    return {(e, st): n for e, st, n in engine.db.execute(
+        "SELECT event, step, SUM(n) FROM program_step_daily GROUP BY event, step")}
+
+
+def test_events_commit_with_the_progress_they_describe(tmp_path, programs):
+    engine = ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs, write_behind=False)
+    engine.enroll("u1", "p3")
+    engine.enroll("u1", "p3")  # already enrolled: no event
+    for _ in range(4):
+        engine.next_step("u1", "p3")
+    engine.reset("u1", "p3")
+    assert _events(engine) == [("u1", "enroll", 0), ("u1", "step", 1), ("u1", "step", 2),
+                               ("u1", "step", 3), ("u1", "complete", 3), ("u1", "reset", 0)]
+
+    # A failed transaction leaves neither the enrollment change nor its events
+    engine.db.execute("CREATE TRIGGER boom AFTER INSERT ON program_events BEGIN SELECT RAISE(ABORT, 'boom'); END")
+    with pytest.raises(Exception, match="boom"):
+        engine.next_step("u2", "p3")
+    assert engine.progress(["u2"], "p3") == {}
+    assert len(_events(engine)) == 6
+
+
+def test_rollups_match_a_rebuild_from_the_log(tmp_path, programs):
+    engine = ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs, write_behind=False)
+    engine.bulk_enroll([f"u{i}" for i in range(10)], "p3")
+    for _ in range(4):
+        engine.bulk_next_step([f"u{i}" for i in range(0, 10, 2)], "p3")
+    engine.next_step("u1", "p3")
+    engine.reset("u0", "p3")
+    before = _rollup(engine)
+    assert before[("enroll", 0)] == 10 and before[("complete", 3)] == 5
+    engine.rebuild_rollups()
+    assert _rollup(engine) == before
+
+
+def test_write_behind_flushes_and_replays_events_once(tmp_path, programs):
+    def buffered():
+        engine = ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs, write_behind=False)
+        engine.buffer = WriteBehindBuffer(engine, flush_ms=60_000, durability="journal")
+        return engine
+
+    engine = buffered()
+    engine.enroll("u1", "p3")
+    engine.next_step("u1", "p3")
+    assert engine.buffer.flush() == 1
+    engine.next_step("u1", "p3")
+    engine.buffer._stop = True  # "crash" with step 2 journaled but not flushed
+    assert _events(engine) == [("u1", "enroll", 0), ("u1", "step", 1)]
+
+    recovered = buffered()
+    assert _events(recovered) == [("u1", "enroll", 0), ("u1", "step", 1), ("u1", "step", 2)]
+    recovered.next_step("u1", "p3")
+    recovered.buffer.close()
+    assert _events(recovered)[-2:] == [("u1", "step", 3), ("u1", "complete", 3)]
+    assert _rollup(recovered)[("step", 2)] == 1
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+import pytest
+
+from program_engine import ProgramEngine, ProgramRegistry, format_step
+
+
+def _write(folder, name, data, mtime_ns=None):
+    path = folder / name
+    path.write_text(json.dumps(data), encoding="utf-8")
+    if mtime_ns is not None:  # filesystems with coarse mtimes: force a distinct signature
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def _prog(pid, days):
+    steps = [{"id": f"d{i}", "en": f"Day {i} en", "ur": f"Din {i} ur"} for i in range(1, days + 1)]
+    return {"id": pid, "name": pid.title(), "steps": steps}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    d = tmp_path / "programs"
+    d.mkdir()
+    _write(d, "a.json", _prog("a", 2), 1_000_000_000)
+    return d
+
+
+def test_steps_are_prerendered(folder):
+    reg = ProgramRegistry(str(folder), check_interval=-1)
+    compiled = reg.compiled("a")
+    assert compiled.messages[0] == format_step({"en": "Day 1 en", "ur": "Din 1 ur"}, compiled.data)
+    assert json.loads(reg.list_json()) == [{"id": "a", "name": "A", "duration_days": 2}]
+
+
+def test_reload_picks_up_changes_and_swaps_snapshot(folder):
+    reg = ProgramRegistry(str(folder), check_interval=-1)
+    before = reg.compiled("a")
+    assert reg.reload() is False  # nothing changed on disk
+
+    _write(folder, "a.json", _prog("a", 3), 2_000_000_000)
+    _write(folder, "b.json", _prog("b", 1), 2_000_000_000)
+    assert reg.reload() is True
+    assert len(reg.compiled("a").messages) == 3
+    assert "b" in reg
+    assert len(before.messages) == 2  # readers holding the old version are unaffected
+
+
+def test_invalid_edit_keeps_last_good_version(folder):
+    reg = ProgramRegistry(str(folder), check_interval=-1)
+    _write(folder, "a.json", {"id": "a", "steps": "oops"}, 3_000_000_000)
+    _write(folder, "bad.json", [1, 2], 3_000_000_000)
+    reg.reload()
+    assert len(reg.compiled("a").messages) == 2
+    assert set(reg.errors) == {"a.json", "bad.json"}
+
+
+def test_engine_serves_reloaded_program(folder, tmp_path):
+    engine = ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=str(folder))
+    engine.registry.check_interval = 0  # every lookup schedules a background mtime check
+    assert engine.next_step("u", "a").startswith("Day 1 en")
+    _write(folder, "a.json", {**_prog("a", 2), "steps": [{"en": "New day 1"}, {"en": "New day 2"}]}, 4_000_000_000)
+    deadline = time.monotonic() + 5
+    while engine.registry.compiled("a").messages[0].startswith("Day 1") and time.monotonic() < deadline:
+        time.sleep(0.01)  # the lookup served the old snapshot and queued the reload
+    assert engine.next_step("u", "a").startswith("New day 2")
+
+
+def test_lookup_does_not_wait_for_a_running_reload(folder):
+    reg = ProgramRegistry(str(folder), check_interval=0)
+    with reg._reload_lock:  # a reload in progress elsewhere
+        t = time.perf_counter()
+        assert "a" in reg
+        assert time.perf_counter() - t < 0.5
+
+
+def test_errors_survive_reloads_that_do_not_touch_the_bad_file(folder):
+    reg = ProgramRegistry(str(folder), check_interval=-1)
+    _write(folder, "bad.json", [1, 2], 5_000_000_000)
+    reg.reload()
+    _write(folder, "a.json", _prog("a", 3), 6_000_000_000)  # only the good file changes
+    assert reg.reload() is True
+    assert set(reg.errors) == {"bad.json"}
+
+
+def test_bulk_current_clamps_progress_past_a_shrunk_program(folder, tmp_path):
+    _write(folder, "a.json", _prog("a", 5), 7_000_000_000)
+    engine = ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=str(folder), write_behind=False)
+    for _ in range(4):
+        engine.next_step("u", "a")
+    _write(folder, "a.json", _prog("a", 2), 8_000_000_000)
+    engine.registry.reload()
+    [row] = engine.bulk_current(["u"], "a")
+    assert row["step"] == 2 and row["completed"] is True
+    assert row["message"].startswith("Day 2 en")
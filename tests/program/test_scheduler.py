@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+from program_engine import AsyncProgramEngine, ProgramEngine
+from program_scheduler import DueStepScheduler, JsonlSink, QueueSink, decode_cursor, encode_cursor
+from program_storage import SQLiteStorage, utc_now
+
+DAY = 86400
+
+
+@pytest.fixture
+def engine(tmp_path, programs):
+    return ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs, write_behind=False)
+
+
+def _set(engine, user, idx, completed, age_secs):
+    with engine._tx() as db:
+        db.execute("""INSERT INTO enrollments(user_id, program_id, current_step_index, completed, updated_at)
+                      VALUES (?, 'p3', ?, ?, ?)
+                      ON CONFLICT(user_id, program_id) DO UPDATE SET
+                        current_step_index = excluded.current_step_index,
+                        completed = excluded.completed, updated_at = excluded.updated_at""",
+                   (user, idx, completed, utc_now(-age_secs)))
+
+
+def _scheduler(engine, tmp_path, sink=None):
+    aengine = AsyncProgramEngine(programs_folder=str(tmp_path / "programs"), storage=SQLiteStorage(engine))
+    return DueStepScheduler(aengine, sink, due_after_secs=DAY, page_size=2,
+                            state_path=str(tmp_path / "state.json"))
+
+
+def test_due_page_keyset_pagination(engine):
+    for i in range(5):
+        _set(engine, f"due{i}", 1, 0, DAY + 100 * (i + 1))
+    _set(engine, "fresh", 1, 0, 60)
+    _set(engine, "finished", 3, 1, 3 * DAY)
+
+    cutoff, seen, key = utc_now(-DAY), [], ("", "", "")
+    while True:
+        page = engine.due_page(cutoff, key, limit=2)
+        seen += [r[0] for r in page]
+        if len(page) < 2:
+            break
+        key = (page[-1][3], page[-1][0], page[-1][1])
+    assert seen == [f"due{i}" for i in reversed(range(5))]  # oldest first, no repeats
+
+
+def test_due_query_uses_covering_index(engine):
+    plan = " ".join(r[3] for r in engine.db.execute(
+        """EXPLAIN QUERY PLAN SELECT user_id, program_id, current_step_index, updated_at FROM enrollments
+           WHERE completed = 0 AND updated_at < ? AND (updated_at, user_id, program_id) > (?, ?, ?)
+           ORDER BY updated_at, user_id, program_id LIMIT ?""", ("z", "", "", "", 10)))
+    assert "COVERING INDEX enrollments_due" in plan
+
+
+def test_run_once_emits_each_due_step_once(engine, tmp_path):
+    _set(engine, "a", 0, 0, 2 * DAY)
+    _set(engine, "b", 2, 0, DAY + 60)
+    _set(engine, "c", 1, 0, 60)
+    sink = QueueSink()
+    scheduler = _scheduler(engine, tmp_path, sink)
+
+    first = asyncio.run(scheduler.run_once())
+    rows = [r for batch in list(sink.queue.queue) for r in batch]
+    assert first["emitted"] == 2
+    assert {(r["user_id"], r["step"]) for r in rows} == {("a", 1), ("b", 3)}
+    assert rows[0]["message"].startswith("Day 1 en")
+
+    assert asyncio.run(scheduler.run_once())["emitted"] == 0  # watermark: nothing new became due
+    assert asyncio.run(scheduler.run_once(everything=True))["emitted"] == 2
+
+
+def test_jsonl_sink_and_cursor_roundtrip(engine, tmp_path):
+    _set(engine, "a", 0, 0, 2 * DAY)
+    sink = JsonlSink(str(tmp_path / "out" / "reminders.jsonl"))
+    asyncio.run(_scheduler(engine, tmp_path, sink).run_once())
+    sink.close()
+    lines = (tmp_path / "out" / "reminders.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["user_id"] for line in lines] == ["a"]
+
+    key = ("2026-01-01 00:00:00", "user/with+chars", "p3")
+    assert decode_cursor(encode_cursor(key)) == key
@@ -0,0 +1,153 @@
+"""
+Contract tests for every ProgramStorage backend. Postgres runs only when
+PROGRAM_TEST_DATABASE_URL points at a disposable server (see program_storage.py);
+each test works in its own schema, dropped afterwards.
+"""
+import asyncio
+import os
+import sqlite3
+import uuid
+
+import pytest
+
+from program_engine import AsyncProgramEngine, ProgramEngine
+from program_storage import PostgresStorage, SQLiteStorage, apply_sqlite_migrations, migrations, utc_now
+
+PG_DSN = os.getenv("PROGRAM_TEST_DATABASE_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def make_storage(request, tmp_path):
+    """Factory: the storage must be created inside the test's event loop (asyncpg pools are loop-bound)."""
+    if request.param == "sqlite":
+        return lambda: SQLiteStorage(ProgramEngine(db_path=str(tmp_path / "sehat.db"), write_behind=False))
+    if not PG_DSN:
+        pytest.skip("PROGRAM_TEST_DATABASE_URL not set")
+    asyncpg = pytest.importorskip("asyncpg")
+    schema = f"program_test_{uuid.uuid4().hex[:12]}"
+
+    async def drop():
+        conn = await asyncpg.connect(PG_DSN)
+        await conn.execute(f'drop schema if exists "{schema}" cascade')
+        await conn.close()
+
+    request.addfinalizer(lambda: asyncio.run(drop()))
+    return lambda: PostgresStorage(PG_DSN, schema=schema)
+
+
+def _run(make_storage, programs, body):
+    async def go():
+        engine = AsyncProgramEngine(programs_folder=programs, storage=make_storage())
+        try:
+            return await body(engine)
+        finally:
+            await engine.close()
+    return asyncio.run(go())
+
+
+def test_next_step_walks_program_then_completes(make_storage, programs):
+    async def body(engine):
+        served = [await engine.next_step("u1", "p3") for _ in range(4)]
+        await engine.reset("u1", "p3")
+        served.append(await engine.next_step("u1", "p3"))
+        return served
+
+    served = _run(make_storage, programs, body)
+    assert [m.split("\n")[0] for m in served[:3]] == ["Day 1 en", "Day 2 en", "Day 3 en"]
+    assert "Program complete" in served[3]
+    assert served[4].startswith("Day 1 en")
+
+
+def test_concurrent_advances_serve_each_step_once(make_storage, programs):
+    async def body(engine):
+        return await asyncio.gather(*[engine.next_step("shared", "p3") for _ in range(12)])
+
+    served = [m.split("\n")[0] for m in _run(make_storage, programs, body)]
+    assert sorted(m for m in served if m.startswith("Day")) == ["Day 1 en", "Day 2 en", "Day 3 en"]
+
+
+def test_concurrent_first_calls_share_one_pool(make_storage, programs):
+    async def body(engine):
+        storage = engine.storage
+        if isinstance(storage, PostgresStorage):
+            pools = await asyncio.gather(*(storage.pool() for _ in range(8)))
+            assert len({id(p) for p in pools}) == 1
+        await engine.start()  # idempotent after first use
+        await asyncio.gather(*(engine.enroll(f"u{i}", "p3") for i in range(8)))
+        return await engine.bulk_current([f"u{i}" for i in range(8)], "p3")
+
+    assert [r["step"] for r in _run(make_storage, programs, body)] == [0] * 8
+
+
+def test_bulk_operations(make_storage, programs):
+    async def body(engine):
+        added = await engine.bulk_enroll(["a", "b", "b"], "p3")
+        again = await engine.bulk_enroll(["a", "c"], "p3")
+        await engine.next_step("a", "p3")
+        advanced = list(await engine.bulk_next_step(["a", "b", "new"], "p3"))
+        current = list(await engine.bulk_current(["a", "ghost"], "p3"))
+        return added, again, advanced, current
+
+    added, again, advanced, current = _run(make_storage, programs, body)
+    assert (added, again) == (2, 1)
+    assert [(r["user_id"], r["step"]) for r in advanced] == [("a", 2), ("b", 1), ("new", 1)]
+    assert [(r["user_id"], r["step"]) for r in current] == [("a", 2), ("ghost", None)]
+
+
+def test_due_page_sees_only_stale_unfinished_enrollments(make_storage, programs):
+    async def body(engine):
+        await engine.enroll("a", "p3")
+        await engine.bulk_enroll(["b", "c"], "p3")
+        for _ in range(3):
+            await engine.next_step("c", "p3")  # completed: never due
+        later = await engine.storage.due_page(utc_now(60), limit=10)
+        first = await engine.storage.due_page(utc_now(60), limit=1)
+        rest = await engine.storage.due_page(utc_now(60), (first[0][3], first[0][0], first[0][1]), limit=10)
+        now = await engine.storage.due_page(utc_now(-3600), limit=10)
+        return later, first + rest, now
+
+    later, paged, now = _run(make_storage, programs, body)
+    assert sorted(r[0] for r in later) == ["a", "b"]
+    assert paged == later
+    assert now == []
+
+
+def test_funnel_counts_events_written_with_progress(make_storage, programs):
+    async def body(engine):
+        await engine.bulk_enroll(["a", "b", "c"], "p3")
+        await engine.bulk_next_step(["a", "b", "c"], "p3")
+        for _ in range(3):
+            await engine.next_step("a", "p3")  # steps 2, 3 (complete), then a no-op
+        await engine.reset("a", "p3")
+        await engine.reset("ghost", "p3")  # not enrolled: no event
+        await engine.next_step("a", "p3")
+        return await engine.funnel("p3"), await engine.funnel("p3", distinct_users=True)
+
+    events, users = _run(make_storage, programs, body)
+    assert (events["enrolled"], events["started"], events["completed"], events["resets"]) == (3, 4, 1, 1)
+    assert [s["reached"] for s in events["steps"]] == [4, 1, 1]
+    assert events["steps"][1]["rate"] == 0.25
+    assert [s["reached"] for s in users["steps"]] == [3, 1, 1]
+    assert (events["source"], users["source"]) == ("rollup", "events")
+
+
+def test_postgres_rollup_spreads_users_over_shards(make_storage, programs):
+    async def body(engine):
+        if not isinstance(engine.storage, PostgresStorage):
+            pytest.skip("sharded rollup is Postgres only")
+        await engine.bulk_next_step([f"u{i}" for i in range(64)], "p3")
+        return await (await engine.storage.pool()).fetch(
+            "select shard, n from program_step_daily where event = 'step' and step = 1")
+
+    rows = _run(make_storage, programs, body)
+    assert sum(r["n"] for r in rows) == 64 and len(rows) > 1
+
+
+def test_sqlite_migrations_are_recorded_and_idempotent(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "m.db"), isolation_level=None)
+    # A pre-migrations database: tables exist, schema_migrations does not
+    conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, created_at TEXT DEFAULT CURRENT_TIMESTAMP)")
+    versions = [v for v, _, _ in migrations("sqlite")]
+    assert apply_sqlite_migrations(conn) == versions
+    assert apply_sqlite_migrations(conn) == []
+    assert [v for (v,) in conn.execute("SELECT version FROM schema_migrations ORDER BY version")] == versions
@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from program_engine import ProgramEngine, WriteBehindBuffer
+
+
+def _engine(tmp_path, programs, **kwargs):
+    engine = ProgramEngine(db_path=str(tmp_path / "sehat.db"), programs_folder=programs, write_behind=False)
+    kwargs.setdefault("flush_ms", 60_000)  # flush only when the test asks
+    engine.buffer = WriteBehindBuffer(engine, **kwargs)
+    return engine
+
+
+def _committed(engine, user, pid="p3"):
+    row = engine.db.execute(
+        "SELECT current_step_index, completed FROM enrollments WHERE user_id=? AND program_id=?", (user, pid)
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def test_acks_are_readable_before_flush(tmp_path, programs):
+    engine = _engine(tmp_path, programs, durability="memory")
+    assert engine.next_step("u1", "p3").startswith("Day 1 en")
+    assert engine.next_step("u1", "p3").startswith("Day 2 en")  # read-your-writes
+    assert _committed(engine, "u1") is None
+
+    assert engine.buffer.flush() == 1
+    assert _committed(engine, "u1") == (2, 0)
+    stats = engine.buffer.stats()
+    assert stats["acks"] == 2 and stats["flushes"] == 1 and stats["pending"] == 0
+    engine.buffer.close()
+
+
+def test_flushes_when_batch_fills(tmp_path, programs):
+    engine = _engine(tmp_path, programs, durability="memory", flush_every=5)
+    for i in range(5):
+        engine.enroll(f"u{i}", "p3")
+    for _ in range(100):  # the writer thread is woken, not the caller
+        if engine.buffer.stats()["rows_flushed"] == 5:
+            break
+        time.sleep(0.01)
+    assert engine.db.execute("SELECT COUNT(*) FROM enrollments").fetchone()[0] == 5
+    engine.buffer.close()
+
+
+def test_journal_replays_after_crash(tmp_path, programs):
+    engine = _engine(tmp_path, programs, durability="journal")
+    engine.next_step("u1", "p3")
+    engine.next_step("u1", "p3")
+    engine.reset("ghost", "p3")  # not enrolled: no-op, nothing journaled
+    engine.buffer._stop = True  # "crash": no more flushes, and close() becomes a no-op
+    assert _committed(engine, "u1") is None
+
+    recovered = _engine(tmp_path, programs, durability="journal")
+    assert recovered.buffer.stats()["recovered_rows"] == 1
+    assert _committed(recovered, "u1") == (2, 0)
+    assert recovered.next_step("u1", "p3").startswith("Day 3 en")
+    recovered.buffer.close()
+    assert not list(tmp_path.glob("sehat.db.wb.*"))
+
+
+def test_bulk_ops_see_buffered_progress(tmp_path, programs):
+    engine = _engine(tmp_path, programs, durability="memory")
+    engine.next_step("u1", "p3")
+    rows = {r["user_id"]: r for r in engine.bulk_next_step(["u1", "u2"], "p3")}
+    assert rows["u1"]["step"] == 2 and rows["u2"]["step"] == 1
+    assert engine.next_step("u1", "p3").startswith("Day 3 en")
+    engine.buffer.close()
+    assert _committed(engine, "u1") == (3, 1)
+
+
+def test_bulk_op_refuses_to_run_over_failed_flush(tmp_path, programs, monkeypatch):
+    engine = _engine(tmp_path, programs, durability="memory")
+    engine.next_step("u1", "p3")
+    real_write = engine.buffer._write
+
+    def failing_write(batch, events):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(engine.buffer, "_write", failing_write)
+    with pytest.raises(RuntimeError):
+        list(engine.bulk_next_step(["u1", "u2"], "p3"))
+    assert engine.next_step("u1", "p3").startswith("Day 2 en")  # the ack survived
+    assert engine.buffer.stats()["flush_errors"] == 1
+
+    monkeypatch.setattr(engine.buffer, "_write", real_write)
+    assert engine.buffer.flush() == 1
+    assert _committed(engine, "u1") == (2, 0)
+    assert _committed(engine, "u2") is None  # the bulk step never ran
+    engine.buffer.close()
+
+
+def test_recovery_keeps_events_identical_to_committed_ones(tmp_path, programs, monkeypatch):
+    monkeypatch.setattr("program_engine.utc_now", lambda offset=0: "2026-01-01 00:00:00")  # all in one second
+    engine = _engine(tmp_path, programs, durability="journal")
+    engine.next_step("u1", "p3")
+    engine.reset("u1", "p3")
+    engine.buffer.flush()
+    engine.next_step("u1", "p3")  # same (ts, user, event, step) as the committed pair
+    engine.reset("u1", "p3")
+    engine.buffer._stop = True  # crash before the second pair is flushed
+
+    recovered = _engine(tmp_path, programs, durability="journal")
+    counts = dict(recovered.db.execute("SELECT event, COUNT(*) FROM program_events GROUP BY event").fetchall())
+    assert counts == {"step": 2, "reset": 2}
+    recovered.buffer.close()
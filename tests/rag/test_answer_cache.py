@@ -0,0 +1,43 @@
+import numpy as np
+
+from packages.rag.answer_cache import SemanticAnswerCache, index_version
+
+
+def _vec(*xs):
+    return np.array(xs, dtype="float32")
+
+
+def test_paraphrase_hits_only_with_same_evidence():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put(_vec(1, 0, 0), ["c1", "c2"], "anxiety answer", "v1")
+
+    assert cache.get(_vec(0.99, 0.05, 0), ["c2", "c1"], "v1") == "anxiety answer"   # paraphrase, same chunks
+    assert cache.get(_vec(0.99, 0.05, 0), ["c1", "c9"], "v1") is None               # different evidence
+    assert cache.get(_vec(0, 1, 0), ["c1", "c2"], "v1") is None                     # different question
+    s = cache.stats
+    assert (s.hits, s.miss_chunks_changed, s.miss_no_similar) == (1, 1, 1)
+    assert s.as_dict()["hit_rate"] == round(1 / 3, 4)
+
+
+def test_lru_ttl_and_index_version():
+    now = [1000.0]
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2, ttl_secs=60, clock=lambda: now[0])
+    cache.put(_vec(1, 0, 0), ["a"], "A", "v1")
+    cache.put(_vec(0, 1, 0), ["b"], "B", "v1")
+    assert cache.get(_vec(1, 0, 0), ["a"], "v1") == "A"  # A is now most recent
+    cache.put(_vec(0, 0, 1), ["c"], "C", "v1")            # evicts B (least recent)
+    assert cache.get(_vec(0, 1, 0), ["b"], "v1") is None
+    assert cache.get(_vec(1, 0, 0), ["a"], "v1") == "A"
+
+    now[0] += 61
+    assert cache.get(_vec(1, 0, 0), ["a"], "v1") is None  # expired
+    cache.put(_vec(1, 0, 0), ["a"], "A", "v1")
+    assert cache.get(_vec(1, 0, 0), ["a"], "v2") is None  # new index version clears
+    assert len(cache) == 0 and cache.stats.invalidations == 1
+
+
+def test_index_version_changes_with_files(tmp_path):
+    (tmp_path / "index.faiss").write_bytes(b"x")
+    v1 = index_version(tmp_path)
+    (tmp_path / "index.faiss").write_bytes(b"xy")
+    assert index_version(tmp_path) != v1
@@ -0,0 +1,53 @@
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from packages.rag.context import DEFAULT_BUDGET_TOKENS, estimate_tokens, pack
+
+TEXT = " ".join(f"Sentence {i} talks about anxiety, sleep and everyday stress in plain words." for i in range(60))
+
+
+def _chunks():
+    return RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=120).split_text(TEXT)
+
+
+def test_overlapping_neighbours_merge_into_one_passage():
+    cs = _chunks()
+    packed = pack([(cs[2], "a.md", 0.9), (cs[1], "a.md", 0.8), (cs[3], "a.md", 0.7)], None)
+    assert len(packed.passages) == 1 and packed.passages[0].chunks == 3
+    assert packed.passages[0].text in TEXT
+    assert packed.tokens_saved > 0
+    assert packed.tokens < packed.naive_tokens
+
+
+def test_duplicates_dropped_and_relevance_ordered():
+    cs = _chunks()
+    packed = pack([(cs[8], "b.md", 0.4), (cs[1], "a.md", 0.9), (cs[1], "mirror.md", 0.3)], None)
+    assert [p.source for p in packed.passages] == ["a.md", "b.md"]
+
+
+def test_budget_is_filled_but_never_exceeded():
+    cs = _chunks()
+    items = [(c, f"{i % 3}.md", 1.0 - i / 100) for i, c in enumerate(cs[::4])]
+    for budget in (40, 100, 250):
+        packed = pack(items, budget)
+        assert budget - 10 <= packed.tokens <= budget
+        assert estimate_tokens(packed.text) == packed.tokens
+
+
+def test_default_budget_stays_within_the_old_snippet_context():
+    cs = _chunks()
+    items = [(cs[i], f"{i}.md", 1.0 - i / 10) for i in (0, 5, 10)]
+    packed = pack(items, baseline_chars=300)
+    snippets = "\n\n".join(f"Source: {s}\nContent: {t[:300]}" for t, s, _ in items)
+    assert packed.naive_tokens == estimate_tokens(snippets)
+    assert packed.tokens <= DEFAULT_BUDGET_TOKENS <= packed.naive_tokens
+
+
+def test_budget_is_shared_so_every_source_keeps_a_snippet():
+    long = [TEXT[i * 1200:(i + 1) * 1200] for i in range(3)]  # ~1000+ chars each, no overlap
+    packed = pack([(t, f"{i}.md", 1.0 - i / 10) for i, t in enumerate(long)])
+    assert packed.sources == ["0.md", "1.md", "2.md"]
+    assert all(250 <= len(p.text) <= 300 for p in packed.passages)
+    assert packed.tokens <= DEFAULT_BUDGET_TOKENS
+
+    short = pack([("Sleep helps mood.", "s.md", 0.9), (long[0], "a.md", 0.8)])
+    assert short.passages[0].text == "Sleep helps mood." and len(short.passages[1].text) > 500  # slack reused
@@ -0,0 +1,53 @@
+from langchain_core.embeddings import Embeddings
+
+from packages.rag.embed_store import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_rerun_on_unchanged_text_makes_no_calls(tmp_path):
+    store = EmbeddingStore(tmp_path / "store.sqlite3")
+    inner = CountingEmbeddings()
+    emb = CachedEmbeddings(inner, store, "fake", 3)
+
+    texts = ["alpha", "beta", "alpha"]
+    first = emb.embed_documents(texts)
+    assert inner.calls == 1 and inner.texts == 2  # duplicates embedded once
+
+    second = emb.embed_documents(texts)
+    assert inner.calls == 1
+    assert first == second
+    assert store.stats.hits == 3 and store.stats.misses == 3
+
+
+def test_fresh_and_cached_vectors_are_identical(tmp_path):
+    class Float64Embeddings(CountingEmbeddings):
+        def embed_documents(self, texts):
+            return [[0.1, 1 / 3, 2 ** 0.5] for _ in texts]
+
+    emb = CachedEmbeddings(Float64Embeddings(), EmbeddingStore(tmp_path / "store.sqlite3"), "fake", 3)
+    first = emb.embed_documents(["alpha"])
+    assert first[0] != [0.1, 1 / 3, 2 ** 0.5]  # rounded to the stored float32 precision
+    assert emb.embed_documents(["alpha"]) == first
+
+
+def test_keys_are_scoped_by_model_and_compact(tmp_path):
+    store = EmbeddingStore(tmp_path / "store.sqlite3")
+    store.put_many("m1", 3, ["x"], [[1.0, 2.0, 3.0]])
+    assert store.get_many("m2", 3, ["x"]) == [None]
+    assert store.get_many("m1", 3, ["x"]) == [[1.0, 2.0, 3.0]]
+
+    assert store.compact(keep_models=["m2"]) == 1
+    assert store.get_many("m1", 3, ["x"]) == [None]
@@ -0,0 +1,24 @@
+import numpy as np
+
+from packages.rag.embeddings import HashingEmbeddings, get_embeddings
+
+
+def test_hashing_embeddings_are_deterministic_and_normalised():
+    emb = HashingEmbeddings(dims=256)
+    a = emb.embed_query("What is anxiety?")
+    assert a == HashingEmbeddings(dims=256).embed_query("What is anxiety?")
+    assert len(a) == 256
+    assert abs(np.linalg.norm(a) - 1.0) < 1e-9
+
+
+def test_hashing_embeddings_rank_paraphrase_above_unrelated():
+    emb = HashingEmbeddings(dims=512)
+    q, para, other = emb.embed_documents(["what is anxiety", "what's anxiety?", "sleep hygiene tips"])
+    assert np.dot(q, para) > np.dot(q, other)
+
+
+def test_provider_selected_by_env(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_PROVIDER", "hash")
+    monkeypatch.setenv("EMBEDDING_DIM", "64")
+    emb = get_embeddings()
+    assert isinstance(emb, HashingEmbeddings) and emb.dims == 64
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+
+from packages.rag.fetcher import FetchState, fetch_all
+
+
+def test_conditional_refetch_transfers_only_changes(tmp_path):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"<html>v1</html>", headers={"ETag": '"v1"'})
+
+    sources = [
+        {"name": "a", "url": "https://one.example/a"},
+        {"name": "b", "url": "https://two.example/b"},
+    ]
+    state = FetchState(tmp_path / "state.sqlite3")
+
+    def run():
+        return asyncio.run(fetch_all(
+            sources, tmp_path / "raw", state=state, per_host_interval=0,
+            transport=httpx.MockTransport(handler),
+        ))
+
+    first = run()
+    assert [r.status for r in first] == ["fetched", "fetched"]
+    assert (tmp_path / "raw" / "a.html").read_bytes() == b"<html>v1</html>"
+
+    second = run()
+    assert [r.status for r in second] == ["not-modified", "not-modified"]
+    assert seen[-1].get("if-none-match") == '"v1"'
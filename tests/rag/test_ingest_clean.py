@@ -0,0 +1,44 @@
+from packages.rag.ingest_clean import clean_all
+
+PAGE = """<html><head><script>var x = 1;</script></head><body>
+<nav>Home | Topics</nav><div class="breadcrumb">Health &gt; Sleep</div>
+<h1>{title}</h1><p>On this page: menu</p>
+<p>{title} affects mood, focus and everyday stress.</p><footer>Contact us</footer>
+</body></html>"""
+
+
+def _raw(tmp_path, titles):
+    raw = tmp_path / "raw"
+    raw.mkdir(exist_ok=True)
+    for t in titles:
+        (raw / f"{t.lower()}.html").write_text(PAGE.format(title=t), encoding="utf-8")
+    return raw
+
+
+def _outputs(folder):
+    return {p.name: p.read_text(encoding="utf-8") for p in sorted(folder.glob("*.md"))}
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    raw = _raw(tmp_path, ["Sleep", "Anxiety"])
+    out, state = tmp_path / "clean", tmp_path / "state.json"
+    rows, skipped = clean_all(raw, out, state)
+    assert [r["file"] for r in rows] == ["anxiety.html", "sleep.html"] and skipped == 0
+    assert "Contact us" not in _outputs(out)["sleep.md"]
+
+    (raw / "sleep.html").write_text(PAGE.format(title="Sleep") + "<p>New advice.</p>", encoding="utf-8")
+    rows, skipped = clean_all(raw, out, state)
+    assert [r["file"] for r in rows] == ["sleep.html"] and skipped == 1
+
+    rows, skipped = clean_all(raw, out, state, force=True)
+    assert len(rows) == 2 and skipped == 0
+
+
+def test_pooled_run_matches_serial_run(tmp_path):
+    raw = _raw(tmp_path, ["Sleep", "Anxiety", "Stress", "Depression", "Panic"])
+    serial, _ = clean_all(raw, tmp_path / "serial", tmp_path / "serial.json", workers=1)
+    pooled, _ = clean_all(raw, tmp_path / "pooled", tmp_path / "pooled.json", workers=3)
+    drop_ts = lambda rows: [{k: v for k, v in r.items() if k != "timestamp"} for r in rows]
+    assert drop_ts(pooled) == drop_ts(serial)
+    assert _outputs(tmp_path / "pooled") == _outputs(tmp_path / "serial")
+    assert (tmp_path / "pooled.json").read_text() == (tmp_path / "serial.json").read_text()
@@ -0,0 +1,50 @@
+import pathlib
+
+import pytest
+
+from packages.agent.nodes import plan_node
+from packages.rag import langid
+from packages.rag.langid import ENGLISH, ROMAN_URDU, URDU_SCRIPT, detect_language, identify
+
+EVAL = pathlib.Path(langid.__file__).parent / "data" / "langid_eval.tsv"
+
+
+@pytest.mark.parametrize("q", [
+    "How do I make my skin better?",
+    "What is the domain of mental health care?",
+    "The chain of events that leads to burnout",
+    "What is the main cause of insomnia?",
+    "sleep hygiene",
+])
+def test_english_with_urdu_substrings_is_not_translated(q):
+    assert detect_language(q) == ENGLISH
+
+
+@pytest.mark.parametrize("q", [
+    "Depression ki alamat kya hain?",
+    "mujhe neend nahi aati",
+    "anxiety ka ilaj",
+    "exam se pehle ghabrahat kyun hoti hai",
+])
+def test_roman_urdu(q):
+    assert detect_language(q) == ROMAN_URDU
+
+
+def test_urdu_script_and_confidence():
+    r = identify("مجھے نیند نہیں آتی")
+    assert r.lang == URDU_SCRIPT and r.confidence == 1.0
+    assert 0.5 <= identify("What is anxiety?").confidence <= 1.0
+    assert identify("").lang == ENGLISH
+
+
+def test_plan_node_records_language():
+    assert plan_node({"q": "kya main theek hoon"})["lang"] == ROMAN_URDU
+
+
+def test_eval_and_test_sentences_are_held_out_of_the_seed():
+    words = lambda t: " " + " ".join(langid._WORD.findall(t.lower())) + " "
+    seed = words(langid._SEED_UR + langid._SEED_EN)
+    lines = [line for line in EVAL.read_text(encoding="utf-8").splitlines() if line.strip() and not line.startswith("#")]
+    held_out = [line.rsplit("\t", 1)[0] for line in lines]
+    held_out += ["How do I make my skin better?", "Depression ki alamat kya hain?", "kya main theek hoon"]
+    assert [t for t in held_out if words(t) in seed] == []
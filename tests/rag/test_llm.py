@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+import pytest
+
+from packages.rag.llm import FakeChatModel, chat_model_from_env
+from packages.rag.telemetry import usage_tokens
+
+
+def test_fake_model_sleeps_and_reports_usage():
+    model = FakeChatModel(latency_ms=50, jitter=0)
+    t = time.perf_counter()
+    message = asyncio.run(model.ainvoke("x" * 400))
+    assert time.perf_counter() - t >= 0.045
+    assert "English Answer" in message.content and "Roman Urdu Answer" in message.content
+    assert usage_tokens(message) == (100, 24)
+    assert model.invoke("hi").content == message.content
+    assert model.calls == 2
+
+
+def test_provider_selection(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    llm, mode = chat_model_from_env(api_key=None)
+    assert isinstance(llm, FakeChatModel) and "fake" in mode
+
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    assert chat_model_from_env(api_key=None) == (None, "retriever-only")
+    monkeypatch.setenv("LLM_PROVIDER", "none")
+    assert chat_model_from_env(api_key="sk-test") == (None, "retriever-only")
+
+    monkeypatch.setenv("LLM_PROVIDER", "bogus")
+    with pytest.raises(ValueError):
+        chat_model_from_env()
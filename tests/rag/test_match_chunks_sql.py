@@ -0,0 +1,96 @@
+"""
+infra/supabase/migrations against a real pgvector server. Runs only when
+PGVECTOR_TEST_DATABASE_URL points at a disposable one (see
+scripts/bench_match_chunks.py); each test works in its own schema.
+"""
+import asyncio
+import os
+import pathlib
+import uuid
+
+import pytest
+
+DSN = os.getenv("PGVECTOR_TEST_DATABASE_URL")
+MIGRATIONS = pathlib.Path(__file__).resolve().parents[2] / "infra" / "supabase" / "migrations"
+
+pytestmark = pytest.mark.skipif(not DSN, reason="PGVECTOR_TEST_DATABASE_URL not set")
+
+
+def _vec(*weights):
+    v = [0.0] * 1536
+    for i, w in enumerate(weights):
+        v[i] = w
+    return "[" + ",".join(map(str, v)) + "]"
+
+
+def _in_schema(body):
+    asyncpg = pytest.importorskip("asyncpg")
+
+    async def go():
+        conn = await asyncpg.connect(DSN)
+        schema = f"match_chunks_test_{uuid.uuid4().hex[:12]}"
+        try:
+            for ext in ("vector", "pg_trgm", "pgcrypto"):
+                await conn.execute(f'create extension if not exists "{ext}" schema public')
+            await conn.execute(f'create schema "{schema}"')
+            await conn.execute(f'set search_path = "{schema}", public')
+            for _ in range(2):  # migrations are idempotent
+                for path in sorted(MIGRATIONS.glob("*.sql")):
+                    await conn.execute(path.read_text(encoding="utf-8"))
+            return await body(conn)
+        finally:
+            await conn.execute(f'drop schema if exists "{schema}" cascade')
+            await conn.close()
+    return asyncio.run(go())
+
+
+async def _seed(conn):
+    docs = await conn.fetch("""insert into documents(source_url, external_id, title) values
+                               ('https://a', 'ext-a', 'Sleep Hygiene Basics'), ('https://b', 'ext-b', 'Stress')
+                               returning id""")
+    a, b = docs[0]["id"], docs[1]["id"]
+    for doc, ord_, text, vec in ((a, 0, "sleep one", _vec(1)), (a, 1, "sleep two", _vec(0.8, 0.6)),
+                                 (b, 0, "stress", _vec(0, 1))):
+        chunk = await conn.fetchval("insert into chunks(doc_id, ord, content) values ($1, $2, $3) returning id",
+                                    doc, ord_, text)
+        await conn.execute("insert into chunk_embeddings(chunk_id, embedding) values ($1, $2::text::vector)",
+                           chunk, vec)
+
+
+def _match(conn, **kw):
+    args = ", ".join(f"{k} => ${i + 2}" for i, k in enumerate(kw))
+    return conn.fetch(f"select content, score from match_chunks($1::text::vector{', ' + args if args else ''})",
+                      _vec(1), *kw.values())
+
+
+def test_match_chunks_scores_and_filters():
+    async def body(conn):
+        await _seed(conn)
+        return (await _match(conn), await _match(conn, match_count=1), await _match(conn, min_score=0.5),
+                await _match(conn, source_url="https://b"), await _match(conn, title_substring="hygiene"),
+                await _match(conn, external_id="ext-a", ef_search=100), await _match(conn, org="other"))
+
+    everything, top1, close, by_url, by_title, by_ext, other_org = _in_schema(body)
+    assert [r["content"] for r in everything] == ["sleep one", "sleep two", "stress"]
+    assert everything[0]["score"] == pytest.approx(1.0) and everything[1]["score"] == pytest.approx(0.8)
+    assert [r["content"] for r in top1] == ["sleep one"]
+    assert [r["content"] for r in close] == ["sleep one", "sleep two"]
+    assert [r["content"] for r in by_url] == ["stress"]
+    assert [r["content"] for r in by_title] == [r["content"] for r in by_ext] == ["sleep one", "sleep two"]
+    assert other_org == []
+
+
+def test_vector_index_can_be_switched():
+    async def body(conn):
+        default = await conn.fetchval("""select indexdef from pg_indexes
+                                          where schemaname = current_schema() and indexname = 'chunk_embeddings_embedding'""")
+        ivf = await conn.fetchval("select chunk_embeddings_index('ivfflat', lists => 4)")
+        none = await conn.fetchval("select chunk_embeddings_index('none')")
+        hnsw = await conn.fetchval("select chunk_embeddings_index('hnsw', m => 8, ef_construction => 32)")
+        with pytest.raises(Exception, match="unknown vector index method"):
+            await conn.execute("select chunk_embeddings_index('flat')")
+        return default, ivf, none, hnsw
+
+    default, ivf, none, hnsw = _in_schema(body)
+    assert "hnsw" in default and "lists = 4" in ivf and none == "no vector index"
+    assert "m = 8, ef_construction = 32" in hnsw
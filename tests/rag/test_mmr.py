@@ -0,0 +1,36 @@
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from packages.rag.embeddings import HashingEmbeddings
+from packages.rag.mmr import diversify, mmr_select
+
+
+def test_mmr_skips_near_duplicates():
+    q = np.array([1.0, 0.0, 0.0])
+    cands = np.array([
+        [0.99, 0.10, 0.0],   # best
+        [0.98, 0.11, 0.0],   # near-duplicate of 0
+        [0.70, 0.0, 0.70],   # relevant and different
+    ])
+    assert mmr_select(q, cands, 2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(q, cands, 2, lambda_mult=1.0) == [0, 1]  # pure relevance
+
+
+def test_zero_budget_falls_back_to_relevance_order():
+    rng = np.random.default_rng(0)
+    cands = rng.normal(size=(50, 16))
+    q = rng.normal(size=16)
+    picked = mmr_select(q, cands, 5, budget_ms=0)
+    rel = (cands / np.linalg.norm(cands, axis=1, keepdims=True)) @ (q / np.linalg.norm(q))
+    assert picked == list(np.argsort(-rel)[:5])
+    assert mmr_select(q, cands[:0], 5) == []
+
+
+def test_diversify_uses_stored_vectors():
+    base = "Anxiety is a feeling of fear, dread and uneasiness that can make you sweat."
+    texts = [base, base + " It is common.", base + " It is normal.", "Sleep hygiene means a regular bedtime."]
+    db = FAISS.from_texts(texts, HashingEmbeddings(256), metadatas=[{"source": str(i)} for i in range(4)])
+    out = diversify(db, "anxiety fear sleep", k=2, fetch_k=4)
+    assert len(out) == 2
+    assert "3" in {doc.metadata["source"] for doc, _ in out}
+    assert all(isinstance(score, float) for _, score in out)
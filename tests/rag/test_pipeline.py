@@ -0,0 +1,50 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from packages.rag.pipeline import build_index
+
+
+class FlakyEmbeddings(Embeddings):
+    """Deterministic 4-d vectors; can be told to fail after N batches."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.batches = 0
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and self.batches >= self.fail_after:
+            raise RuntimeError("API down")
+        self.batches += 1
+        self.texts += len(texts)
+        return [[float(len(t)), float(t.count("a")), 1.0, 0.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(text.count("a")), 1.0, 0.0]
+
+
+def _write_docs(d, n=6):
+    d.mkdir()
+    for i in range(n):
+        (d / f"doc{i}.md").write_text(("anxiety stress sleep " * 30) + f"doc {i}", encoding="utf-8")
+
+
+def test_resume_after_mid_run_failure(tmp_path):
+    clean = tmp_path / "clean"
+    _write_docs(clean)
+    index = tmp_path / "index" / "index"
+    quiet = lambda _msg: None
+
+    flaky = FlakyEmbeddings(fail_after=2)
+    with pytest.raises(RuntimeError):
+        build_index(clean, index, flaky, batch_size=2, checkpoint_every=100, chunk_size=200, chunk_overlap=20, log=quiet)
+    assert (tmp_path / "index" / "index.partial" / "checkpoint.json").exists()
+
+    healthy = FlakyEmbeddings()
+    stats = build_index(clean, index, healthy, batch_size=2, checkpoint_every=100, chunk_size=200, chunk_overlap=20, log=quiet)
+    total = stats.stages["chunk"].items
+    # only the chunks after the checkpoint are embedded again
+    assert healthy.texts == total - flaky.texts
+    assert (index / "index.faiss").exists()
+    assert not (tmp_path / "index" / "index.partial").exists()
+    assert "embed" in stats.report()
@@ -0,0 +1,44 @@
+import csv
+import gzip
+import os
+import time
+
+from packages.rag.query_log import QueryLogger
+
+
+def test_batches_are_written_off_the_request_path(tmp_path):
+    log = QueryLogger(tmp_path, flush_every=100, flush_interval=60)
+    log.log_query("What is anxiety?", "retriever+LLM", [("a.md", 0.8, "snippet a"), ("b.md", 0.7, "snippet b")], "ans")
+    log.save_last_answer("first")
+    log.save_last_answer("second")
+    log.append_answer_history("What is anxiety?", "ans")
+    assert not list(tmp_path.glob("query_log_*.csv"))  # still buffered
+
+    log.flush()
+    (logfile,) = tmp_path.glob("query_log_*.csv")
+    rows = list(csv.reader(logfile.open(encoding="utf-8")))
+    assert rows[0][:3] == ["timestamp", "query", "mode"]
+    assert [r[3] for r in rows[1:]] == ["a.md", "b.md"]
+    assert (tmp_path / "last_answer.txt").read_text(encoding="utf-8") == "second"
+    assert "Query: What is anxiety?" in (tmp_path / "all_answers.txt").read_text(encoding="utf-8")
+    log.close()
+
+
+def test_rotation_compresses_previous_day(tmp_path):
+    old_csv = tmp_path / "query_log_2025-09-03.csv"
+    old_csv.write_text("timestamp,query\n", encoding="utf-8")
+    history = tmp_path / "all_answers.txt"
+    history.write_text("old answers\n", encoding="utf-8")
+    yesterday = time.time() - 86400
+    os.utime(history, (yesterday, yesterday))
+
+    log = QueryLogger(tmp_path, flush_every=1)
+    log.append_answer_history("q", "new answer")
+    log.flush()
+    log.close()
+
+    assert not old_csv.exists()
+    assert gzip.open(str(old_csv) + ".gz", "rt").read() == "timestamp,query\n"
+    (rotated,) = tmp_path.glob("all_answers_*.txt.gz")
+    assert gzip.open(rotated, "rt").read() == "old answers\n"
+    assert "new answer" in history.read_text(encoding="utf-8")
@@ -0,0 +1,61 @@
+import gzip
+
+import numpy as np
+
+from packages.rag.embeddings import HashingEmbeddings
+from packages.rag.retrieval_eval import (
+    BACKENDS, Corpus, evaluate, golden_set, mine_log_labels, recall_at_k, reciprocal_rank,
+)
+
+OLD = (
+    "run_timestamp,query,result_rank,source,similarity,snippet\n"
+    "2025-09-03 13:16:49,What is anxiety?,1,medlineplus_anxiety,1.0000,a\n"
+    "2025-09-03 13:16:49,What is anxiety?,2,medlineplus_stress,0.5362,b\n"
+)
+NEW = (
+    "timestamp,query,mode,source,similarity,snippet,answer\n"
+    "2025-09-04T00:27:29.1,How to cope with stress?,retriever-only,who_mental_health.md,0.41,x,\n"
+    "2025-09-04T00:27:29.2,How to cope with stress?,retriever-only,medlineplus_stress.md,0.49,y,\n"
+)
+
+
+def test_mines_both_log_layouts_including_gzip(tmp_path):
+    (tmp_path / "query_log_2025-09-03.csv.gz").write_bytes(gzip.compress(OLD.encode()))
+    (tmp_path / "query_log_2025-09-04.csv").write_text(NEW, encoding="utf-8")
+    assert mine_log_labels(tmp_path) == {
+        "What is anxiety?": ["medlineplus_anxiety"],
+        "How to cope with stress?": ["medlineplus_stress"],
+    }
+
+    labels = tmp_path / "labels.tsv"
+    labels.write_text("# q\tsources\nWhat is anxiety?\tmedlineplus_anxiety,medlineplus_stress\n", encoding="utf-8")
+    golden = {g.query: g for g in golden_set(tmp_path, labels)}
+    assert golden["What is anxiety?"].origin == "hand"
+    assert golden["What is anxiety?"].relevant == ["medlineplus_anxiety", "medlineplus_stress"]
+
+
+def test_metrics():
+    ranked = ["b", "a", "c"]
+    assert recall_at_k(ranked, ["a", "c"], 1) == 0.0
+    assert recall_at_k(ranked, ["a", "c"], 3) == 1.0
+    assert reciprocal_rank(ranked, ["a"]) == 0.5
+    assert reciprocal_rank(ranked, ["z"]) == 0.0
+
+
+def test_every_backend_finds_the_obvious_document(tmp_path):
+    clean = tmp_path / "clean"
+    clean.mkdir()
+    (clean / "anxiety.md").write_text("Anxiety is a feeling of fear, dread and uneasiness.", encoding="utf-8")
+    (clean / "sleep.md").write_text("Adults need seven or more hours of sleep each night.", encoding="utf-8")
+    labels = tmp_path / "labels.tsv"
+    labels.write_text("How many hours of sleep do adults need?\tsleep\n", encoding="utf-8")
+
+    emb = HashingEmbeddings(128)
+    corpus = Corpus.from_clean_dir(clean, emb)
+    golden = golden_set(None, labels)
+    qvecs = np.asarray([emb.embed_query(g.query) for g in golden], dtype="float32")
+    for name, make in BACKENDS.items():
+        result = evaluate(make(corpus), golden, qvecs, corpus, ks=(1,), repeat=1)
+        assert result.recall[1] == 1.0 and result.mrr == 1.0, name
+        assert result.by_origin == {"hand": {"queries": 1, "recall@1": 1.0, "mrr": 1.0}}, name
+        assert result.as_dict()["latency_ms"]["p50"] >= 0
@@ -0,0 +1,43 @@
+import io
+import json
+from types import SimpleNamespace
+
+from langchain_community.vectorstores import FAISS
+
+from packages.rag.embeddings import HashingEmbeddings
+from packages.rag.retriever import answer_query, read_queries, run_batch
+from packages.rag.translate import TranslationCache, Translator
+
+
+class FakeLLM:
+    def invoke(self, prompt):
+        return SimpleNamespace(content="[English] ok\n[Roman Urdu] theek")
+
+
+def _db():
+    texts = ["Anxiety is a feeling of worry.", "Sleep helps mood.", "Stress can cause headaches."]
+    return FAISS.from_texts(texts, HashingEmbeddings(64), metadatas=[{"source": f"{i}.md"} for i in range(3)])
+
+
+def test_answer_query_reports_stage_timings():
+    row = answer_query("What is anxiety?", _db(), FakeLLM())
+    assert row["lang"] == "english" and row["translation"] is None
+    assert len(row["results"]) == 3 and row["answer"].startswith("[English]")
+    assert set(row["timings_ms"]) == {"translate", "retrieve", "synthesize", "total"}
+
+
+def test_run_batch_writes_one_line_per_query(tmp_path):
+    qfile = tmp_path / "q.txt"
+    qfile.write_text("# regression set\nWhat is anxiety?\n\nneend nahi aati\nHow to cope with stress?\n", encoding="utf-8")
+    queries = read_queries(qfile)
+    assert len(queries) == 3
+
+    out = io.StringIO()
+    translator = Translator(None, cache=TranslationCache(tmp_path / "t.sqlite3"))
+    summary = run_batch(queries, _db(), None, translator, workers=3, out=out, log=lambda *_: None)
+
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r["i"] for r in rows) == [0, 1, 2]
+    assert all(r["answer"] is None and r["error"] is None for r in rows)
+    assert summary["queries"] == 3 and summary["failed"] == 0
+    assert summary["latency_ms"]["total"]["p99"] >= summary["latency_ms"]["total"]["p50"]
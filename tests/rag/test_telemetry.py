@@ -0,0 +1,40 @@
+import time
+from types import SimpleNamespace
+
+from packages.rag.telemetry import StageTimer, TelemetryStore, chunk_id, usage_tokens
+
+
+def test_report_percentiles_per_stage(tmp_path):
+    store = TelemetryStore(tmp_path / "t.sqlite3", flush_every=1000)
+    for i in range(1, 101):
+        store.record("api", stages={"retrieve": float(i), "synthesize": 10.0 * i},
+                     total_ms=11.0 * i, lang="english", tokens=(100, 50),
+                     cache={"translation": "cache" if i % 4 == 0 else "lexicon"}, top_k=["a#0", "b#1"])
+    store.flush()
+
+    rows = {r["stage"]: r for r in store.report(days=1)}
+    assert list(rows)[-1] == "total"
+    assert rows["retrieve"]["n"] == 100
+    assert rows["retrieve"]["p50"] == 51.0 and rows["retrieve"]["p99"] == 99.0
+    assert rows["synthesize"]["p95"] == 950.0
+    assert rows["total"]["cache_hit_rate"] == {"translation": 0.25}
+    assert store.report(days=1, route="cli") == []
+    store.close()
+
+
+def test_stage_timer_and_helpers():
+    timer = StageTimer()
+    with timer.stage("retrieve"):
+        time.sleep(0.002)
+    assert timer.ms["retrieve"] >= 1.0 and timer.total_ms >= timer.ms["retrieve"]
+
+    assert usage_tokens(SimpleNamespace(usage_metadata={"input_tokens": 12, "output_tokens": 3})) == (12, 3)
+    assert usage_tokens(SimpleNamespace(content="x")) == (0, 0)
+    assert chunk_id(SimpleNamespace(id=None, metadata={"source": "a.md", "chunk": 2})) == "a.md#2"
+
+
+def test_disabled_store_writes_nothing(tmp_path):
+    store = TelemetryStore(tmp_path / "t.sqlite3", enabled=False)
+    store.record("api", stages={}, total_ms=1.0)
+    store.flush()
+    assert not (tmp_path / "t.sqlite3").exists()
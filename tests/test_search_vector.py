@@ -89,3 +89,24 @@ def test_search_vector_params_and_min_score(monkeypatch):
     # here we just ensure we didn't 404 and response shape is correct.
     assert isinstance(data, list)
     assert all({"score", "content", "ord", "document"} <= set(x.keys()) for x in data)
+
+
+def test_search_vector_ef_search_is_sent_only_when_set(monkeypatch):
+    async def fake_embed_text(q: str):
+        return [0.0] * 1536
+
+    payloads = []
+
+    async def fake_post_json(url: str, payload, headers):
+        payloads.append(payload)
+        return []
+
+    monkeypatch.setattr("app.api.main._embed_text", fake_embed_text)
+    monkeypatch.setattr("app.api.main._post_json", fake_post_json)
+
+    # Older match_chunks deployments have no ef_search argument
+    assert client.get("/v1/search/vector", params={"q": "sleep"}).json() == []
+    assert "ef_search" not in payloads[-1]
+
+    assert client.get("/v1/search/vector", params={"q": "sleep", "ef_search": 100}).status_code == 200
+    assert payloads[-1]["ef_search"] == 100